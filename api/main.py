@@ -1,19 +1,42 @@
 import sys
 import os
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.routing import Match
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Union, Callable
+import base64
 import hashlib
+import io
+import itertools
+import json
 import logging
+import tempfile
+import time
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from database_manager_sqlite import DatabaseManager
+from sharding import ShardedDatabaseManager
 from auth_manager import AuthManager
-from vault_manager import VaultManager
-from crypto_utils import CryptoUtils
+from username_index import UsernameIndex
+from search_index import SearchIndexCache
+from vault_manager import VaultManager, VaultEntry
+from crypto_utils import CryptoUtils, CipherWipedError
+from kdf_pool import KdfPool
+from key_rotation import KeyRotator
+from backup import BackupManager, backup_manager_from_env
+from connection_pool import PoolTimeoutError
+from admission import AdmissionController, AdmissionRejected, admission_from_env, VAULT_LANE, KDF_LANE
+from job_queue import JobQueue, Job, JobLimitError
+from write_queue import WriteQueue
+from session_store import SessionStore, session_store_from_env
+import vault_io
+import json_codec
+import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,22 +45,80 @@ from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global db_manager, auth_manager, vault_manager, crypto_utils
+    global db_manager, auth_manager, vault_manager, crypto_utils, kdf_pool, session_store, key_rotator, job_queue
+    global admission, search_indexes, debug_timing
     try:
         logger.info("Initializing database and managers...")
-        db_manager = DatabaseManager()
-        crypto_utils = CryptoUtils()
-        auth_manager = AuthManager(db_manager, crypto_utils)
-        vault_manager = VaultManager(db_manager, crypto_utils)
+        db_path = os.environ.get('DB_PATH') or None
+        db_pool_size = int(os.environ.get('DB_POOL_SIZE', DatabaseManager.DEFAULT_POOL_SIZE))
+        db_shards = int(os.environ.get('DB_SHARDS') or 0)
+        if db_shards:
+            db_manager = ShardedDatabaseManager(db_path, db_shards, pool_size=db_pool_size)
+        else:
+            db_manager = DatabaseManager(db_path, pool_size=db_pool_size)
+        kdf_params = os.environ.get('KDF_PARAMS')
+        crypto_utils = CryptoUtils(json.loads(kdf_params) if kdf_params else None)
+        kdf_pool = KdfPool.from_env()
+        admission = admission_from_env(kdf_pool.workers)
+        username_refresh = os.environ.get('USERNAME_INDEX_REFRESH_SECONDS')
+        usernames = UsernameIndex(db_manager, float(username_refresh) if username_refresh else None)
+        auth_manager = AuthManager(db_manager, crypto_utils, kdf_pool, usernames)
+        decrypt_workers = os.environ.get('DECRYPT_WORKERS')
+        vault_manager = VaultManager(db_manager, crypto_utils, int(decrypt_workers) if decrypt_workers else None)
         
         if not db_manager.initialize_db():
             raise Exception("Failed to initialize database")
-        logger.info("Database and managers initialized successfully")
-        yield
+        usernames.load()
+        write_delay_ms = os.environ.get('WRITE_BATCH_DELAY_MS')
+        db_manager.enable_write_queue(
+            int(os.environ.get('WRITE_BATCH_SIZE', WriteQueue.DEFAULT_MAX_BATCH)),
+            float(write_delay_ms) / 1000 if write_delay_ms else None
+        )
+        rotation_batch_size = os.environ.get('KEY_ROTATION_BATCH_SIZE')
+        key_rotator = KeyRotator(db_manager, int(rotation_batch_size) if rotation_batch_size else None)
+        job_workers = os.environ.get('JOB_WORKERS')
+        job_max_active = os.environ.get('JOB_MAX_ACTIVE_PER_USER')
+        job_lease = os.environ.get('JOB_LEASE_SECONDS')
+        job_queue = JobQueue(db_manager, int(job_workers) if job_workers else None,
+                             int(job_max_active) if job_max_active else None,
+                             float(job_lease) if job_lease else None)
+        job_queue.register(DELETE_ACCOUNT_JOB, run_delete_account_job, resumable=True, cancellable=False)
+        job_queue.register(IMPORT_JOB, run_import_job, cleanup=cleanup_import_job)
+        job_queue.prune(float(os.environ.get('JOB_RETENTION_DAYS', 7)))
+        vault_manager.prune_tombstones(float(os.environ.get('TOMBSTONE_RETENTION_DAYS', 90)))
+        session_store = session_store_from_env(crypto_utils, db_manager.db_path + '.sessions')
+        sweep_interval = os.environ.get('SESSION_SWEEP_INTERVAL')
+        session_store.start_sweeper(float(sweep_interval) if sweep_interval else None)
+        search_index_mb = os.environ.get('SEARCH_INDEX_MAX_MB')
+        search_indexes = SearchIndexCache(
+            int(float(search_index_mb) * 1024 * 1024) if search_index_mb else None, session_store.idle_ttl
+        )
+        session_store.add_removal_listener(search_indexes.discard_sessions)
+        debug_timing = os.environ.get('DEBUG_TIMING', '').lower() in ('1', 'true', 'yes')
+        job_queue.start()
+        backup_hours = os.environ.get('BACKUP_INTERVAL_HOURS')
+        for database in db_manager.databases():
+            backup_manager = backup_manager_from_env(database.db_path)
+            if backup_manager is not None:
+                backup_manager.start_scheduler(float(backup_hours) * 3600 if backup_hours else None)
+                backup_managers.append(backup_manager)
+        logger.info(f"Database and managers initialized successfully (KDF workers: {kdf_pool.workers})")
     except Exception as e:
         logger.error(f"Startup error: {e}")
         raise
 
+    try:
+        yield
+    finally:
+        for backup_manager in backup_managers:
+            backup_manager.stop()
+        job_queue.stop()
+        key_rotator.stop()
+        session_store.close()
+        kdf_pool.shutdown()
+        vault_manager.close()
+        db_manager.close()
+
 app = FastAPI(
     title="Secure Vault API",
     version="1.0.0",
@@ -52,6 +133,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag", "Retry-After"],
 )
 
 # Global managers - initialized in lifespan
@@ -59,8 +141,78 @@ db_manager = None
 crypto_utils = None
 auth_manager = None
 vault_manager = None
+kdf_pool = None
+key_rotator: Optional[KeyRotator] = None
+job_queue: Optional[JobQueue] = None
+admission: Optional[AdmissionController] = None
+backup_managers: List[BackupManager] = []
+search_indexes: Optional[SearchIndexCache] = None
+
+session_store: Optional[SessionStore] = None
+debug_timing = False
+
+MAX_PAGE_SIZE = 500
+MAX_USERNAME_CHECK_BATCH = 100
+MAX_IMPORT_BYTES = 50 * 1024 * 1024
+IMPORT_SPOOL_BYTES = 1024 * 1024
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/json': 'json',
+}
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+DEBUG_TIMING_HEADER = "X-Debug-Timing"
+DELETE_ACCOUNT_JOB = 'delete_account'
+IMPORT_JOB = 'import'
+ACCOUNT_DELETE_BATCH_SIZE = int(os.environ.get('ACCOUNT_DELETE_BATCH_SIZE', 500))
+
+HTTP_REQUESTS = metrics.registry.counter(
+    'securevault_http_requests_total', "HTTP requests by route and status", ('method', 'route', 'status')
+)
+HTTP_REQUEST_SECONDS = metrics.registry.histogram(
+    'securevault_http_request_duration_seconds', "HTTP request latency by route", ('method', 'route')
+)
+
 
-active_sessions: Dict[str, Dict[str, Any]] = {}
+def pool_stat(name: str):
+    return lambda: db_manager.pool_stats()[name] if db_manager else None
+
+
+def admission_stat(name: str):
+    return lambda: {(lane,): stats[name] for lane, stats in admission.stats().items()} if admission else None
+
+
+def write_queue_stat(name: str):
+    return lambda: db_manager.write_queue.stats()[name] if db_manager and db_manager.write_queue else None
+
+
+metrics.registry.gauge('securevault_active_sessions', "Sessions currently held by the session store",
+                       lambda: session_store.count() if session_store else None)
+metrics.registry.gauge('securevault_db_pool_in_use', "Database connections checked out", pool_stat('in_use'))
+metrics.registry.gauge('securevault_db_pool_idle', "Idle database connections", pool_stat('idle'))
+metrics.registry.gauge('securevault_db_pool_checkouts_total', "Database connection checkouts",
+                       pool_stat('checkouts'), 'counter')
+metrics.registry.gauge('securevault_db_pool_waits_total', "Checkouts that waited for a free connection",
+                       pool_stat('waits'), 'counter')
+metrics.registry.gauge('securevault_db_pool_timeouts_total', "Checkouts that timed out waiting for a connection",
+                       pool_stat('timeouts'), 'counter')
+metrics.registry.gauge('securevault_username_index_size', "Usernames held by the in-memory username index",
+                       lambda: len(auth_manager.usernames) if auth_manager else None)
+metrics.registry.gauge('securevault_search_indexes', "Per-session decrypted search indexes held in memory",
+                       lambda: search_indexes.stats()['indexes'] if search_indexes else None)
+metrics.registry.gauge('securevault_search_index_bytes', "Estimated memory used by per-session search indexes",
+                       lambda: search_indexes.stats()['bytes'] if search_indexes else None)
+metrics.registry.gauge('securevault_admission_active', "Requests holding an admission slot",
+                       admission_stat('active'), labelnames=('lane',))
+metrics.registry.gauge('securevault_admission_queued', "Requests waiting for an admission slot",
+                       admission_stat('queued'), labelnames=('lane',))
+metrics.registry.gauge('securevault_write_queue_pending', "Writes waiting for the group-commit writer",
+                       write_queue_stat('pending'))
+metrics.registry.gauge('securevault_write_queue_groups_total', "Group commits performed by the writer",
+                       write_queue_stat('groups'), 'counter')
 
 
 class UserCreate(BaseModel):
@@ -73,6 +225,10 @@ class UserLogin(BaseModel):
     password: str = Field(..., min_length=8, max_length=128)
 
 
+class UsernameCheckRequest(BaseModel):
+    usernames: List[str] = Field(..., min_length=1, max_length=MAX_USERNAME_CHECK_BATCH)
+
+
 class VaultEntryCreate(BaseModel):
     service_name: str = Field(..., min_length=1, max_length=100)
     username: str = Field(..., min_length=1, max_length=100)
@@ -85,6 +241,10 @@ class VaultEntryUpdate(BaseModel):
     notes: Optional[str] = Field(None, max_length=500)
 
 
+class KeyRotationRequest(BaseModel):
+    password: str = Field(..., min_length=8, max_length=128)
+
+
 class UserResponse(BaseModel):
     id: int
     username: str
@@ -100,16 +260,222 @@ class VaultEntryResponse(BaseModel):
     updated_at: str
 
 
+class VaultEntryMetadataResponse(BaseModel):
+    id: int
+    service_name: str
+    username: str
+    created_at: str
+    updated_at: str
+
+
+class VaultSyncResponse(BaseModel):
+    cursor: int
+    full: bool
+    entries: List[VaultEntryResponse]
+    deleted: List[int]
+
+
+class VaultEntrySecretResponse(BaseModel):
+    id: int
+    password: Optional[str] = None
+    notes: Optional[str] = None
+
+
 def get_current_session(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
-    session = active_sessions.get(credentials.credentials)
+    session = session_store.get(credentials.credentials)
     if not session:
         raise HTTPException(status_code=401, detail="Invalid session")
     return session
 
 
-def create_session_token(user_id: int, username: str, password: str) -> str:
-    token_data = f"session_{user_id}_{hash(username + password)}"
-    return hashlib.sha256(token_data.encode()).hexdigest()
+def no_session() -> None:
+    return None
+
+
+def admission_slot(lane: str, authenticate: Callable[..., Any] = no_session):
+    # Authentication resolves first, so requests with bogus tokens never occupy a lane slot
+    async def hold_slot(_: Any = Depends(authenticate)):
+        if admission is None:
+            yield
+            return
+        try:
+            started = await admission.acquire(lane)
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=e.status_code, detail="Server busy, retry later",
+                                headers={"Retry-After": str(e.retry_after)})
+        try:
+            yield
+        finally:
+            admission.release(lane, started)
+    return Depends(hold_slot)
+
+
+VAULT_SLOT = admission_slot(VAULT_LANE, get_current_session)
+KDF_SLOT = admission_slot(KDF_LANE)
+KDF_SESSION_SLOT = admission_slot(KDF_LANE, get_current_session)
+
+
+def route_label(request: Request) -> str:
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.exception_handler(PoolTimeoutError)
+async def database_busy(request: Request, exc: PoolTimeoutError):
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry later"},
+                        headers={"Retry-After": "1"})
+
+
+@app.exception_handler(CipherWipedError)
+async def session_key_wiped(request: Request, exc: CipherWipedError):
+    return JSONResponse(status_code=401, content={"detail": "Invalid session"})
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    timing_token = None
+    if debug_timing and request.headers.get(DEBUG_TIMING_HEADER):
+        timings, timing_token = metrics.start_request_timing()
+
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        if timing_token is not None:
+            metrics.stop_request_timing(timing_token)
+    elapsed = time.perf_counter() - start
+
+    route = route_label(request)
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route)
+    if timing_token is not None:
+        response.headers["Server-Timing"] = metrics.format_server_timing(timings, elapsed)
+    return response
+
+
+def encode_cursor(cursor: Tuple[str, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode().rstrip('=')
+
+
+def list_headers(etag: Optional[str], cursor: Optional[Tuple[str, int]] = None) -> Dict[str, str]:
+    headers = {"Cache-Control": "no-store"}
+    if etag:
+        headers["ETag"] = etag
+    if cursor:
+        headers["X-Next-Cursor"] = encode_cursor(cursor)
+    return headers
+
+
+def vault_etag(user_id: int, request: Request) -> Optional[str]:
+    version = vault_manager.get_vault_version(user_id)
+    if version is None:
+        return None
+    variant = hashlib.sha256(f"{user_id}:{request.url.query}".encode()).hexdigest()[:16]
+    return f'"{version}-{variant}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    if not cursor:
+        return None
+    try:
+        service_name, entry_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(service_name), int(entry_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return json_codec.dumps(content)
+
+
+def stream_entries_ndjson(entries: Iterator[VaultEntry]) -> Iterator[bytes]:
+    for entry in entries:
+        yield json_codec.dumps(entry) + b"\n"
+
+
+async def spool_request_body(request: Request) -> tempfile.SpooledTemporaryFile:
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_IMPORT_BYTES:
+            spool.close()
+            raise HTTPException(status_code=413, detail="Import file too large")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def open_session(login_result: Dict[str, Any]) -> str:
+    session_token = session_store.create(login_result['user'], login_result['master_key'],
+                                         login_result['previous_keys'], login_result['key_version'])
+    resume_key_rotation(login_result)
+    return session_token
+
+
+def resume_key_rotation(login_result: Dict[str, Any]):
+    if not login_result['previous_keys']:
+        return
+    cipher = crypto_utils.create_cipher_context(login_result['master_key'], login_result['previous_keys'],
+                                                login_result['key_version'])
+    if not key_rotator.start(login_result['user']['id'], cipher):
+        cipher.wipe()
+
+
+def import_spooled_entries(spool: tempfile.SpooledTemporaryFile, data_format: str,
+                           user_id: int, cipher, progress=None) -> Dict[str, Any]:
+    with spool, io.TextIOWrapper(spool, encoding='utf-8-sig', newline='') as stream:
+        return vault_manager.import_entries(
+            user_id, vault_io.iter_import_rows(stream, data_format), cipher, progress=progress
+        )
+
+
+def run_import_job(job: Job, spool: tempfile.SpooledTemporaryFile, data_format: str, cipher) -> Dict[str, Any]:
+    return import_spooled_entries(spool, data_format, job.user_id, cipher, job.progress)
+
+
+def cleanup_import_job(spool: tempfile.SpooledTemporaryFile, data_format: str, cipher):
+    spool.close()
+    cipher.wipe()
+
+
+def run_delete_account_job(job: Job) -> Dict[str, Any]:
+    total = vault_manager.count_entries(job.user_id)
+    deleted = 0
+    job.progress(deleted, total)
+    while True:
+        removed = vault_manager.delete_entries_batch(job.user_id, ACCOUNT_DELETE_BATCH_SIZE)
+        if not removed:
+            break
+        deleted += removed
+        job.progress(deleted)
+
+    if not auth_manager.delete_user(job.user_id):
+        raise RuntimeError("Failed to delete account")
+    session_store.delete_user(job.user_id)
+    search_indexes.discard_user(job.user_id)
+    return {'deleted_entries': deleted}
+
+
+def submit_job(user_id: int, kind: str, context: Optional[Dict[str, Any]] = None) -> str:
+    try:
+        return job_queue.submit(user_id, kind, context=context)
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
 
 @app.get("/")
@@ -117,26 +483,28 @@ async def root():
     return {"message": "Secure Vault API is running", "version": "1.0.0"}
 
 
-@app.post("/api/register", response_model=Dict[str, str])
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    body = await run_in_threadpool(metrics.registry.render)
+    return Response(body, media_type=metrics.MetricsRegistry.CONTENT_TYPE)
+
+
+@app.post("/api/register", response_model=Dict[str, str], dependencies=[KDF_SLOT])
 async def register(user: UserCreate):
-    success = auth_manager.register_user(user.username, user.password)
+    success = await auth_manager.register_user_async(user.username, user.password)
     if not success:
         raise HTTPException(status_code=400, detail="Username already exists")
     
     return {"message": "User registered successfully"}
 
 
-@app.post("/api/login", response_model=Dict[str, Any])
+@app.post("/api/login", response_model=Dict[str, Any], dependencies=[KDF_SLOT])
 async def login(user: UserLogin):
-    result = auth_manager.login_user(user.username, user.password)
+    result = await auth_manager.login_user_async(user.username, user.password)
     if not result:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    session_token = create_session_token(result['user']['id'], user.username, user.password)
-    active_sessions[session_token] = {
-        'user': result['user'],
-        'master_key': result['master_key']
-    }
+    session_token = await run_in_threadpool(open_session, result)
     
     return {
         "message": "Login successful",
@@ -147,21 +515,23 @@ async def login(user: UserLogin):
 
 @app.get("/api/check-username/{username}")
 async def check_username(username: str):
-    existing_user = db_manager.fetch_one(
-        "SELECT id FROM users WHERE username = ?", (username,)
-    )
-    return {"available": existing_user is None}
+    return {"available": not await run_in_threadpool(auth_manager.usernames.is_taken, username)}
+
 
+@app.post("/api/check-username")
+async def check_usernames(request: UsernameCheckRequest):
+    return {"available": await run_in_threadpool(auth_manager.usernames.availability, request.usernames)}
 
-@app.post("/api/vault/entries", response_model=Dict[str, str])
+
+@app.post("/api/vault/entries", response_model=Dict[str, str], dependencies=[VAULT_SLOT])
 async def create_vault_entry(entry: VaultEntryCreate, session: Dict[str, Any] = Depends(get_current_session)):
-    success = vault_manager.add_entry(
+    success = await vault_manager.add_entry_async(
         session['user']['id'],
         entry.service_name,
         entry.username,
         entry.password,
         entry.notes,
-        session['master_key']
+        session['cipher']
     )
     
     if not success:
@@ -170,83 +540,243 @@ async def create_vault_entry(entry: VaultEntryCreate, session: Dict[str, Any] =
     return {"message": "Entry created successfully"}
 
 
-@app.get("/api/vault/entries", response_model=List[VaultEntryResponse])
-async def get_vault_entries(session: Dict[str, Any] = Depends(get_current_session)):
-    entries = vault_manager.get_all_entries(session['user']['id'], session['master_key'])
-    return [
-        VaultEntryResponse(
-            id=entry['id'],
-            service_name=entry['service_name'],
-            username=entry['username'],
-            password=entry['password'],
-            notes=entry['notes'],
-            created_at=str(entry['created_at']),
-            updated_at=str(entry['updated_at'])
+@app.get("/api/vault/entries",
+         response_model=Union[List[VaultEntryResponse], List[VaultEntryMetadataResponse]], dependencies=[VAULT_SLOT])
+async def get_vault_entries(request: Request,
+                            limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                            cursor: Optional[str] = None,
+                            stream: bool = False,
+                            metadata: bool = False,
+                            session: Dict[str, Any] = Depends(get_current_session)):
+    after = decode_cursor(cursor)
+    etag = await run_in_threadpool(vault_etag, session['user']['id'], request)
+    if etag and etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=list_headers(etag))
+
+    if metadata:
+        entries, next_cursor = await run_in_threadpool(
+            vault_manager.get_entries_metadata, session['user']['id'], limit, after
         )
-        for entry in entries
-    ]
+        with metrics.stage('api.serialize'):
+            return FastJSONResponse(entries, headers=list_headers(etag, next_cursor))
+
+    if stream:
+        entries = vault_manager.iter_entries(session['user']['id'], session['cipher'], after)
+        if limit:
+            entries = itertools.islice(entries, limit)
+        return StreamingResponse(stream_entries_ndjson(entries), media_type="application/x-ndjson",
+                                 headers=list_headers(etag))
+
+    if limit is None and after is None:
+        entries = await run_in_threadpool(vault_manager.get_all_entries, session['user']['id'], session['cipher'])
+        with metrics.stage('api.serialize'):
+            return FastJSONResponse(entries, headers=list_headers(etag))
+
+    entries, next_cursor = await run_in_threadpool(
+        vault_manager.get_entries_page, session['user']['id'], session['cipher'], limit or MAX_PAGE_SIZE, after
+    )
+    with metrics.stage('api.serialize'):
+        return FastJSONResponse(entries, headers=list_headers(etag, next_cursor))
+
+
+@app.get("/api/vault/sync", response_model=VaultSyncResponse, dependencies=[VAULT_SLOT])
+async def sync_vault_entries(since: Optional[int] = Query(None, ge=0),
+                             session: Dict[str, Any] = Depends(get_current_session)):
+    changes = await run_in_threadpool(vault_manager.get_changes, session['user']['id'], session['cipher'], since)
+    with metrics.stage('api.serialize'):
+        return FastJSONResponse(changes)
+
+
+@app.post("/api/vault/import", dependencies=[VAULT_SLOT])
+async def import_vault_entries(request: Request, response: Response,
+                               format: Optional[str] = Query(None, pattern="^(csv|ndjson|json)$"),
+                               background: bool = False,
+                               session: Dict[str, Any] = Depends(get_current_session)):
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    data_format = format or IMPORT_CONTENT_TYPES.get(content_type)
+    if not data_format:
+        raise HTTPException(status_code=415, detail="Unsupported import format")
+
+    spool = await spool_request_body(request)
+    if background:
+        cipher = crypto_utils.create_cipher_context(session['cipher'].master_key,
+                                                    key_version=session['cipher'].key_version)
+        try:
+            job_id = await run_in_threadpool(submit_job, session['user']['id'], IMPORT_JOB,
+                                             {'spool': spool, 'data_format': data_format, 'cipher': cipher})
+        except HTTPException:
+            cleanup_import_job(spool, data_format, cipher)
+            raise
+        response.status_code = 202
+        return {"message": "Import started", "job_id": job_id}
+
+    return await run_in_threadpool(
+        import_spooled_entries, spool, data_format, session['user']['id'], session['cipher']
+    )
+
+
+@app.get("/api/vault/export", dependencies=[VAULT_SLOT])
+async def export_vault_entries(format: str = Query('csv', pattern="^(csv|ndjson)$"),
+                               session: Dict[str, Any] = Depends(get_current_session)):
+    entries = vault_manager.iter_entries(session['user']['id'], session['cipher'])
+    exporter = vault_io.export_csv if format == 'csv' else vault_io.export_ndjson
+    return StreamingResponse(
+        exporter(entries),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="vault-export.{format}"'}
+    )
 
 
-@app.get("/api/vault/entries/{service_name}")
+@app.get("/api/vault/search", response_model=List[VaultEntryMetadataResponse], dependencies=[VAULT_SLOT])
+async def search_vault_entries(q: str = Query(..., min_length=1, max_length=100),
+                               limit: int = Query(20, ge=1, le=100),
+                               full_text: bool = False,
+                               credentials: HTTPAuthorizationCredentials = Depends(security),
+                               session: Dict[str, Any] = Depends(get_current_session)):
+    if not full_text:
+        entries = await run_in_threadpool(vault_manager.search_entries, session['user']['id'], q, limit)
+        return FastJSONResponse(entries)
+
+    if not search_indexes.enabled:
+        raise HTTPException(status_code=400, detail="Full-text search is disabled")
+    entries = await run_in_threadpool(
+        search_indexes.search, session_store.session_key(credentials.credentials), vault_manager,
+        session['user']['id'], session['cipher'], q, limit
+    )
+    return FastJSONResponse(entries)
+
+
+@app.get("/api/vault/entries/{service_name}", dependencies=[VAULT_SLOT])
 async def get_vault_entry_by_service(service_name: str, session: Dict[str, Any] = Depends(get_current_session)):
-    entry = vault_manager.get_entry_by_service(session['user']['id'], service_name, session['master_key'])
+    entry = await run_in_threadpool(
+        vault_manager.get_entry_by_service, session['user']['id'], service_name, session['cipher']
+    )
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
-    return VaultEntryResponse(
-        id=entry['id'],
-        service_name=entry['service_name'],
-        username=entry['username'],
-        password=entry['password'],
-        notes=entry['notes'],
-        created_at=str(entry['created_at']),
-        updated_at=str(entry['updated_at'])
+    return FastJSONResponse(entry)
+
+
+@app.get("/api/vault/entries/{entry_id}/secret", response_model=VaultEntrySecretResponse, dependencies=[VAULT_SLOT])
+async def reveal_vault_entry_secret(entry_id: int, field: Optional[str] = Query(None, pattern="^(password|notes)$"),
+                                    session: Dict[str, Any] = Depends(get_current_session)):
+    fields = (field,) if field else ('password', 'notes')
+    secret = await run_in_threadpool(
+        vault_manager.reveal_entry_secret, session['user']['id'], entry_id, session['cipher'], fields
     )
+    if not secret:
+        raise HTTPException(status_code=404, detail="Entry not found")
+
+    return VaultEntrySecretResponse(**secret)
 
 
-@app.put("/api/vault/entries/{entry_id}")
+@app.put("/api/vault/entries/{entry_id}", dependencies=[VAULT_SLOT])
 async def update_vault_entry(entry_id: int, entry: VaultEntryUpdate, session: Dict[str, Any] = Depends(get_current_session)):
-    success = vault_manager.update_entry(
+    success = await vault_manager.update_entry_async(
         session['user']['id'],
         entry_id,
         entry.password,
         entry.notes,
-        session['master_key']
+        session['cipher']
     )
     
+    if success is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
     if not success:
         raise HTTPException(status_code=500, detail="Failed to update entry")
     
     return {"message": "Entry updated successfully"}
 
 
-@app.delete("/api/vault/entries/{entry_id}")
+@app.delete("/api/vault/entries/{entry_id}", dependencies=[VAULT_SLOT])
 async def delete_vault_entry(entry_id: int, session: Dict[str, Any] = Depends(get_current_session)):
-    success = vault_manager.delete_entry(session['user']['id'], entry_id)
+    success = await vault_manager.delete_entry_async(session['user']['id'], entry_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete entry")
     
     return {"message": "Entry deleted successfully"}
 
 
-@app.delete("/api/user/delete")
-async def delete_user_account(user: UserLogin, session: Dict[str, Any] = Depends(get_current_session)):
-    auth_result = auth_manager.login_user(user.username, user.password)
-    if not auth_result or auth_result['user']['id'] != session['user']['id']:
+@app.delete("/api/user/delete", dependencies=[KDF_SESSION_SLOT])
+async def delete_user_account(user: UserLogin, response: Response,
+                              session: Dict[str, Any] = Depends(get_current_session)):
+    if not await auth_manager.verify_password_async(session['user']['id'], user.username, user.password):
         raise HTTPException(status_code=401, detail="Invalid password")
-    
-    db_manager.execute_query("DELETE FROM vault_entries WHERE user_id = ?", (session['user']['id'],))
-    success = db_manager.execute_query("DELETE FROM users WHERE id = ?", (session['user']['id'],))
-    
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to delete account")
-    
-    return {"message": "Account deleted successfully"}
+
+    user_id = session['user']['id']
+    job_id = await run_in_threadpool(submit_job, user_id, DELETE_ACCOUNT_JOB)
+    status_token = await run_in_threadpool(job_queue.issue_status_token, job_id)
+    await run_in_threadpool(auth_manager.mark_user_deleted, user_id)
+    await run_in_threadpool(session_store.delete_user, user_id)
+
+    response.status_code = 202
+    return {"message": "Account deletion started", "job_id": job_id, "status_token": status_token}
+
+
+@app.get("/api/jobs", dependencies=[VAULT_SLOT])
+async def list_jobs(session: Dict[str, Any] = Depends(get_current_session)):
+    return await run_in_threadpool(job_queue.list_jobs, session['user']['id'])
+
+
+@app.get("/api/jobs/{job_id}", dependencies=[VAULT_SLOT])
+async def get_job(job_id: str, session: Dict[str, Any] = Depends(get_current_session)):
+    job = await run_in_threadpool(job_queue.get, job_id, session['user']['id'])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/status")
+async def get_job_status(job_id: str, x_job_token: str = Header(...)):
+    job = await run_in_threadpool(job_queue.get_with_status_token, job_id, x_job_token)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/jobs/{job_id}/cancel", dependencies=[VAULT_SLOT])
+async def cancel_job(job_id: str, session: Dict[str, Any] = Depends(get_current_session)):
+    try:
+        job = await run_in_threadpool(job_queue.cancel, job_id, session['user']['id'])
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/user/rotate-key", dependencies=[KDF_SESSION_SLOT])
+async def rotate_master_key(request: KeyRotationRequest, session: Dict[str, Any] = Depends(get_current_session)):
+    user = session['user']
+    if await run_in_threadpool(key_rotator.status, user['id']):
+        raise HTTPException(status_code=409, detail="Key rotation already in progress")
+
+    result = await auth_manager.rotate_master_key_async(user['id'], user['username'], request.password)
+    if not result:
+        raise HTTPException(status_code=401, detail="Invalid password")
+
+    await run_in_threadpool(session_store.delete_user, user['id'])
+    search_indexes.discard_user(user['id'])
+    session_token = await run_in_threadpool(open_session, result)
+
+    return {
+        "message": "Key rotation started",
+        "token": session_token,
+        "key_version": result['key_version']
+    }
+
+
+@app.get("/api/user/rotate-key", dependencies=[VAULT_SLOT])
+async def get_key_rotation_status(session: Dict[str, Any] = Depends(get_current_session)):
+    rotation = await run_in_threadpool(key_rotator.status, session['user']['id'])
+    if not rotation:
+        return {"in_progress": False}
+    return {"in_progress": True, **rotation}
 
 
 @app.post("/api/logout")
 async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    active_sessions.pop(credentials.credentials, None)
+    await run_in_threadpool(session_store.delete, credentials.credentials)
     return {"message": "Logged out successfully"}
 
 
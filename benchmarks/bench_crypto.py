@@ -0,0 +1,39 @@
+from typing import Dict, Any
+from common import time_call
+from crypto_utils import CryptoUtils
+
+PASSWORD = "benchmark-password"
+PAYLOAD = "correct horse battery staple"
+BATCH = 1000
+
+
+def run(quick: bool = False) -> Dict[str, Dict[str, Any]]:
+    crypto = CryptoUtils()
+    salt = crypto.generate_salt()
+    master_key = crypto.generate_key()
+    cipher = crypto.create_cipher_context(master_key)
+    credentials = crypto.create_user_credentials(PASSWORD, master_key)
+    token = cipher.encrypt(PAYLOAD)
+    sealed = cipher.encrypt_entry(PAYLOAD, PAYLOAD)
+    notes_token = cipher.encrypt(PAYLOAD)
+    kdf_repeat = 3 if quick else 10
+    batch_repeat = 3 if quick else 20
+
+    return {
+        'crypto.kdf.login_keys': time_call(lambda: crypto.derive_login_keys(PASSWORD, salt), kdf_repeat),
+        'crypto.kdf.legacy_pbkdf2': time_call(lambda: crypto.derive_key_from_password(PASSWORD, salt), kdf_repeat),
+        'crypto.unlock_master_key': time_call(lambda: crypto.unlock_master_key(
+            PASSWORD, credentials['auth_scheme'], credentials['password_hash'],
+            credentials['master_key_salt'], credentials['encrypted_master_key'], credentials['kdf_params']
+        ), kdf_repeat),
+        'crypto.encrypt_x1000': time_call(lambda: [cipher.encrypt(PAYLOAD) for _ in range(BATCH)],
+                                          batch_repeat, BATCH),
+        'crypto.decrypt_x1000': time_call(lambda: [cipher.decrypt(token) for _ in range(BATCH)],
+                                          batch_repeat, BATCH),
+        'crypto.entry_v1_decrypt_x1000': time_call(lambda: [(cipher.decrypt(token), cipher.decrypt(notes_token))
+                                                             for _ in range(BATCH)], batch_repeat, BATCH),
+        'crypto.entry_v2_decrypt_x1000': time_call(lambda: [cipher.decrypt_entry(sealed) for _ in range(BATCH)],
+                                                   batch_repeat, BATCH),
+        'crypto.decrypt_uncached_x1000': time_call(lambda: [crypto.decrypt_data(token, master_key)
+                                                            for _ in range(BATCH)], batch_repeat, BATCH),
+    }
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+from typing import Dict, Any, Sequence
+from common import time_call
+from crypto_utils import CryptoUtils
+from database_manager_sqlite import DatabaseManager
+from vault_manager import VaultManager
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+PAGE_SIZE = 50
+
+
+def _seed(db: DatabaseManager, vault: VaultManager, cipher, size: int) -> int:
+    db.execute_query(
+        """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+           VALUES (?, ?, ?, ?, ?)""",
+        ("bench", b"h", b"s", b"m", b"k")
+    )
+    user_id = db.fetch_one("SELECT id FROM users WHERE username = ?", ("bench",))[0]
+    rows = (
+        {'service_name': f"service-{i:06d}.example.com", 'username': f"user{i}",
+         'password': f"password-{i}", 'notes': f"notes for entry {i}"}
+        for i in range(size)
+    )
+    vault.import_entries(user_id, rows, cipher)
+    return user_id
+
+
+def bench_size(size: int, quick: bool) -> Dict[str, Dict[str, Any]]:
+    temp_dir = tempfile.mkdtemp()
+    db = DatabaseManager(os.path.join(temp_dir, 'bench.db'))
+    db.initialize_db()
+    crypto = CryptoUtils()
+    vault = VaultManager(db, crypto)
+    cipher = crypto.create_cipher_context(crypto.generate_key())
+
+    try:
+        user_id = _seed(db, vault, cipher, size)
+        list_repeat = 3 if quick or size >= 10000 else 10
+        point_repeat = 20 if quick else 100
+        prefix = f"vault.{size}"
+        counter = iter(range(10 ** 9))
+
+        return {
+            f"{prefix}.get_all_entries": time_call(lambda: vault.get_all_entries(user_id, cipher), list_repeat),
+            f"{prefix}.metadata_listing": time_call(lambda: vault.get_entries_metadata(user_id), list_repeat),
+            f"{prefix}.first_page": time_call(lambda: vault.get_entries_page(user_id, cipher, PAGE_SIZE),
+                                              point_repeat),
+            f"{prefix}.search": time_call(lambda: vault.search_entries(user_id, "ice-0001"), point_repeat),
+            f"{prefix}.add_entry": time_call(lambda: vault.add_entry(
+                user_id, f"added-{next(counter)}", "user", "password", "", cipher), point_repeat),
+            f"{prefix}.fetch_one": time_call(lambda: db.fetch_one(
+                "SELECT id FROM users WHERE username = ?", ("bench",)), point_repeat),
+        }
+    finally:
+        vault.close()
+        db.close()
+        shutil.rmtree(temp_dir)
+
+
+def run(quick: bool = False, sizes: Sequence[int] = DEFAULT_SIZES) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for size in sizes:
+        results.update(bench_size(size, quick))
+    return results
@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples_ms: List[float], operations: int = 1, errors: int = 0) -> Dict[str, Any]:
+    total_s = sum(samples_ms) / 1000
+    return {
+        'count': len(samples_ms),
+        'errors': errors,
+        'p50_ms': round(percentile(samples_ms, 0.50), 3),
+        'p90_ms': round(percentile(samples_ms, 0.90), 3),
+        'p99_ms': round(percentile(samples_ms, 0.99), 3),
+        'max_ms': round(max(samples_ms), 3) if samples_ms else 0.0,
+        'ops_per_s': round(len(samples_ms) * operations / total_s, 1) if total_s else 0.0,
+    }
+
+
+def time_call(func: Callable[[], Any], repeat: int, operations: int = 1) -> Dict[str, Any]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples, operations)
+
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    print(f"{'benchmark':<40} {'count':>7} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'ops/s':>12}")
+    for name, stats in results.items():
+        print(f"{name:<40} {stats['count']:>7} {stats['p50_ms']:>10.3f} {stats['p90_ms']:>10.3f} "
+              f"{stats['p99_ms']:>10.3f} {stats['ops_per_s']:>12.1f}")
+
+
+def save_results(results: Dict[str, Dict[str, Any]], path: str):
+    with open(path, 'w') as results_file:
+        json.dump({'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results},
+                  results_file, indent=2, sort_keys=True)
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, Any]], path: str, tolerance: float,
+                          metric: str = 'p50_ms') -> List[str]:
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+
+    regressions = []
+    for name, stats in results.items():
+        reference: Optional[Dict[str, Any]] = baseline.get(name)
+        if not reference or not reference.get(metric):
+            continue
+        ratio = stats[metric] / reference[metric]
+        marker = 'REGRESSION' if ratio > 1 + tolerance else 'ok'
+        print(f"{name:<40} {reference[metric]:>10.3f} -> {stats[metric]:>10.3f} ({ratio:>5.2f}x) {marker}")
+        if marker != 'ok':
+            regressions.append(name)
+    return regressions
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import random
+import shutil
+import asyncio
+import tempfile
+from typing import Dict, Any, List, Optional, Tuple
+from common import summarize
+
+DEFAULT_MIX = {'list': 6, 'add': 3, 'login': 1}
+PASSWORD = "load-test-password"
+
+
+class AsgiClient:
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, body: Optional[Any] = None,
+                      token: Optional[str] = None) -> Tuple[int, bytes]:
+        payload = json.dumps(body).encode() if body is not None else b''
+        path, _, query = path.partition('?')
+        headers = [
+            (b'host', b'load-test'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+        ]
+        if token:
+            headers.append((b'authorization', f"Bearer {token}".encode()))
+
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': ('load-test', 80),
+        }
+        request_sent = False
+        response = {'status': 0, 'body': []}
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': payload, 'more_body': False}
+            await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return response['status'], b''.join(response['body'])
+
+
+class LoadTest:
+    def __init__(self, client: AsgiClient, users: int, concurrency: int, requests: int,
+                 seed_entries: int, mix: Dict[str, int]):
+        self.client = client
+        self.users = users
+        self.concurrency = concurrency
+        self.requests = requests
+        self.seed_entries = seed_entries
+        self.mix = mix
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.tokens: List[Tuple[str, str]] = []
+
+    async def timed(self, operation: str, method: str, path: str, body: Optional[Any] = None,
+                    token: Optional[str] = None) -> Tuple[int, bytes]:
+        start = time.perf_counter()
+        status, payload = await self.client.request(method, path, body, token)
+        self.samples.setdefault(operation, []).append((time.perf_counter() - start) * 1000)
+        if status >= 400:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+        return status, payload
+
+    async def setup_user(self, index: int):
+        username = f"load-user-{index}"
+        credentials = {'username': username, 'password': PASSWORD}
+        await self.timed('api.register', 'POST', '/api/register', credentials)
+        status, payload = await self.timed('api.login', 'POST', '/api/login', credentials)
+        if status != 200:
+            raise RuntimeError(f"Login failed for {username}: {payload!r}")
+        token = json.loads(payload)['token']
+
+        for entry in range(self.seed_entries):
+            await self.client.request('POST', '/api/vault/entries', {
+                'service_name': f"seed-{entry:05d}", 'username': username,
+                'password': f"password-{entry}", 'notes': ""
+            }, token)
+        self.tokens.append((username, token))
+
+    async def worker(self, operations: List[str], rng: random.Random):
+        for operation in operations:
+            username, token = rng.choice(self.tokens)
+            if operation == 'list':
+                await self.timed('api.list', 'GET', '/api/vault/entries', token=token)
+            elif operation == 'metadata':
+                await self.timed('api.metadata', 'GET', '/api/vault/entries?metadata=true', token=token)
+            elif operation == 'add':
+                await self.timed('api.add', 'POST', '/api/vault/entries', {
+                    'service_name': f"added-{rng.random():.12f}", 'username': username,
+                    'password': "generated-password", 'notes': ""
+                }, token)
+            elif operation == 'login':
+                await self.timed('api.login', 'POST', '/api/login',
+                                 {'username': username, 'password': PASSWORD})
+
+    async def run(self) -> float:
+        await asyncio.gather(*[self.setup_user(index) for index in range(self.users)])
+
+        rng = random.Random(42)
+        population = [operation for operation, weight in self.mix.items() for _ in range(weight)]
+        operations = [rng.choice(population) for _ in range(self.requests)]
+        slices = [operations[index::self.concurrency] for index in range(self.concurrency)]
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            self.worker(chunk, random.Random(index)) for index, chunk in enumerate(slices)
+        ])
+        return time.perf_counter() - start
+
+    def results(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        results = {
+            operation: summarize(samples, errors=self.errors.get(operation, 0))
+            for operation, samples in sorted(self.samples.items())
+        }
+        results['api.throughput'] = {
+            'count': self.requests, 'errors': sum(self.errors.values()),
+            'p50_ms': 0.0, 'p90_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0,
+            'ops_per_s': round(self.requests / elapsed, 1) if elapsed else 0.0,
+        }
+        return results
+
+
+async def _run_async(users: int, concurrency: int, requests: int, seed_entries: int,
+                     mix: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        load_test = LoadTest(AsgiClient(main.app), users, concurrency, requests, seed_entries, mix)
+        elapsed = await load_test.run()
+        return load_test.results(elapsed)
+
+
+def run(users: int = 8, concurrency: int = 16, requests: int = 500, seed_entries: int = 50,
+        mix: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+    temp_dir = tempfile.mkdtemp()
+    os.environ['DB_PATH'] = os.path.join(temp_dir, 'load_test.db')
+    os.environ['SESSION_BACKEND'] = 'memory'
+    try:
+        return asyncio.run(_run_async(users, concurrency, requests, seed_entries, mix or DEFAULT_MIX))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
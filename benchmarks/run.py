@@ -0,0 +1,68 @@
+import sys
+import argparse
+import logging
+from common import print_results, save_results, compare_with_baseline
+
+SUITES = ('crypto', 'storage', 'api')
+
+
+def parse_mix(value: str):
+    mix = {}
+    for part in value.split(','):
+        operation, _, weight = part.partition('=')
+        mix[operation.strip()] = int(weight or 1)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Secure Vault benchmarks and load test")
+    parser.add_argument('--suite', default=','.join(SUITES),
+                        help="comma-separated suites to run: crypto, storage, api")
+    parser.add_argument('--quick', action='store_true', help="fewer repetitions, for smoke runs")
+    parser.add_argument('--sizes', default='10,100,1000,10000',
+                        help="vault sizes for the storage suite, e.g. 10,1000,100000")
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--seed-entries', type=int, default=50)
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help="operation weights for the api suite, e.g. list=6,add=3,login=1,metadata=2")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--save-baseline', help="write results as the new baseline file")
+    parser.add_argument('--compare', help="baseline file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed p50 slowdown before a benchmark counts as a regression")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    suites = [suite.strip() for suite in args.suite.split(',') if suite.strip()]
+    results = {}
+
+    if 'crypto' in suites:
+        import bench_crypto
+        results.update(bench_crypto.run(args.quick))
+    if 'storage' in suites:
+        import bench_storage
+        results.update(bench_storage.run(args.quick, [int(size) for size in args.sizes.split(',')]))
+    if 'api' in suites:
+        import load_test
+        results.update(load_test.run(args.users, args.concurrency, args.requests,
+                                     args.seed_entries, args.mix))
+
+    print_results(results)
+
+    if args.output:
+        save_results(results, args.output)
+    if args.save_baseline:
+        save_results(results, args.save_baseline)
+    if args.compare:
+        print()
+        regressions = compare_with_baseline(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
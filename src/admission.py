@@ -0,0 +1,167 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Tuple, Any
+from metrics import registry
+
+VAULT_LANE = 'vault'
+KDF_LANE = 'kdf'
+
+ADMISSION_REJECTED = registry.counter(
+    'securevault_admission_rejected_total', "Requests shed by admission control", ('lane', 'reason')
+)
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    'securevault_admission_wait_seconds', "Time requests spent queued for an admission slot", ('lane',)
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, lane: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{lane} lane rejected request: {reason}")
+        self.lane = lane
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Lane:
+    SERVICE_TIME_SMOOTHING = 0.2
+
+    def __init__(self, name: str, limit: int, priority: int, max_queue: int, max_wait: float,
+                 status_code: int = 503, service_time: float = 0.1):
+        self.name = name
+        self.limit = max(1, limit)
+        self.priority = priority
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.status_code = status_code
+        self.service_time = service_time
+        self.active = 0
+        self.queued = 0
+
+    def observe(self, seconds: float):
+        self.service_time += self.SERVICE_TIME_SMOOTHING * (seconds - self.service_time)
+
+    def retry_after(self, max_seconds: int) -> int:
+        backlog = (self.queued + self.active + 1) / self.limit
+        return min(max_seconds, max(1, math.ceil(backlog * self.service_time)))
+
+
+class AdmissionController:
+    MAX_RETRY_AFTER = 30
+
+    def __init__(self, max_active: int):
+        self.max_active = max(1, max_active)
+        self.active = 0
+        self.lanes: Dict[str, Lane] = {}
+        self._waiters: List[Tuple[int, int, Lane, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def add_lane(self, name: str, limit: int, priority: int, max_queue: int, max_wait: float,
+                 status_code: int = 503) -> Lane:
+        lane = Lane(name, min(limit, self.max_active), priority, max_queue, max_wait, status_code)
+        self.lanes[name] = lane
+        return lane
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {'active': lane.active, 'queued': lane.queued, 'limit': lane.limit,
+                   'service_time': lane.service_time}
+            for name, lane in self.lanes.items()
+        }
+
+    async def acquire(self, lane_name: str) -> float:
+        lane = self.lanes[lane_name]
+        started = time.monotonic()
+        if self._can_start(lane):
+            self._start(lane)
+            return started
+
+        if lane.queued >= lane.max_queue:
+            raise self._reject(lane, 'queue_full')
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane.priority, next(self._sequence), lane, future))
+        lane.queued += 1
+        try:
+            await asyncio.wait_for(future, lane.max_wait)
+        except asyncio.TimeoutError:
+            lane.queued -= 1
+            raise self._reject(lane, 'timeout')
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(lane_name)
+            else:
+                lane.queued -= 1
+            raise
+
+        admitted = time.monotonic()
+        ADMISSION_WAIT_SECONDS.observe(admitted - started, lane=lane_name)
+        return admitted
+
+    def release(self, lane_name: str, started: Optional[float] = None):
+        lane = self.lanes[lane_name]
+        if started is not None:
+            lane.observe(time.monotonic() - started)
+        lane.active -= 1
+        self.active -= 1
+        self._drain()
+
+    @asynccontextmanager
+    async def admit(self, lane_name: str):
+        started = await self.acquire(lane_name)
+        try:
+            yield
+        finally:
+            self.release(lane_name, started)
+
+    def _can_start(self, lane: Lane) -> bool:
+        return self.active < self.max_active and lane.active < lane.limit
+
+    def _start(self, lane: Lane):
+        lane.active += 1
+        self.active += 1
+
+    def _drain(self):
+        blocked = []
+        while self._waiters and self.active < self.max_active:
+            waiter = heapq.heappop(self._waiters)
+            lane, future = waiter[2], waiter[3]
+            if future.done():
+                continue
+            if lane.active >= lane.limit:
+                blocked.append(waiter)
+                continue
+            lane.queued -= 1
+            self._start(lane)
+            future.set_result(None)
+
+        for waiter in blocked:
+            heapq.heappush(self._waiters, waiter)
+
+    def _reject(self, lane: Lane, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc(lane=lane.name, reason=reason)
+        return AdmissionRejected(lane.name, lane.status_code, lane.retry_after(self.MAX_RETRY_AFTER), reason)
+
+
+def admission_from_env(kdf_workers: int) -> AdmissionController:
+    def setting(name: str, default: float) -> float:
+        value = os.environ.get(name)
+        return float(value) if value else default
+
+    max_active = int(setting('ADMISSION_MAX_ACTIVE', 64))
+    max_wait = setting('ADMISSION_MAX_WAIT_SECONDS', 5.0)
+    controller = AdmissionController(max_active)
+    controller.add_lane(
+        VAULT_LANE, int(setting('ADMISSION_VAULT_CONCURRENCY', max_active)), priority=0,
+        max_queue=int(setting('ADMISSION_VAULT_QUEUE', 256)), max_wait=max_wait, status_code=503
+    )
+    controller.add_lane(
+        KDF_LANE, int(setting('ADMISSION_KDF_CONCURRENCY', kdf_workers * 2)), priority=1,
+        max_queue=int(setting('ADMISSION_KDF_QUEUE', kdf_workers * 16)), max_wait=max_wait, status_code=429
+    )
+    return controller
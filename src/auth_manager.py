@@ -1,69 +1,203 @@
+import asyncio
 from typing import Optional, Dict, Any
 from database_manager_sqlite import DatabaseManager
 from crypto_utils import CryptoUtils
+from kdf_pool import KdfPool
+from username_index import UsernameIndex
+from metrics import timed, LOGIN_ATTEMPTS
 
 
 class AuthManager:
     MIN_USERNAME_LENGTH = 3
     MIN_PASSWORD_LENGTH = 8
 
-    def __init__(self, db_manager: DatabaseManager, crypto_utils: CryptoUtils):
+    def __init__(self, db_manager: DatabaseManager, crypto_utils: CryptoUtils,
+                 kdf_pool: Optional[KdfPool] = None, usernames: Optional[UsernameIndex] = None):
         self.db_manager = db_manager
         self.crypto_utils = crypto_utils
+        self.kdf_pool = kdf_pool or KdfPool()
+        self.usernames = usernames if usernames is not None else UsernameIndex(db_manager)
 
+    @timed('auth.register')
     def register_user(self, username: str, password: str) -> bool:
         if not self._validate_credentials(username, password):
             return False
 
-        if self._user_exists(username):
+        if self.usernames.is_taken(username):
             return False
 
-        password_hash, salt = self.crypto_utils.hash_password(password)
-        master_key = self.crypto_utils.generate_key()
-        master_key_salt = self.crypto_utils.generate_salt()
-        password_derived_key = self.crypto_utils.derive_key_from_password(password, master_key_salt)
-        encrypted_master_key = self.crypto_utils.encrypt_master_key(master_key, password_derived_key)
+        credentials = self.crypto_utils.create_user_credentials(password)
+        return self._insert_user(username, credentials)
 
-        return self.db_manager.execute_query(
-            """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
-               VALUES (?, ?, ?, ?, ?)""",
-            (username, password_hash, salt, master_key_salt, encrypted_master_key)
-        )
+    @timed('auth.register')
+    async def register_user_async(self, username: str, password: str) -> bool:
+        if not self._validate_credentials(username, password):
+            return False
+
+        if await asyncio.to_thread(self.usernames.is_taken, username):
+            return False
+
+        credentials = await self.kdf_pool.run(self.crypto_utils.create_user_credentials, password)
+        return await asyncio.to_thread(self._insert_user, username, credentials)
 
+    @timed('auth.login')
     def login_user(self, username: str, password: str) -> Optional[Dict[str, Any]]:
-        user_data = self.db_manager.fetch_one(
-            """SELECT id, username, password_hash, salt, master_key_salt, encrypted_master_key
-               FROM users WHERE username = ?""",
-            (username,)
+        user_data = self._fetch_login_record(username)
+        if not user_data:
+            LOGIN_ATTEMPTS.inc(result='failure')
+            return None
+
+        (user_id, stored_username, auth_scheme, kdf_params, password_hash, master_key_salt, encrypted_master_key,
+         retired_master_key, key_version) = user_data
+        master_key = self.crypto_utils.unlock_master_key(
+            password, auth_scheme, password_hash, master_key_salt, encrypted_master_key, kdf_params
         )
 
+        if master_key is not None and self.crypto_utils.needs_rehash(auth_scheme, kdf_params):
+            self._upgrade_credentials(
+                user_id, password_hash, self.crypto_utils.create_user_credentials(password, master_key)
+            )
+
+        return self._login_result(user_id, stored_username, master_key, key_version, retired_master_key)
+
+    @timed('auth.login')
+    async def login_user_async(self, username: str, password: str) -> Optional[Dict[str, Any]]:
+        user_data = await asyncio.to_thread(self._fetch_login_record, username)
         if not user_data:
+            LOGIN_ATTEMPTS.inc(result='failure')
+            return None
+
+        (user_id, stored_username, auth_scheme, kdf_params, password_hash, master_key_salt, encrypted_master_key,
+         retired_master_key, key_version) = user_data
+        master_key = await self.kdf_pool.run(
+            self.crypto_utils.unlock_master_key,
+            password, auth_scheme, password_hash, master_key_salt, encrypted_master_key, kdf_params
+        )
+
+        if master_key is not None and self.crypto_utils.needs_rehash(auth_scheme, kdf_params):
+            credentials = await self.kdf_pool.run(self.crypto_utils.create_user_credentials, password, master_key)
+            await asyncio.to_thread(self._upgrade_credentials, user_id, password_hash, credentials)
+
+        return self._login_result(user_id, stored_username, master_key, key_version, retired_master_key)
+
+    @timed('auth.rotate_key')
+    async def rotate_master_key_async(self, user_id: int, username: str, password: str) -> Optional[Dict[str, Any]]:
+        user_data = await asyncio.to_thread(self._fetch_login_record, username)
+        if not user_data or user_data[0] != user_id or user_data[7] is not None:
+            return None
+
+        auth_scheme, kdf_params, password_hash, master_key_salt, encrypted_master_key = user_data[2:7]
+        old_master_key = await self.kdf_pool.run(
+            self.crypto_utils.unlock_master_key,
+            password, auth_scheme, password_hash, master_key_salt, encrypted_master_key, kdf_params
+        )
+        if old_master_key is None:
+            return None
+
+        new_master_key = self.crypto_utils.generate_key()
+        credentials = await self.kdf_pool.run(self.crypto_utils.create_user_credentials, password, new_master_key)
+        key_version = await asyncio.to_thread(
+            self._store_rotated_credentials, user_id, password_hash, credentials,
+            self.crypto_utils.encrypt_master_key(old_master_key, new_master_key)
+        )
+        if key_version is None:
             return None
 
-        user_id, stored_username, password_hash, salt, master_key_salt, encrypted_master_key = user_data
+        return {
+            'user': {
+                'id': user_id,
+                'username': username
+            },
+            'master_key': new_master_key,
+            'previous_keys': [old_master_key],
+            'key_version': key_version
+        }
+
+    @timed('auth.verify')
+    async def verify_password_async(self, user_id: int, username: str, password: str) -> bool:
+        user_data = await asyncio.to_thread(self._fetch_login_record, username)
+        if not user_data or user_data[0] != user_id:
+            return False
+
+        auth_scheme, kdf_params, password_hash, master_key_salt = user_data[2:6]
+        return await self.kdf_pool.run(
+            self.crypto_utils.verify_user_password,
+            password, auth_scheme, password_hash, master_key_salt, kdf_params
+        )
+
+    def mark_user_deleted(self, user_id: int) -> bool:
+        return self.db_manager.for_user(user_id).execute_query(
+            "UPDATE users SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?", (user_id,)
+        )
 
-        if not self.crypto_utils.verify_password(password, password_hash):
+    def delete_user(self, user_id: int) -> bool:
+        row = self.db_manager.for_user(user_id).fetch_one("SELECT username FROM users WHERE id = ?", (user_id,))
+        if not self.db_manager.delete_user(user_id):
+            return False
+        if row:
+            self.usernames.discard(row[0])
+        return True
+
+    def _insert_user(self, username: str, credentials: Dict[str, Any]) -> bool:
+        inserted = self.db_manager.insert_user(dict(credentials, username=username))
+        if inserted:
+            self.usernames.add(username)
+        return inserted
+
+    def _upgrade_credentials(self, user_id: int, old_password_hash: bytes, credentials: Dict[str, Any]) -> bool:
+        assignments = ', '.join(f"{column} = ?" for column in credentials)
+        return self.db_manager.for_user(user_id).execute_query(
+            f"UPDATE users SET {assignments} WHERE id = ? AND password_hash = ?",
+            tuple(credentials.values()) + (user_id, old_password_hash)
+        )
+
+    def _store_rotated_credentials(self, user_id: int, password_hash: bytes, credentials: Dict[str, Any],
+                                   retired_master_key: bytes) -> Optional[int]:
+        assignments = ', '.join(f"{column} = ?" for column in credentials)
+        db = self.db_manager.for_user(user_id)
+        db.execute_transaction([
+            (f"""UPDATE users SET {assignments}, key_version = key_version + 1, retired_master_key = ?
+                WHERE id = ? AND password_hash = ? AND retired_master_key IS NULL""",
+             tuple(credentials.values()) + (retired_master_key, user_id, password_hash)),
+            ("""INSERT OR REPLACE INTO key_rotations (user_id, target_version)
+                SELECT id, key_version FROM users WHERE id = ? AND password_hash = ?""",
+             (user_id, credentials['password_hash'])),
+        ])
+
+        rotation = db.fetch_one("SELECT target_version FROM key_rotations WHERE user_id = ?", (user_id,))
+        stored = db.fetch_one("SELECT password_hash FROM users WHERE id = ?", (user_id,))
+        if not rotation or not stored or stored[0] != credentials['password_hash']:
             return None
+        return rotation[0]
 
-        try:
-            password_derived_key = self.crypto_utils.derive_key_from_password(password, master_key_salt)
-            master_key = self.crypto_utils.decrypt_master_key(encrypted_master_key, password_derived_key)
-        except Exception:
+    def _fetch_login_record(self, username: str) -> Optional[tuple]:
+        return self.db_manager.for_username(username).fetch_one(
+            """SELECT id, username, auth_scheme, kdf_params, password_hash, master_key_salt, encrypted_master_key,
+                      retired_master_key, key_version
+               FROM users WHERE username = ? AND deleted_at IS NULL""",
+            (username,)
+        )
+
+    def _login_result(self, user_id: int, username: str, master_key: Optional[bytes], key_version: int,
+                      retired_master_key: Optional[bytes] = None) -> Optional[Dict[str, Any]]:
+        LOGIN_ATTEMPTS.inc(result='failure' if master_key is None else 'success')
+        if master_key is None:
             return None
 
+        previous_keys = []
+        if retired_master_key:
+            previous_keys.append(self.crypto_utils.decrypt_master_key(retired_master_key, master_key))
+
         return {
             'user': {
                 'id': user_id,
-                'username': stored_username
+                'username': username
             },
-            'master_key': master_key
+            'master_key': master_key,
+            'previous_keys': previous_keys,
+            'key_version': key_version
         }
 
     def _validate_credentials(self, username: str, password: str) -> bool:
-        return (len(username) >= self.MIN_USERNAME_LENGTH and 
+        return (len(username) >= self.MIN_USERNAME_LENGTH and
                 len(password) >= self.MIN_PASSWORD_LENGTH)
-
-    def _user_exists(self, username: str) -> bool:
-        return self.db_manager.fetch_one(
-            "SELECT id FROM users WHERE username = ?", (username,)
-        ) is not None
@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import gzip
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BACKUP_SECONDS = registry.histogram(
+    'securevault_backup_seconds', "Time taken to snapshot, compress and verify a backup",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800)
+)
+BACKUP_FAILURES = registry.counter('securevault_backup_failures_total', "Backups that failed or did not verify")
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupManager:
+    DEFAULT_PAGES_PER_STEP = 256
+    DEFAULT_STEP_PAUSE = 0.005
+    DEFAULT_RETENTION = 7
+    DEFAULT_INTERVAL = 24 * 3600.0
+    CHUNK_SIZE = 1024 * 1024
+    SUFFIX = '.db.gz'
+
+    def __init__(self, db_path: str, backup_dir: str, retention: Optional[int] = None,
+                 pages_per_step: Optional[int] = None, step_pause: Optional[float] = None):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.retention = max(1, retention or self.DEFAULT_RETENTION)
+        self.pages_per_step = max(1, pages_per_step or self.DEFAULT_PAGES_PER_STEP)
+        self.step_pause = self.DEFAULT_STEP_PAUSE if step_pause is None else step_pause
+        self.stem = os.path.splitext(os.path.basename(db_path))[0]
+        self.last_backup: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._scheduler: Optional[threading.Thread] = None
+        self._stop_scheduler = threading.Event()
+
+    def create_backup(self) -> Dict[str, Any]:
+        with self._lock:
+            started = time.monotonic()
+            try:
+                manifest = self._create_backup()
+            except Exception:
+                BACKUP_FAILURES.inc()
+                raise
+            manifest['duration_seconds'] = round(time.monotonic() - started, 3)
+            self._write_manifest(manifest)
+            BACKUP_SECONDS.observe(manifest['duration_seconds'])
+            self.last_backup = manifest
+            self.prune()
+            logger.info(f"Backup {manifest['file']} written ({manifest['pages']} pages, "
+                        f"{manifest['size']} bytes, {manifest['duration_seconds']}s)")
+            return manifest
+
+    def list_backups(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.backup_dir):
+            return []
+        backups = []
+        for name in sorted(os.listdir(self.backup_dir)):
+            if (name.startswith(self.stem + '-') and name.endswith(self.SUFFIX) and
+                    os.path.exists(self._manifest_path(name))):
+                with open(self._manifest_path(name)) as f:
+                    backups.append(json.load(f))
+        return backups
+
+    def prune(self) -> int:
+        backups = self.list_backups()
+        expired = backups[:-self.retention]
+        for manifest in expired:
+            for path in (os.path.join(self.backup_dir, manifest['file']), self._manifest_path(manifest['file'])):
+                if os.path.exists(path):
+                    os.remove(path)
+        return len(expired)
+
+    def verify(self, name: str) -> Dict[str, Any]:
+        path = self._resolve(name)
+        manifest_path = self._manifest_path(os.path.basename(path))
+        if not os.path.exists(manifest_path):
+            raise BackupError(f"No manifest for {path}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        if _sha256(path) != manifest['sha256']:
+            raise BackupError(f"Checksum mismatch for {path}")
+
+        with tempfile.TemporaryDirectory(dir=self.backup_dir) as scratch:
+            snapshot = os.path.join(scratch, 'verify.db')
+            self._decompress(path, snapshot)
+            self._check_snapshot(snapshot)
+        return manifest
+
+    def restore(self, name: str, target_path: Optional[str] = None) -> Dict[str, Any]:
+        target_path = target_path or self.db_path
+        manifest = self.verify(name)
+        target_dir = os.path.dirname(os.path.abspath(target_path))
+        staged = tempfile.NamedTemporaryFile(dir=target_dir, prefix='.restore-', delete=False)
+        staged.close()
+        try:
+            self._decompress(self._resolve(name), staged.name)
+            if os.path.exists(target_path):
+                os.replace(target_path, target_path + '.pre-restore')
+            for sidecar in ('-wal', '-shm'):
+                if os.path.exists(target_path + sidecar):
+                    os.remove(target_path + sidecar)
+            os.replace(staged.name, target_path)
+        finally:
+            if os.path.exists(staged.name):
+                os.remove(staged.name)
+        return manifest
+
+    def start_scheduler(self, interval: Optional[float] = None):
+        if self._scheduler is not None:
+            return
+        interval = interval or self.DEFAULT_INTERVAL
+        self._stop_scheduler.clear()
+        self._scheduler = threading.Thread(target=self._schedule_loop, args=(interval,),
+                                           name='backup-scheduler', daemon=True)
+        self._scheduler.start()
+
+    def stop(self):
+        if self._scheduler is not None:
+            self._stop_scheduler.set()
+            self._scheduler.join()
+            self._scheduler = None
+
+    def _schedule_loop(self, interval: float):
+        while not self._stop_scheduler.wait(interval):
+            try:
+                self.create_backup()
+            except Exception as e:
+                logger.error(f"Scheduled backup failed: {e}")
+
+    def _create_backup(self) -> Dict[str, Any]:
+        os.makedirs(self.backup_dir, exist_ok=True)
+        created_at = datetime.now(timezone.utc)
+        name = f"{self.stem}-{created_at.strftime('%Y%m%dT%H%M%S%fZ')}{self.SUFFIX}"
+        path = os.path.join(self.backup_dir, name)
+
+        with tempfile.TemporaryDirectory(dir=self.backup_dir) as scratch:
+            snapshot = os.path.join(scratch, 'snapshot.db')
+            pages, schema_version = self._snapshot(snapshot)
+            self._check_snapshot(snapshot)
+            partial = path + '.partial'
+            try:
+                with open(snapshot, 'rb') as source, open(partial, 'wb') as raw:
+                    with gzip.GzipFile(filename=self.stem + '.db', mode='wb', fileobj=raw, mtime=0) as target:
+                        shutil.copyfileobj(source, target, self.CHUNK_SIZE)
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                os.replace(partial, path)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+            db_size = os.path.getsize(snapshot)
+
+        return {
+            'file': name,
+            'created_at': created_at.isoformat(),
+            'pages': pages,
+            'db_size': db_size,
+            'size': os.path.getsize(path),
+            'sha256': _sha256(path),
+            'schema_version': schema_version,
+        }
+
+    def _snapshot(self, snapshot_path: str) -> tuple:
+        source = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        target = sqlite3.connect(snapshot_path, check_same_thread=False)
+        try:
+            # Pin one WAL read snapshot for the whole copy: writers keep committing to the WAL, and the
+            # backup never restarts because of them, so its duration only depends on the database size.
+            source.execute("BEGIN")
+            schema_version = source.execute("PRAGMA user_version").fetchone()[0]
+            source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            pages = source.execute("PRAGMA page_count").fetchone()[0]
+            source.backup(target, pages=self.pages_per_step, progress=self._pace)
+            source.execute("COMMIT")
+            target.execute("PRAGMA journal_mode = DELETE")
+            return pages, schema_version
+        finally:
+            target.close()
+            source.close()
+
+    def _pace(self, status: int, remaining: int, total: int):
+        if remaining and self.step_pause:
+            time.sleep(self.step_pause)
+
+    def _check_snapshot(self, snapshot_path: str):
+        connection = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+        try:
+            result = connection.execute("PRAGMA integrity_check").fetchall()
+            if result != [('ok',)]:
+                raise BackupError(f"Integrity check failed: {result[:5]}")
+            tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if not {'users', 'vault_entries'} <= tables:
+                raise BackupError("Snapshot is missing vault tables")
+        except sqlite3.DatabaseError as e:
+            raise BackupError(f"Snapshot is not a readable database: {e}")
+        finally:
+            connection.close()
+
+    def _decompress(self, path: str, target_path: str):
+        try:
+            with gzip.open(path, 'rb') as source, open(target_path, 'wb') as target:
+                shutil.copyfileobj(source, target, self.CHUNK_SIZE)
+                target.flush()
+                os.fsync(target.fileno())
+        except (OSError, EOFError) as e:
+            raise BackupError(f"Could not decompress {path}: {e}")
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        path = self._manifest_path(manifest['file'])
+        with open(path + '.partial', 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(path + '.partial', path)
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.backup_dir, name[:-len(self.SUFFIX)] + '.json')
+
+    def _resolve(self, name: str) -> str:
+        path = name if os.path.sep in name else os.path.join(self.backup_dir, name)
+        if not os.path.exists(path):
+            raise BackupError(f"Backup not found: {name}")
+        return path
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(BackupManager.CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backup_manager_from_env(db_path: str) -> Optional[BackupManager]:
+    backup_dir = os.environ.get('BACKUP_DIR')
+    if not backup_dir:
+        return None
+    retention = os.environ.get('BACKUP_RETENTION')
+    pages_per_step = os.environ.get('BACKUP_PAGES_PER_STEP')
+    step_pause_ms = os.environ.get('BACKUP_STEP_PAUSE_MS')
+    return BackupManager(
+        db_path, backup_dir, int(retention) if retention else None,
+        int(pages_per_step) if pages_per_step else None,
+        float(step_pause_ms) / 1000 if step_pause_ms else None
+    )
+
+
+def main(argv=None) -> int:
+    default_db = os.environ.get('DB_PATH') or os.path.join(os.path.dirname(__file__), '..', 'secure_vault.db')
+    parser = argparse.ArgumentParser(description="Create, verify and restore Secure Vault database backups")
+    parser.add_argument('--db', default=default_db, help="database file (default: DB_PATH or secure_vault.db)")
+    parser.add_argument('--dir', default=os.environ.get('BACKUP_DIR', 'backups'), help="backup directory")
+    parser.add_argument('--retention', type=int, default=None, help="number of backups to keep")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('create', help="take an online backup now")
+    commands.add_parser('list', help="list backups")
+    verify_parser = commands.add_parser('verify', help="check a backup's checksum and integrity")
+    verify_parser.add_argument('backup')
+    restore_parser = commands.add_parser('restore', help="replace the database with a backup (server must be stopped)")
+    restore_parser.add_argument('backup')
+    restore_parser.add_argument('--force', action='store_true', help="overwrite an existing database")
+    args = parser.parse_args(argv)
+
+    manager = BackupManager(args.db, args.dir, args.retention)
+    try:
+        if args.command == 'create':
+            print(json.dumps(manager.create_backup(), indent=2))
+        elif args.command == 'list':
+            for manifest in manager.list_backups():
+                print(f"{manifest['file']}  {manifest['created_at']}  {manifest['size']} bytes")
+        elif args.command == 'verify':
+            manager.verify(args.backup)
+            print(f"{args.backup}: ok")
+        elif args.command == 'restore':
+            if os.path.exists(args.db) and not args.force:
+                print(f"{args.db} exists; pass --force to replace it", file=sys.stderr)
+                return 1
+            manager.restore(args.backup)
+            print(f"Restored {args.backup} to {args.db}")
+    except BackupError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
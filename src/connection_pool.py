@@ -0,0 +1,124 @@
+import sqlite3
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+from metrics import stage
+
+
+class PoolTimeoutError(TimeoutError):
+    pass
+
+
+class ConnectionPool:
+    DEFAULT_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000,
+        'cache_size': -16000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    }
+
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 10.0,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.pragmas = dict(self.DEFAULT_PRAGMAS, **(pragmas or {}))
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._closed = False
+        self._stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'created': 0, 'discarded': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = None
+
+        if connection is None:
+            with self._lock:
+                can_grow = self._size < self.max_size
+                if can_grow:
+                    self._size += 1
+            if can_grow:
+                try:
+                    connection = self._connect()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+                with self._lock:
+                    self._stats['created'] += 1
+            else:
+                with self._lock:
+                    self._stats['waits'] += 1
+                try:
+                    with stage('db.pool_wait'):
+                        connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(f"Timed out after {self.timeout}s waiting for a database connection")
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return connection
+
+    def release(self, connection: sqlite3.Connection, discard: bool = False):
+        if not discard:
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except sqlite3.Error:
+                discard = True
+
+        if discard or self._closed:
+            connection.close()
+            with self._lock:
+                self._size -= 1
+                if discard:
+                    self._stats['discarded'] += 1
+            return
+
+        self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['size'] - stats['idle']
+        stats['max_size'] = self.max_size
+        return stats
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._size -= 1
@@ -1,21 +1,156 @@
 import os
+import hmac
 import bcrypt
 import base64
-from cryptography.fernet import Fernet
+import json
+import struct
+import hashlib
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from typing import Tuple
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from typing import Tuple, Optional, Sequence, Dict, Any
+from metrics import timed
+
+DECRYPT_ERRORS = (InvalidToken, InvalidTag, UnicodeDecodeError)
+
+
+class CipherWipedError(ValueError):
+    pass
+
+
+class CipherContext:
+    ENTRY_FORMAT = 2
+    ENTRY_KEY_INFO = b'secure-vault entry key v2'
+    NONCE_LENGTH = 12
+    _PASSWORD_LENGTH = struct.Struct('>I')
+
+    def __init__(self, master_key: bytes, previous_keys: Sequence[bytes] = (), key_version: int = 1):
+        self.key_version = key_version
+        self._key = bytearray(master_key)
+        self._previous_keys = [bytearray(key) for key in previous_keys]
+        fernets = [Fernet(master_key)] + [Fernet(key) for key in previous_keys]
+        self._cipher = fernets[0] if len(fernets) == 1 else MultiFernet(fernets)
+        self._entry_ciphers = [AESGCM(self._derive_entry_key(key)) for key in [master_key, *previous_keys]]
+
+    @classmethod
+    def is_sealed(cls, encrypted_entry: Optional[bytes]) -> bool:
+        return bool(encrypted_entry) and encrypted_entry[0] == cls.ENTRY_FORMAT
+
+    @property
+    def wiped(self) -> bool:
+        return self._cipher is None
+
+    @property
+    def master_key(self) -> bytes:
+        self._ensure_active()
+        return bytes(self._key)
+
+    def encrypt(self, data: str) -> bytes:
+        self._ensure_active()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return self._cipher.encrypt(data)
+
+    def decrypt(self, encrypted_data: bytes) -> str:
+        self._ensure_active()
+        return self._cipher.decrypt(encrypted_data).decode('utf-8')
+
+    def encrypt_entry(self, password: str, notes: Optional[str] = None) -> bytes:
+        self._ensure_active()
+        password = password.encode('utf-8')
+        payload = self._PASSWORD_LENGTH.pack(len(password)) + password + (notes or "").encode('utf-8')
+        header = bytes((self.ENTRY_FORMAT,))
+        nonce = os.urandom(self.NONCE_LENGTH)
+        return header + nonce + self._entry_ciphers[0].encrypt(nonce, payload, header)
+
+    def decrypt_entry(self, encrypted_entry: bytes, encrypted_notes: Optional[bytes] = None) -> Tuple[str, str]:
+        self._ensure_active()
+        if not self.is_sealed(encrypted_entry):
+            return self.decrypt(encrypted_entry), self.decrypt(encrypted_notes) if encrypted_notes else ""
+
+        header, nonce = encrypted_entry[:1], encrypted_entry[1:1 + self.NONCE_LENGTH]
+        ciphertext = encrypted_entry[1 + self.NONCE_LENGTH:]
+        for entry_cipher in self._entry_ciphers:
+            try:
+                payload = entry_cipher.decrypt(nonce, ciphertext, header)
+                break
+            except InvalidTag:
+                continue
+        else:
+            raise InvalidToken
+
+        offset = self._PASSWORD_LENGTH.size
+        end = offset + self._PASSWORD_LENGTH.unpack_from(payload)[0]
+        return payload[offset:end].decode('utf-8'), payload[end:].decode('utf-8')
+
+    def reencrypt_entry(self, encrypted_entry: bytes, encrypted_notes: Optional[bytes] = None) -> bytes:
+        return self.encrypt_entry(*self.decrypt_entry(encrypted_entry, encrypted_notes))
+
+    def rotate(self, encrypted_data: bytes) -> bytes:
+        self._ensure_active()
+        if isinstance(self._cipher, MultiFernet):
+            return self._cipher.rotate(encrypted_data)
+        return self._cipher.encrypt(self._cipher.decrypt(encrypted_data))
+
+    def wipe(self):
+        for key in [self._key] + self._previous_keys:
+            for i in range(len(key)):
+                key[i] = 0
+        self._cipher = None
+        self._entry_ciphers = []
+
+    def _ensure_active(self):
+        if self._cipher is None:
+            raise CipherWipedError("Cipher context has been wiped")
+
+    def _derive_entry_key(self, master_key: bytes) -> bytes:
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                    info=self.ENTRY_KEY_INFO).derive(base64.urlsafe_b64decode(master_key))
 
 
 class CryptoUtils:
     PBKDF2_ITERATIONS = 100000
     SALT_LENGTH = 32
+    LEGACY_AUTH_SCHEME = 'bcrypt-pbkdf2'
+    AUTH_SCHEME = 'pbkdf2-hkdf'
+    AUTH_VERIFIER_INFO = b'secure-vault auth verifier'
+    KEY_ENCRYPTION_KEY_INFO = b'secure-vault key encryption key'
+    DEFAULT_KDF_PARAMS = {'algorithm': 'pbkdf2-sha256', 'iterations': PBKDF2_ITERATIONS}
+    MIN_PBKDF2_ITERATIONS = 100000
+    MIN_SCRYPT_N = 2 ** 14
+    SCRYPT_MAX_MEMORY = 1024 * 1024 * 1024
+
+    def __init__(self, kdf_params: Optional[Dict[str, Any]] = None):
+        self.kdf_params = self.normalize_kdf_params(kdf_params or self.DEFAULT_KDF_PARAMS)
 
+    @classmethod
+    def normalize_kdf_params(cls, params: Dict[str, Any]) -> Dict[str, Any]:
+        algorithm = params.get('algorithm')
+        if algorithm == 'pbkdf2-sha256':
+            iterations = int(params.get('iterations', cls.PBKDF2_ITERATIONS))
+            if iterations < cls.MIN_PBKDF2_ITERATIONS:
+                raise ValueError(f"PBKDF2 iterations must be at least {cls.MIN_PBKDF2_ITERATIONS}")
+            return {'algorithm': algorithm, 'iterations': iterations}
+        if algorithm == 'scrypt':
+            n, r, p = int(params.get('n', cls.MIN_SCRYPT_N)), int(params.get('r', 8)), int(params.get('p', 1))
+            if n < cls.MIN_SCRYPT_N or n & (n - 1):
+                raise ValueError(f"scrypt n must be a power of two of at least {cls.MIN_SCRYPT_N}")
+            if 128 * n * r * p > cls.SCRYPT_MAX_MEMORY:
+                raise ValueError("scrypt parameters exceed the memory limit")
+            return {'algorithm': algorithm, 'n': n, 'r': r, 'p': p}
+        raise ValueError(f"Unsupported KDF algorithm: {algorithm}")
+
+    @timed('crypto.bcrypt')
     def hash_password(self, password: str) -> Tuple[bytes, bytes]:
         salt = bcrypt.gensalt()
         password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
         return password_hash, salt
 
+    @timed('crypto.bcrypt')
     def verify_password(self, password: str, password_hash: bytes) -> bool:
         return bcrypt.checkpw(password.encode('utf-8'), password_hash)
 
@@ -25,6 +160,7 @@ class CryptoUtils:
     def generate_salt(self) -> bytes:
         return os.urandom(self.SALT_LENGTH)
 
+    @timed('crypto.pbkdf2')
     def derive_key_from_password(self, password: str, salt: bytes) -> bytes:
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
@@ -42,8 +178,88 @@ class CryptoUtils:
     def decrypt_data(self, encrypted_data: bytes, key: bytes) -> str:
         return Fernet(key).decrypt(encrypted_data).decode('utf-8')
 
+    def create_cipher_context(self, master_key: bytes, previous_keys: Sequence[bytes] = (),
+                              key_version: int = 1) -> CipherContext:
+        return CipherContext(master_key, previous_keys, key_version)
+
     def encrypt_master_key(self, master_key: bytes, password_derived_key: bytes) -> bytes:
         return Fernet(password_derived_key).encrypt(master_key)
 
     def decrypt_master_key(self, encrypted_master_key: bytes, password_derived_key: bytes) -> bytes:
         return Fernet(password_derived_key).decrypt(encrypted_master_key)
+
+    def derive_login_keys(self, password: str, salt: bytes,
+                          kdf_params: Optional[Dict[str, Any]] = None) -> Tuple[bytes, bytes]:
+        root_key = self._derive_root_key(password, salt, kdf_params or self.kdf_params)
+        auth_key = self._expand_key(root_key, self.AUTH_VERIFIER_INFO)
+        key_encryption_key = self._expand_key(root_key, self.KEY_ENCRYPTION_KEY_INFO)
+        return hashlib.sha256(auth_key).digest(), base64.urlsafe_b64encode(key_encryption_key)
+
+    def create_user_credentials(self, password: str, master_key: Optional[bytes] = None) -> Dict[str, Any]:
+        master_key = master_key or self.generate_key()
+        master_key_salt = self.generate_salt()
+        verifier, key_encryption_key = self.derive_login_keys(password, master_key_salt)
+        return {
+            'auth_scheme': self.AUTH_SCHEME,
+            'kdf_params': json.dumps(self.kdf_params, sort_keys=True),
+            'password_hash': verifier,
+            'salt': b'',
+            'master_key_salt': master_key_salt,
+            'encrypted_master_key': self.encrypt_master_key(master_key, key_encryption_key)
+        }
+
+    def unlock_master_key(self, password: str, auth_scheme: str, password_hash: bytes,
+                          master_key_salt: bytes, encrypted_master_key: bytes,
+                          kdf_params: Optional[str] = None) -> Optional[bytes]:
+        try:
+            if auth_scheme == self.LEGACY_AUTH_SCHEME:
+                if not self.verify_password(password, password_hash):
+                    return None
+                password_derived_key = self.derive_key_from_password(password, master_key_salt)
+            elif auth_scheme == self.AUTH_SCHEME:
+                params = json.loads(kdf_params) if kdf_params else self.DEFAULT_KDF_PARAMS
+                verifier, password_derived_key = self.derive_login_keys(password, master_key_salt, params)
+                if not hmac.compare_digest(verifier, password_hash):
+                    return None
+            else:
+                return None
+
+            return self.decrypt_master_key(encrypted_master_key, password_derived_key)
+        except Exception:
+            return None
+
+    def verify_user_password(self, password: str, auth_scheme: str, password_hash: bytes,
+                             master_key_salt: bytes, kdf_params: Optional[str] = None) -> bool:
+        try:
+            if auth_scheme == self.LEGACY_AUTH_SCHEME:
+                return self.verify_password(password, password_hash)
+            if auth_scheme == self.AUTH_SCHEME:
+                params = json.loads(kdf_params) if kdf_params else self.DEFAULT_KDF_PARAMS
+                root_key = self._derive_root_key(password, master_key_salt, params)
+                verifier = hashlib.sha256(self._expand_key(root_key, self.AUTH_VERIFIER_INFO)).digest()
+                return hmac.compare_digest(verifier, password_hash)
+        except Exception:
+            pass
+        return False
+
+    def needs_rehash(self, auth_scheme: str, kdf_params: Optional[str]) -> bool:
+        if auth_scheme != self.AUTH_SCHEME:
+            return True
+        stored_params = json.loads(kdf_params) if kdf_params else self.DEFAULT_KDF_PARAMS
+        return stored_params != self.kdf_params
+
+    @timed('crypto.kdf')
+    def _derive_root_key(self, password: str, salt: bytes, kdf_params: Dict[str, Any]) -> bytes:
+        if kdf_params['algorithm'] == 'scrypt':
+            kdf = Scrypt(salt=salt, length=32, n=kdf_params['n'], r=kdf_params['r'], p=kdf_params['p'])
+        else:
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=kdf_params['iterations'],
+            )
+        return kdf.derive(password.encode('utf-8'))
+
+    def _expand_key(self, root_key: bytes, info: bytes) -> bytes:
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(root_key)
@@ -1,13 +1,26 @@
 import sqlite3
 import os
-from typing import Optional, List, Tuple, Any
+from typing import Optional, List, Tuple, Any, Dict, Iterator, Iterable, Sequence, Callable
 from contextlib import contextmanager
+import asyncio
 import logging
+from connection_pool import ConnectionPool
+from write_queue import WriteQueue
+from migrations import apply_migrations, fts_available
+from metrics import timed
 
 
 class DatabaseManager:
-    def __init__(self, db_path: Optional[str] = None):
+    DEFAULT_POOL_SIZE = 8
+    DEFAULT_BATCH_SIZE = 200
+
+    def __init__(self, db_path: Optional[str] = None, pool_size: Optional[int] = None,
+                 pool_timeout: float = 10.0):
         self.db_path = db_path or os.path.join(os.path.dirname(__file__), '..', 'secure_vault.db')
+        self.pool = ConnectionPool(self.db_path, pool_size or self.DEFAULT_POOL_SIZE, pool_timeout)
+        self.fts_enabled = False
+        self.schema_version = 0
+        self.write_queue: Optional[WriteQueue] = None
         self._setup_logging()
 
     def _setup_logging(self):
@@ -16,67 +29,39 @@ class DatabaseManager:
 
     @contextmanager
     def get_connection(self):
-        connection = None
-        try:
-            connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            connection.row_factory = sqlite3.Row
-            yield connection
-        except sqlite3.Error as e:
-            self.logger.error(f"Database error: {e}")
-            if connection:
+        with self.pool.connection() as connection:
+            try:
+                yield connection
+            except sqlite3.Error as e:
+                self.logger.error(f"Database error: {e}")
                 connection.rollback()
-            raise
-        finally:
-            if connection:
-                connection.close()
+                raise
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self.pool.stats()
+
+    def enable_write_queue(self, max_batch: Optional[int] = None, max_delay: Optional[float] = None):
+        if self.write_queue is None:
+            self.write_queue = WriteQueue(self, max_batch, max_delay)
+            self.write_queue.start()
+
+    def close(self):
+        if self.write_queue is not None:
+            self.write_queue.stop()
+            self.write_queue = None
+        self.pool.close()
 
     def initialize_db(self) -> bool:
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT NOT NULL UNIQUE,
-                        password_hash BLOB NOT NULL,
-                        salt BLOB NOT NULL,
-                        master_key_salt BLOB NOT NULL,
-                        encrypted_master_key BLOB NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS vault_entries (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        service_name TEXT NOT NULL,
-                        username TEXT NOT NULL,
-                        encrypted_password BLOB NOT NULL,
-                        encrypted_notes BLOB,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                    )
-                """)
-
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_users_username 
-                    ON users(username)
-                """)
-
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_vault_entries_user_id 
-                    ON vault_entries(user_id)
-                """)
-
-                conn.commit()
+                self.schema_version = apply_migrations(conn)
+                self.fts_enabled = fts_available(conn)
                 return True
         except sqlite3.Error as e:
             self.logger.error(f"Database initialization error: {e}")
             return False
 
+    @timed('db.execute')
     def execute_query(self, query: str, params: Optional[Tuple] = None) -> bool:
         try:
             with self.get_connection() as conn:
@@ -88,24 +73,96 @@ class DatabaseManager:
             self.logger.error(f"Query execution error: {e}")
             return False
 
+    @timed('db.write')
+    async def execute_query_async(self, query: str, params: Optional[Tuple] = None) -> bool:
+        if self.write_queue is not None:
+            return await self.write_queue.submit_async(query, params)
+        return await asyncio.to_thread(self.execute_query, query, params)
+
+    @timed('db.execute')
+    def execute_transaction(self, statements: Sequence[Tuple[str, Tuple]]) -> bool:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                for query, params in statements:
+                    cursor.execute(query, params)
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            self.logger.error(f"Transaction error: {e}")
+            return False
+
+    @timed('db.execute')
+    def execute_many(self, query: str, params_seq: Iterable[Tuple]) -> bool:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(query, params_seq)
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            self.logger.error(f"Batch execution error: {e}")
+            return False
+
+    @timed('db.fetch')
     def fetch_one(self, query: str, params: Optional[Tuple] = None) -> Optional[Tuple]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(query, params or ())
-                result = cursor.fetchone()
-                return tuple(result) if result else None
+                return cursor.fetchone()
         except sqlite3.Error as e:
             self.logger.error(f"Fetch one error: {e}")
             return None
 
+    @timed('db.fetch')
     def fetch_all(self, query: str, params: Optional[Tuple] = None) -> List[Tuple]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(query, params or ())
-                results = cursor.fetchall()
-                return [tuple(row) for row in results]
+                return cursor.fetchall()
         except sqlite3.Error as e:
             self.logger.error(f"Fetch all error: {e}")
             return []
+
+    def iter_rows(self, page_query: Callable[[Optional[Tuple]], Tuple[str, Tuple]],
+                  batch_size: Optional[int] = None) -> Iterator[Tuple]:
+        # Keyset paging: page_query builds the next page's query from the last row seen, and the connection
+        # goes back to the pool between pages so a slow consumer never pins one.
+        batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        last_row = None
+        while True:
+            query, params = page_query(last_row)
+            rows = self.fetch_all(f"{query} LIMIT ?", tuple(params) + (batch_size,))
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_row = rows[-1]
+
+    def for_user(self, user_id: int) -> 'DatabaseManager':
+        return self
+
+    def for_username(self, username: str) -> 'DatabaseManager':
+        return self
+
+    def databases(self) -> List['DatabaseManager']:
+        return [self]
+
+    def insert_user(self, values: Dict[str, Any]) -> bool:
+        columns = list(values)
+        return self.execute_query(
+            f"INSERT INTO users ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            tuple(values.values())
+        )
+
+    def delete_user(self, user_id: int) -> bool:
+        return self.execute_transaction([
+            ("DELETE FROM users WHERE id = ?", (user_id,)),
+            ("DELETE FROM user_directory WHERE id = ?", (user_id,)),
+        ])
+
+    def iter_usernames(self, after_id: int = 0) -> Iterator[Tuple[int, str]]:
+        return self.iter_rows(lambda last_row: (
+            "SELECT id, username FROM users WHERE id > ? ORDER BY id", (last_row[0] if last_row else after_id,)
+        ))
@@ -0,0 +1,279 @@
+import json
+import uuid
+import sqlite3
+import hashlib
+import secrets
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, List
+from database_manager_sqlite import DatabaseManager
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobInterrupted(Exception):
+    pass
+
+
+class JobLimitError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_queue: 'JobQueue', job_id: str, user_id: int, params: Dict[str, Any]):
+        self.job_queue = job_queue
+        self.job_id = job_id
+        self.user_id = user_id
+        self.params = params
+
+    def progress(self, done: int, total: Optional[int] = None):
+        self.job_queue._update(self.job_id, progress=done, total=total)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.job_queue._stopping.is_set():
+            raise JobInterrupted()
+        if self.job_id in self.job_queue._cancel_requests:
+            raise JobCancelled()
+
+
+class JobQueue:
+    DEFAULT_WORKERS = 2
+    DEFAULT_MAX_ACTIVE_PER_USER = 2
+    DEFAULT_LEASE_SECONDS = 60.0
+    ACTIVE_STATUSES = ('queued', 'running')
+    JOB_COLUMNS = "id, user_id, kind, status, progress, total, result, error, created_at, started_at, finished_at"
+
+    def __init__(self, db_manager: DatabaseManager, workers: Optional[int] = None,
+                 max_active_per_user: Optional[int] = None, lease_seconds: Optional[float] = None):
+        self.db_manager = db_manager
+        self.workers = workers or self.DEFAULT_WORKERS
+        self.max_active_per_user = max_active_per_user or self.DEFAULT_MAX_ACTIVE_PER_USER
+        self.lease_seconds = lease_seconds or self.DEFAULT_LEASE_SECONDS
+        self.worker_id = uuid.uuid4().hex
+        self.logger = logging.getLogger(__name__)
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._cancel_requests = set()
+        self._stopping = threading.Event()
+        self._stop_leases = threading.Event()
+        self._lease_thread: Optional[threading.Thread] = None
+
+    def register(self, kind: str, handler: Callable[..., Optional[Dict[str, Any]]],
+                 resumable: bool = False, cancellable: bool = True,
+                 cleanup: Optional[Callable[..., None]] = None):
+        self._handlers[kind] = {
+            'handler': handler, 'resumable': resumable, 'cancellable': cancellable, 'cleanup': cleanup
+        }
+
+    def start(self):
+        if self._executor is not None:
+            return
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        self._stop_leases.clear()
+        self._recover()
+        self._lease_thread = threading.Thread(target=self._lease_loop, name='job-leases', daemon=True)
+        self._lease_thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._lease_thread is not None:
+            self._stop_leases.set()
+            self._lease_thread.join()
+            self._lease_thread = None
+
+    def submit(self, user_id: int, kind: str, params: Optional[Dict[str, Any]] = None,
+               context: Optional[Dict[str, Any]] = None) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job_id = uuid.uuid4().hex
+        params = params or {}
+        # One statement, so the per-user limit holds across every process sharing the database
+        inserted = self._write(
+            f"""INSERT INTO jobs (id, user_id, kind, status, params, worker_id, lease_expires_at)
+               SELECT ?, ?, ?, 'queued', ?, ?, datetime('now', ?)
+               WHERE (SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN {self.ACTIVE_STATUSES}) < ?""",
+            (job_id, user_id, kind, json.dumps(params), self.worker_id, self._lease_offset(),
+             user_id, self.max_active_per_user)
+        )
+        if inserted is None:
+            raise RuntimeError("Failed to record job")
+        if not inserted:
+            raise JobLimitError(f"At most {self.max_active_per_user} active jobs per user")
+
+        self._executor.submit(self._execute, job_id, user_id, kind, params, context or {})
+        return job_id
+
+    def get(self, job_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        if user_id is None:
+            row = self.db_manager.fetch_one(f"SELECT {self.JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+        else:
+            row = self.db_manager.fetch_one(
+                f"SELECT {self.JOB_COLUMNS} FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id)
+            )
+        return self._to_job(row) if row else None
+
+    def issue_status_token(self, job_id: str) -> Optional[str]:
+        token = secrets.token_urlsafe(32)
+        if not self.db_manager.execute_query(
+            "UPDATE jobs SET status_token_hash = ? WHERE id = ?", (self._hash_token(token), job_id)
+        ):
+            return None
+        return token
+
+    def get_with_status_token(self, job_id: str, token: str) -> Optional[Dict[str, Any]]:
+        row = self.db_manager.fetch_one(
+            f"SELECT {self.JOB_COLUMNS} FROM jobs WHERE id = ? AND status_token_hash = ?",
+            (job_id, self._hash_token(token))
+        )
+        return self._to_job(row) if row else None
+
+    def list_jobs(self, user_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self.db_manager.fetch_all(
+            f"SELECT {self.JOB_COLUMNS} FROM jobs WHERE user_id = ? ORDER BY created_at DESC, rowid DESC LIMIT ?",
+            (user_id, limit)
+        )
+        return [self._to_job(row) for row in rows]
+
+    def cancel(self, job_id: str, user_id: int) -> Optional[Dict[str, Any]]:
+        job = self.get(job_id, user_id)
+        if not job or job['status'] not in self.ACTIVE_STATUSES:
+            return job
+        if not self._handlers.get(job['kind'], {}).get('cancellable', True):
+            raise ValueError("This job cannot be cancelled")
+
+        self._cancel_requests.add(job_id)
+        self.db_manager.execute_query(
+            "UPDATE jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'queued'",
+            (job_id,)
+        )
+        return self.get(job_id, user_id)
+
+    def prune(self, older_than_days: float) -> bool:
+        return self.db_manager.execute_query(
+            f"""DELETE FROM jobs WHERE status NOT IN {self.ACTIVE_STATUSES}
+               AND finished_at < datetime('now', ?)""",
+            (f"-{older_than_days} days",)
+        )
+
+    def _recover(self):
+        # Only jobs whose owner stopped renewing its lease are taken over; the conditional UPDATE lets
+        # exactly one process win each of them.
+        rows = self.db_manager.fetch_all(
+            f"""SELECT id, user_id, kind, params FROM jobs WHERE status IN {self.ACTIVE_STATUSES}
+               AND (lease_expires_at IS NULL OR lease_expires_at < datetime('now')) ORDER BY created_at"""
+        )
+        for job_id, user_id, kind, params in rows:
+            if not self._write(
+                f"""UPDATE jobs SET status = 'queued', worker_id = ?, lease_expires_at = datetime('now', ?)
+                   WHERE id = ? AND status IN {self.ACTIVE_STATUSES}
+                   AND (lease_expires_at IS NULL OR lease_expires_at < datetime('now'))""",
+                (self.worker_id, self._lease_offset(), job_id)
+            ):
+                continue
+            if self._handlers.get(kind, {}).get('resumable'):
+                self._executor.submit(self._execute, job_id, user_id, kind, json.loads(params or '{}'), {})
+            else:
+                self._finish(job_id, 'failed', error="Interrupted by a server restart")
+
+    def _lease_loop(self):
+        while not self._stop_leases.wait(self.lease_seconds / 3):
+            try:
+                self._write(
+                    f"""UPDATE jobs SET lease_expires_at = datetime('now', ?)
+                       WHERE worker_id = ? AND status IN {self.ACTIVE_STATUSES}""",
+                    (self._lease_offset(), self.worker_id)
+                )
+                if not self._stopping.is_set():
+                    self._recover()
+            except Exception as e:
+                self.logger.error(f"Job lease renewal failed: {e}")
+
+    def _execute(self, job_id: str, user_id: int, kind: str, params: Dict[str, Any], context: Dict[str, Any]):
+        handler = self._handlers[kind]
+        job = Job(self, job_id, user_id, params)
+        status, result, error = 'succeeded', None, None
+        try:
+            job.check_cancelled()
+            if not self._write(
+                """UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                   lease_expires_at = datetime('now', ?) WHERE id = ? AND status = 'queued' AND worker_id = ?""",
+                (self._lease_offset(), job_id, self.worker_id)
+            ):
+                return
+            result = handler['handler'](job, **params, **context)
+        except JobCancelled:
+            status = 'cancelled'
+        except JobInterrupted:
+            if handler['resumable']:
+                status = 'queued'
+            else:
+                status, error = 'failed', "Interrupted by a server shutdown"
+        except Exception as e:
+            self.logger.error(f"Job {job_id} ({kind}) failed: {e}")
+            status, error = 'failed', str(e)
+        finally:
+            self._cancel_requests.discard(job_id)
+            if handler['cleanup'] and context:
+                handler['cleanup'](**context)
+
+        if status == 'queued':
+            self.db_manager.execute_query(
+                "UPDATE jobs SET status = 'queued', worker_id = NULL, lease_expires_at = NULL WHERE id = ?", (job_id,)
+            )
+        else:
+            self._finish(job_id, status, result=result, error=error)
+
+    def _update(self, job_id: str, status: Optional[str] = None, progress: Optional[int] = None,
+                total: Optional[int] = None):
+        self.db_manager.execute_query(
+            """UPDATE jobs SET status = COALESCE(?, status), progress = COALESCE(?, progress),
+               total = COALESCE(?, total) WHERE id = ?""",
+            (status, progress, total, job_id)
+        )
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None):
+        self.db_manager.execute_query(
+            """UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+               WHERE id = ?""",
+            (status, json.dumps(result) if result is not None else None, error, job_id)
+        )
+
+    def _write(self, query: str, params: tuple) -> Optional[bool]:
+        try:
+            with self.db_manager.get_connection() as conn:
+                changed = conn.execute(query, params).rowcount == 1
+                conn.commit()
+                return changed
+        except sqlite3.Error:
+            return None
+
+    def _lease_offset(self) -> str:
+        return f"+{self.lease_seconds} seconds"
+
+    def _hash_token(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _to_job(self, row: tuple) -> Dict[str, Any]:
+        job_id, user_id, kind, status, progress, total, result, error, created_at, started_at, finished_at = row
+        return {
+            'id': job_id,
+            'kind': kind,
+            'status': status,
+            'progress': progress,
+            'total': total,
+            'result': json.loads(result) if result else None,
+            'error': error,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at
+        }
@@ -0,0 +1,68 @@
+import sys
+import json
+import time
+import argparse
+from typing import Dict, Any, Callable
+from crypto_utils import CryptoUtils
+
+PASSWORD = "calibration-password"
+SAMPLES = 3
+
+
+def measure(params: Dict[str, Any], samples: int = SAMPLES) -> float:
+    crypto = CryptoUtils(params)
+    salt = crypto.generate_salt()
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        crypto.derive_login_keys(PASSWORD, salt)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+def calibrate_pbkdf2(target_ms: float, log: Callable[[str], None]) -> Dict[str, Any]:
+    probe = {'algorithm': 'pbkdf2-sha256', 'iterations': CryptoUtils.MIN_PBKDF2_ITERATIONS}
+    probe_ms = measure(probe)
+    log(f"pbkdf2-sha256 {probe['iterations']} iterations: {probe_ms:.1f} ms")
+
+    iterations = int(probe['iterations'] * target_ms / probe_ms)
+    iterations = max(CryptoUtils.MIN_PBKDF2_ITERATIONS, iterations // 10000 * 10000)
+    return {'algorithm': 'pbkdf2-sha256', 'iterations': iterations}
+
+
+def calibrate_scrypt(target_ms: float, log: Callable[[str], None], r: int = 8, p: int = 1) -> Dict[str, Any]:
+    params = {'algorithm': 'scrypt', 'n': CryptoUtils.MIN_SCRYPT_N, 'r': r, 'p': p}
+    while True:
+        elapsed_ms = measure(params)
+        log(f"scrypt n=2^{params['n'].bit_length() - 1} r={r} p={p}: {elapsed_ms:.1f} ms")
+
+        candidate = dict(params, n=params['n'] * 2)
+        if elapsed_ms * 2 > target_ms or 128 * candidate['n'] * r * p > CryptoUtils.SCRYPT_MAX_MEMORY:
+            return params
+        params = candidate
+
+
+def calibrate(algorithm: str, target_ms: float, log: Callable[[str], None] = lambda message: None) -> Dict[str, Any]:
+    if algorithm == 'pbkdf2-sha256':
+        params = calibrate_pbkdf2(target_ms, log)
+    elif algorithm == 'scrypt':
+        params = calibrate_scrypt(target_ms, log)
+    else:
+        raise ValueError(f"Unsupported KDF algorithm: {algorithm}")
+    return CryptoUtils.normalize_kdf_params(params)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pick KDF parameters for a target login latency on this host")
+    parser.add_argument('--algorithm', choices=['pbkdf2-sha256', 'scrypt'], default='pbkdf2-sha256')
+    parser.add_argument('--target-ms', type=float, default=250.0)
+    args = parser.parse_args(argv)
+
+    params = calibrate(args.algorithm, args.target_ms, lambda message: print(message, file=sys.stderr))
+    print(f"Measured: {measure(params):.1f} ms (target {args.target_ms:.0f} ms)", file=sys.stderr)
+    print(f"KDF_PARAMS='{json.dumps(params, sort_keys=True)}'")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Callable, Any
+from metrics import stage
+
+
+class KdfPool:
+    DEFAULT_WORKERS_PER_CORE = 1.0
+
+    def __init__(self, workers: Optional[int] = None, workers_per_core: Optional[float] = None,
+                 use_processes: bool = False):
+        self.workers = self.compute_size(workers, workers_per_core)
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def compute_size(cls, workers: Optional[int] = None, workers_per_core: Optional[float] = None) -> int:
+        if workers:
+            return max(1, int(workers))
+        per_core = workers_per_core if workers_per_core is not None else cls.DEFAULT_WORKERS_PER_CORE
+        return max(1, int((os.cpu_count() or 1) * per_core))
+
+    @classmethod
+    def from_env(cls) -> 'KdfPool':
+        workers = os.environ.get('KDF_WORKERS')
+        per_core = os.environ.get('KDF_WORKERS_PER_CORE')
+        mode = os.environ.get('KDF_POOL_MODE', 'thread').lower()
+        return cls(
+            workers=int(workers) if workers else None,
+            workers_per_core=float(per_core) if per_core else None,
+            use_processes=mode == 'process'
+        )
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='kdf')
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args)
+        if not self.use_processes:
+            call = functools.partial(contextvars.copy_context().run, call)
+        with stage('kdf_pool'):
+            return await loop.run_in_executor(self.executor, call)
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,180 @@
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CipherContext, DECRYPT_ERRORS
+from metrics import timed
+
+
+class KeyRotator:
+    DEFAULT_BATCH_SIZE = 200
+    DEFAULT_BATCH_DELAY = 0.01
+
+    def __init__(self, db_manager: DatabaseManager, batch_size: Optional[int] = None,
+                 batch_delay: Optional[float] = None):
+        self.db_manager = db_manager
+        self.batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        self.batch_delay = self.DEFAULT_BATCH_DELAY if batch_delay is None else batch_delay
+        self.logger = logging.getLogger(__name__)
+        self._workers: Dict[int, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def status(self, user_id: int) -> Optional[Dict[str, Any]]:
+        db = self.db_manager.for_user(user_id)
+        rotation = db.fetch_one(
+            "SELECT target_version, last_entry_id, rotated, failed FROM key_rotations WHERE user_id = ?",
+            (user_id,)
+        )
+        if not rotation:
+            return None
+
+        target_version, last_entry_id, rotated, failed = rotation
+        remaining = db.fetch_one(
+            "SELECT COUNT(*) FROM vault_entries WHERE user_id = ? AND id > ? AND key_version < ?",
+            (user_id, last_entry_id, target_version)
+        )
+        with self._lock:
+            running = user_id in self._workers
+        return {
+            'target_version': target_version,
+            'rotated': rotated,
+            'failed': failed,
+            'remaining': remaining[0] if remaining else 0,
+            'running': running
+        }
+
+    def start(self, user_id: int, cipher: CipherContext) -> bool:
+        with self._lock:
+            if user_id in self._workers or self._stop.is_set():
+                return False
+            db = self.db_manager.for_user(user_id)
+            if not db.fetch_one("SELECT 1 FROM key_rotations WHERE user_id = ?", (user_id,)):
+                return False
+            worker = threading.Thread(target=self._run_worker, args=(user_id, cipher),
+                                      name=f'key-rotation-{user_id}', daemon=True)
+            self._workers[user_id] = worker
+        worker.start()
+        return True
+
+    def run(self, user_id: int, cipher: CipherContext) -> bool:
+        rescanned_from = None
+        while not self._stop.is_set():
+            processed = self.rotate_batch(user_id, cipher)
+            if processed is None:
+                return False
+            if processed == 0:
+                stale = self._finish(user_id)
+                if stale is None:
+                    return False
+                if not stale:
+                    return True
+                # Entries written with an older key behind the checkpoint: _finish rewound it, so scan again.
+                # Give up (keeping the retired key) once a full pass makes no progress.
+                rotated = self._rotated(user_id)
+                if rotated == rescanned_from:
+                    self.logger.error(f"Key rotation for user {user_id} left {stale} entries it cannot "
+                                      f"re-encrypt; keeping the retired key")
+                    return False
+                rescanned_from = rotated
+                continue
+            if self.batch_delay:
+                time.sleep(self.batch_delay)
+        return False
+
+    @timed('rotation.batch')
+    def rotate_batch(self, user_id: int, cipher: CipherContext) -> Optional[int]:
+        with self.db_manager.for_user(user_id).get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rotation = conn.execute(
+                "SELECT target_version, last_entry_id FROM key_rotations WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if not rotation:
+                conn.rollback()
+                return None
+
+            target_version, last_entry_id = rotation
+            rows = conn.execute(
+                """SELECT id, encrypted_password, encrypted_notes FROM vault_entries
+                   WHERE user_id = ? AND id > ? AND key_version < ? ORDER BY id LIMIT ?""",
+                (user_id, last_entry_id, target_version, self.batch_size)
+            ).fetchall()
+            if not rows:
+                conn.rollback()
+                return 0
+
+            updates = []
+            failed = 0
+            for entry_id, encrypted_password, encrypted_notes in rows:
+                try:
+                    updates.append((
+                        cipher.reencrypt_entry(encrypted_password, encrypted_notes),
+                        target_version,
+                        entry_id
+                    ))
+                except DECRYPT_ERRORS:
+                    failed += 1
+                    self.logger.error(f"Key rotation could not decrypt entry {entry_id}; leaving it unchanged")
+
+            conn.executemany(
+                """UPDATE vault_entries SET encrypted_password = ?, encrypted_notes = NULL, key_version = ?
+                   WHERE id = ?""",
+                updates
+            )
+            conn.execute(
+                """UPDATE key_rotations SET last_entry_id = ?, rotated = rotated + ?, failed = failed + ?,
+                   updated_at = CURRENT_TIMESTAMP WHERE user_id = ?""",
+                (rows[-1][0], len(updates), failed, user_id)
+            )
+            conn.commit()
+            return len(rows)
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.join()
+
+    def _run_worker(self, user_id: int, cipher: CipherContext):
+        try:
+            if self.run(user_id, cipher):
+                self.logger.info(f"Key rotation finished for user {user_id}")
+        except Exception as e:
+            self.logger.error(f"Key rotation paused for user {user_id}: {e}")
+        finally:
+            cipher.wipe()
+            with self._lock:
+                self._workers.pop(user_id, None)
+
+    def _rotated(self, user_id: int) -> Optional[int]:
+        row = self.db_manager.for_user(user_id).fetch_one(
+            "SELECT rotated FROM key_rotations WHERE user_id = ?", (user_id,)
+        )
+        return row[0] if row else None
+
+    def _finish(self, user_id: int) -> Optional[int]:
+        with self.db_manager.for_user(user_id).get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rotation = conn.execute(
+                "SELECT target_version FROM key_rotations WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if not rotation:
+                conn.rollback()
+                return None
+
+            stale = conn.execute(
+                "SELECT COUNT(*) FROM vault_entries WHERE user_id = ? AND key_version < ?",
+                (user_id, rotation[0])
+            ).fetchone()[0]
+            if stale:
+                conn.execute("UPDATE key_rotations SET last_entry_id = 0 WHERE user_id = ?", (user_id,))
+            else:
+                conn.execute(
+                    "UPDATE users SET retired_master_key = NULL WHERE id = ? AND key_version = ?",
+                    (user_id, rotation[0])
+                )
+                conn.execute("DELETE FROM key_rotations WHERE user_id = ?", (user_id,))
+            conn.commit()
+            return stale
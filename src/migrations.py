@@ -0,0 +1,262 @@
+import sqlite3
+import logging
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def add_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _initial_schema(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password_hash BLOB NOT NULL,
+            salt BLOB NOT NULL,
+            master_key_salt BLOB NOT NULL,
+            encrypted_master_key BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vault_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            service_name TEXT NOT NULL,
+            username TEXT NOT NULL,
+            encrypted_password BLOB NOT NULL,
+            encrypted_notes BLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vault_entries_user_id ON vault_entries(user_id)")
+
+    add_column(cursor, 'users', 'auth_scheme', "TEXT NOT NULL DEFAULT 'bcrypt-pbkdf2'")
+    add_column(cursor, 'users', 'kdf_params', "TEXT")
+    add_column(cursor, 'users', 'vault_version', "INTEGER NOT NULL DEFAULT 0")
+    add_column(cursor, 'vault_entries', 'change_seq', "INTEGER NOT NULL DEFAULT 0")
+    add_column(cursor, 'users', 'key_version', "INTEGER NOT NULL DEFAULT 1")
+    add_column(cursor, 'users', 'retired_master_key', "BLOB")
+    add_column(cursor, 'vault_entries', 'key_version', "INTEGER NOT NULL DEFAULT 1")
+    add_column(cursor, 'users', 'deleted_at', "TIMESTAMP")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            params TEXT,
+            progress INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user_status ON jobs(user_id, status)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS key_rotations (
+            user_id INTEGER PRIMARY KEY,
+            target_version INTEGER NOT NULL,
+            last_entry_id INTEGER NOT NULL DEFAULT 0,
+            rotated INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vault_tombstones (
+            user_id INTEGER NOT NULL,
+            entry_id INTEGER NOT NULL,
+            change_seq INTEGER NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, entry_id),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vault_entries_user_change ON vault_entries(user_id, change_seq)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_vault_tombstones_user_change ON vault_tombstones(user_id, change_seq)"
+    )
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS vault_entries_version_insert AFTER INSERT ON vault_entries BEGIN
+            UPDATE users SET vault_version = vault_version + 1 WHERE id = new.user_id;
+            UPDATE vault_entries SET change_seq = (SELECT vault_version FROM users WHERE id = new.user_id)
+            WHERE id = new.id;
+        END
+    """)
+
+    cursor.execute("DROP TRIGGER IF EXISTS vault_entries_version_update")
+    cursor.execute("""
+        CREATE TRIGGER vault_entries_version_update
+        AFTER UPDATE OF service_name, username, updated_at ON vault_entries BEGIN
+            UPDATE users SET vault_version = vault_version + 1 WHERE id = new.user_id;
+            UPDATE vault_entries SET change_seq = (SELECT vault_version FROM users WHERE id = new.user_id)
+            WHERE id = new.id;
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS vault_entries_version_delete AFTER DELETE ON vault_entries BEGIN
+            UPDATE users SET vault_version = vault_version + 1 WHERE id = old.user_id;
+            INSERT OR REPLACE INTO vault_tombstones (user_id, entry_id, change_seq)
+            SELECT id, old.id, vault_version FROM users WHERE id = old.user_id;
+        END
+    """)
+
+
+def _hot_query_indexes(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE INDEX idx_vault_entries_user_service
+        ON vault_entries(user_id, service_name, id, username, created_at, updated_at)
+    """)
+    cursor.execute("CREATE INDEX idx_jobs_user_created ON jobs(user_id, created_at)")
+    cursor.execute("DROP INDEX IF EXISTS idx_users_username")
+    cursor.execute("DROP INDEX IF EXISTS idx_vault_entries_user_id")
+    cursor.execute("CREATE INDEX idx_vault_entries_user_rotation ON vault_entries(user_id, id, key_version)")
+
+
+def _job_status_tokens(cursor: sqlite3.Cursor):
+    add_column(cursor, 'jobs', 'status_token_hash', "TEXT")
+
+
+def _user_directory(cursor: sqlite3.Cursor):
+    # The directory of a sharded deployment. Single-file databases keep it filled too (backfill plus the
+    # insert trigger), so sharding can be switched on later without another pass over users.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_directory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            shard INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO user_directory (id, username, shard) SELECT id, username, NULL FROM users")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_directory_insert AFTER INSERT ON users BEGIN
+            INSERT OR IGNORE INTO user_directory (id, username, shard) VALUES (new.id, new.username, NULL);
+        END
+    """)
+
+
+def _owner_scoped_search(cursor: sqlite3.Cursor):
+    # Contentless trigram index with an indexed "|<user_id>|" owner token, so a search can be scoped to one
+    # user inside the MATCH. Replaces any earlier layout; without FTS5 the table is left out and search
+    # falls back to LIKE scans.
+    for trigger in ('insert', 'delete', 'update'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS vault_entries_fts_{trigger}")
+    cursor.execute("DROP TABLE IF EXISTS vault_entries_fts")
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE vault_entries_fts USING fts5(
+                service_name, username, owner, content='', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search unavailable, falling back to LIKE scans: {e}")
+        return
+
+    cursor.execute("""
+        CREATE TRIGGER vault_entries_fts_insert AFTER INSERT ON vault_entries BEGIN
+            INSERT INTO vault_entries_fts (rowid, service_name, username, owner)
+            VALUES (new.id, new.service_name, new.username, '|' || new.user_id || '|');
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER vault_entries_fts_delete AFTER DELETE ON vault_entries BEGIN
+            INSERT INTO vault_entries_fts (vault_entries_fts, rowid, service_name, username, owner)
+            VALUES ('delete', old.id, old.service_name, old.username, '|' || old.user_id || '|');
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER vault_entries_fts_update
+        AFTER UPDATE OF service_name, username, user_id ON vault_entries BEGIN
+            INSERT INTO vault_entries_fts (vault_entries_fts, rowid, service_name, username, owner)
+            VALUES ('delete', old.id, old.service_name, old.username, '|' || old.user_id || '|');
+            INSERT INTO vault_entries_fts (rowid, service_name, username, owner)
+            VALUES (new.id, new.service_name, new.username, '|' || new.user_id || '|');
+        END
+    """)
+
+    cursor.execute("""
+        INSERT INTO vault_entries_fts (rowid, service_name, username, owner)
+        SELECT id, service_name, username, '|' || user_id || '|' FROM vault_entries
+    """)
+
+
+def _job_leases(cursor: sqlite3.Cursor):
+    add_column(cursor, 'jobs', 'worker_id', "TEXT")
+    add_column(cursor, 'jobs', 'lease_expires_at', "TIMESTAMP")
+
+
+def _tombstone_horizon(cursor: sqlite3.Cursor):
+    add_column(cursor, 'users', 'tombstone_horizon', "INTEGER NOT NULL DEFAULT 0")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "initial schema", _initial_schema),
+    (2, "covering indexes for vault listings and job history", _hot_query_indexes),
+    (3, "job status tokens", _job_status_tokens),
+    (4, "user directory for sharding", _user_directory),
+    (5, "owner-scoped full-text search", _owner_scoped_search),
+    (6, "job leases for multiple workers", _job_leases),
+    (7, "tombstone retention horizon", _tombstone_horizon),
+]
+
+
+def schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def fts_available(connection: sqlite3.Connection) -> bool:
+    return connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vault_entries_fts'"
+    ).fetchone() is not None
+
+
+def apply_migrations(connection: sqlite3.Connection,
+                     migrations: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = MIGRATIONS) -> int:
+    latest = migrations[-1][0] if migrations else 0
+    current = schema_version(connection)
+    if current >= latest:
+        if current > latest:
+            logger.warning(f"Database schema version {current} is newer than this release ({latest})")
+        return current
+
+    for version, description, migrate in migrations:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(connection) >= version:
+                connection.rollback()
+                continue
+            migrate(connection.cursor())
+            connection.execute(f"PRAGMA user_version = {int(version)}")
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        logger.info(f"Applied schema migration {version}: {description}")
+
+    return schema_version(connection)
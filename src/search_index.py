@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Optional, Dict, Any, List, Set, Tuple, Sequence
+from vault_manager import VaultManager
+from crypto_utils import CipherContext
+from metrics import timed
+
+
+class EntrySearchIndex:
+    FIELDS = ('service_name', 'username', 'notes')
+    GRAM_LENGTH = 3
+    # Rough per-character cost of the lowered text plus its trigram postings, used for the cache budget
+    BYTES_PER_CHAR = 64
+    BYTES_PER_ENTRY = 512
+
+    def __init__(self):
+        self.cursor: Optional[int] = None
+        self.size = 0
+        self.lock = threading.Lock()
+        self._entries: Dict[int, Tuple[Dict[str, Any], Tuple[str, ...]]] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @timed('search.sync')
+    def sync(self, vault_manager: VaultManager, user_id: int, cipher: CipherContext):
+        if self.cursor is not None and vault_manager.get_vault_version(user_id) == self.cursor:
+            return
+
+        changes = vault_manager.get_changes(user_id, cipher, self.cursor)
+        if changes['full']:
+            self._entries.clear()
+            self._postings.clear()
+            self.size = 0
+        for entry_id in changes['deleted']:
+            self._remove(entry_id)
+        for entry in changes['entries']:
+            self._remove(entry.id)
+            self._add(entry)
+        self.cursor = changes['cursor']
+
+    @timed('search.query')
+    def search(self, term: str, limit: int, fields: Sequence[str] = FIELDS) -> List[Dict[str, Any]]:
+        term = term.strip().lower()
+        positions = [self.FIELDS.index(field) for field in fields if field in self.FIELDS]
+        if not term or not positions:
+            return []
+
+        grams = self._grams(term)
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+        else:
+            candidates = self._entries.keys()
+
+        matches = []
+        for entry_id in candidates:
+            metadata, texts = self._entries[entry_id]
+            if any(term in texts[position] for position in positions):
+                matches.append((not texts[0].startswith(term), metadata['service_name'], entry_id, metadata))
+
+        matches.sort(key=lambda match: match[:3])
+        return [dict(match[3]) for match in matches[:limit]]
+
+    def _add(self, entry):
+        texts = tuple((entry[field] or '').lower() for field in self.FIELDS)
+        self._entries[entry.id] = ({
+            'id': entry.id,
+            'service_name': entry.service_name,
+            'username': entry.username,
+            'created_at': entry.created_at,
+            'updated_at': entry.updated_at
+        }, texts)
+        for gram in set().union(*(self._grams(text) for text in texts)):
+            self._postings[gram].add(entry.id)
+        self.size += self._entry_size(texts)
+
+    def _remove(self, entry_id: int):
+        stored = self._entries.pop(entry_id, None)
+        if stored is None:
+            return
+        texts = stored[1]
+        for gram in set().union(*(self._grams(text) for text in texts)):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self._postings[gram]
+        self.size -= self._entry_size(texts)
+
+    def _entry_size(self, texts: Tuple[str, ...]) -> int:
+        return self.BYTES_PER_ENTRY + self.BYTES_PER_CHAR * sum(len(text) for text in texts)
+
+    def _grams(self, text: str) -> Set[str]:
+        return {text[i:i + self.GRAM_LENGTH] for i in range(len(text) - self.GRAM_LENGTH + 1)}
+
+
+class SearchIndexCache:
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    DEFAULT_IDLE_TTL = 1800.0
+
+    def __init__(self, max_bytes: Optional[int] = None, idle_ttl: Optional[float] = None):
+        self.max_bytes = self.DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.idle_ttl = idle_ttl or self.DEFAULT_IDLE_TTL
+        self._indexes: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def search(self, token: str, vault_manager: VaultManager, user_id: int, cipher: CipherContext,
+               term: str, limit: int) -> List[Dict[str, Any]]:
+        index = self._checkout(token, user_id)
+        with index.lock:
+            index.sync(vault_manager, user_id, cipher)
+            results = index.search(term, limit)
+        self._fit(token)
+        return results
+
+    def discard(self, token: str):
+        with self._lock:
+            self._indexes.pop(token, None)
+
+    def discard_sessions(self, tokens: Sequence[str]):
+        with self._lock:
+            for token in tokens:
+                self._indexes.pop(token, None)
+            self._evict_idle(time.monotonic())
+
+    def discard_user(self, user_id: int):
+        with self._lock:
+            for token in [token for token, slot in self._indexes.items() if slot['user_id'] == user_id]:
+                del self._indexes[token]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'indexes': len(self._indexes),
+                'bytes': sum(slot['index'].size for slot in self._indexes.values())
+            }
+
+    def _checkout(self, token: str, user_id: int) -> EntrySearchIndex:
+        now = time.monotonic()
+        with self._lock:
+            slot = self._indexes.get(token)
+            if slot is None or slot['user_id'] != user_id:
+                slot = {'user_id': user_id, 'index': EntrySearchIndex(), 'last_used': now}
+                self._indexes[token] = slot
+            slot['last_used'] = now
+            self._indexes.move_to_end(token)
+            self._evict_idle(now)
+            return slot['index']
+
+    def _evict_idle(self, now: float):
+        while self._indexes:
+            oldest_token, oldest = next(iter(self._indexes.items()))
+            if now - oldest['last_used'] <= self.idle_ttl:
+                break
+            del self._indexes[oldest_token]
+
+    def _fit(self, token: str):
+        with self._lock:
+            total = sum(slot['index'].size for slot in self._indexes.values())
+            while total > self.max_bytes and self._indexes:
+                evicted_token, evicted = next(iter(self._indexes.items()))
+                if evicted_token == token and len(self._indexes) > 1:
+                    self._indexes.move_to_end(token)
+                    continue
+                del self._indexes[evicted_token]
+                total -= evicted['index'].size
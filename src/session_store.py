@@ -0,0 +1,400 @@
+import os
+import time
+import hashlib
+import secrets
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Sequence, List, Callable
+from cryptography.fernet import Fernet
+from crypto_utils import CryptoUtils
+from connection_pool import ConnectionPool
+
+
+class SessionStore(ABC):
+    DEFAULT_IDLE_TTL = 30 * 60
+    DEFAULT_ABSOLUTE_TTL = 12 * 60 * 60
+    DEFAULT_MAX_SESSIONS = 10000
+    DEFAULT_SWEEP_INTERVAL = 60
+
+    def __init__(self, crypto_utils: CryptoUtils, idle_ttl: Optional[float] = None,
+                 absolute_ttl: Optional[float] = None, max_sessions: Optional[int] = None):
+        self.crypto_utils = crypto_utils
+        self.idle_ttl = idle_ttl or self.DEFAULT_IDLE_TTL
+        self.absolute_ttl = absolute_ttl or self.DEFAULT_ABSOLUTE_TTL
+        self.max_sessions = max_sessions or self.DEFAULT_MAX_SESSIONS
+        self.logger = logging.getLogger(__name__)
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+        self._removal_listeners: List[Callable[[List[str]], None]] = []
+
+    @abstractmethod
+    def create(self, user: Dict[str, Any], master_key: bytes, previous_keys: Sequence[bytes] = (),
+               key_version: int = 1) -> str:
+        pass
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def delete(self, token: str):
+        pass
+
+    @abstractmethod
+    def delete_user(self, user_id: int) -> int:
+        pass
+
+    @abstractmethod
+    def sweep(self) -> int:
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+    def session_key(self, token: str) -> str:
+        return token
+
+    def add_removal_listener(self, listener: Callable[[List[str]], None]):
+        self._removal_listeners.append(listener)
+
+    def start_sweeper(self, interval: Optional[float] = None):
+        if self._sweeper is not None:
+            return
+        interval = interval or self.DEFAULT_SWEEP_INTERVAL
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,),
+                                         name='session-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def close(self):
+        if self._sweeper is not None:
+            self._stop_sweeper.set()
+            self._sweeper.join()
+            self._sweeper = None
+
+    def _sweep_loop(self, interval: float):
+        while not self._stop_sweeper.wait(interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    self.logger.info(f"Expired {removed} idle sessions")
+            except Exception as e:
+                self.logger.error(f"Session sweep error: {e}")
+
+    def _notify_removed(self, keys: List[str]):
+        for listener in self._removal_listeners:
+            try:
+                listener(keys)
+            except Exception as e:
+                self.logger.error(f"Session removal listener error: {e}")
+
+    def _is_expired(self, created_at: float, last_seen: float, now: float) -> bool:
+        return now - last_seen > self.idle_ttl or now - created_at > self.absolute_ttl
+
+    def _new_token(self) -> str:
+        return secrets.token_hex(32)
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, crypto_utils: CryptoUtils, idle_ttl: Optional[float] = None,
+                 absolute_ttl: Optional[float] = None, max_sessions: Optional[int] = None):
+        super().__init__(crypto_utils, idle_ttl, absolute_ttl, max_sessions)
+        self._sessions: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, user: Dict[str, Any], master_key: bytes, previous_keys: Sequence[bytes] = (),
+               key_version: int = 1) -> str:
+        token = self._new_token()
+        now = time.time()
+        session = {
+            'user': user,
+            'cipher': self.crypto_utils.create_cipher_context(master_key, previous_keys, key_version),
+            'created_at': now,
+            'last_seen': now
+        }
+
+        evicted = []
+        with self._lock:
+            self._sessions[token] = session
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False))
+
+        for _, old_session in evicted:
+            old_session['cipher'].wipe()
+        if evicted:
+            self._notify_removed([old_token for old_token, _ in evicted])
+        return token
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if self._is_expired(session['created_at'], session['last_seen'], now):
+                del self._sessions[token]
+            else:
+                session['last_seen'] = now
+                self._sessions.move_to_end(token)
+                return session
+
+        session['cipher'].wipe()
+        self._notify_removed([token])
+        return None
+
+    def delete(self, token: str):
+        with self._lock:
+            session = self._sessions.pop(token, None)
+        if session:
+            session['cipher'].wipe()
+            self._notify_removed([token])
+
+    def delete_user(self, user_id: int) -> int:
+        with self._lock:
+            tokens = [token for token, session in self._sessions.items() if session['user']['id'] == user_id]
+            removed = [self._sessions.pop(token) for token in tokens]
+        for session in removed:
+            session['cipher'].wipe()
+        self._notify_removed(tokens)
+        return len(removed)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            tokens = [
+                token for token, session in self._sessions.items()
+                if self._is_expired(session['created_at'], session['last_seen'], now)
+            ]
+            removed = [self._sessions.pop(token) for token in tokens]
+        for session in removed:
+            session['cipher'].wipe()
+        self._notify_removed(tokens)
+        return len(removed)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    LOCAL_CACHE_SIZE = 1024
+    TOUCH_INTERVAL = 30
+
+    def __init__(self, crypto_utils: CryptoUtils, db_path: str, wrap_key: bytes,
+                 idle_ttl: Optional[float] = None, absolute_ttl: Optional[float] = None,
+                 max_sessions: Optional[int] = None, pool_size: int = 4):
+        super().__init__(crypto_utils, idle_ttl, absolute_ttl, max_sessions)
+        self.pool = ConnectionPool(db_path, pool_size)
+        self._wrapper = Fernet(wrap_key)
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._initialize()
+
+    def _initialize(self):
+        with self.pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    token_hash TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    username TEXT NOT NULL,
+                    wrapped_key BLOB NOT NULL,
+                    wrapped_previous_keys BLOB,
+                    key_version INTEGER NOT NULL DEFAULT 1,
+                    created_at REAL NOT NULL,
+                    last_seen REAL NOT NULL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if 'wrapped_previous_keys' not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN wrapped_previous_keys BLOB")
+            if 'key_version' not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN key_version INTEGER NOT NULL DEFAULT 1")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)")
+            conn.commit()
+
+    def create(self, user: Dict[str, Any], master_key: bytes, previous_keys: Sequence[bytes] = (),
+               key_version: int = 1) -> str:
+        token = self._new_token()
+        now = time.time()
+        wrapped_previous_keys = self._wrapper.encrypt(b'\n'.join(previous_keys)) if previous_keys else None
+        with self.pool.connection() as conn:
+            conn.execute(
+                """INSERT INTO sessions (token_hash, user_id, username, wrapped_key, wrapped_previous_keys,
+                                         key_version, created_at, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (self._hash_token(token), user['id'], user['username'],
+                 self._wrapper.encrypt(master_key), wrapped_previous_keys, key_version, now, now)
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+            evicted = []
+            if excess > 0:
+                evicted = [row[0] for row in conn.execute(
+                    "SELECT token_hash FROM sessions ORDER BY last_seen LIMIT ?", (excess,)
+                )]
+                conn.executemany("DELETE FROM sessions WHERE token_hash = ?", [(key,) for key in evicted])
+            conn.commit()
+        for token_hash in evicted:
+            self._drop_cached(token_hash, wipe=True)
+        if evicted:
+            self._notify_removed(evicted)
+        return token
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        token_hash = self._hash_token(token)
+        now = time.time()
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                """SELECT user_id, username, wrapped_key, created_at, last_seen, wrapped_previous_keys, key_version
+                   FROM sessions WHERE token_hash = ?""",
+                (token_hash,)
+            ).fetchone()
+
+            if row is None or self._is_expired(row[3], row[4], now):
+                if row is not None:
+                    conn.execute("DELETE FROM sessions WHERE token_hash = ?", (token_hash,))
+                    conn.commit()
+                self._drop_cached(token_hash, wipe=True)
+                self._notify_removed([token_hash])
+                return None
+
+            if now - row[4] > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE sessions SET last_seen = ? WHERE token_hash = ?", (now, token_hash))
+                conn.commit()
+
+        with self._lock:
+            session = self._cache.get(token_hash)
+            if session is not None:
+                self._cache.move_to_end(token_hash)
+                session['last_seen'] = now
+                return session
+
+        try:
+            master_key = self._wrapper.decrypt(row[2])
+            previous_keys = self._wrapper.decrypt(row[5]).split(b'\n') if row[5] else []
+        except Exception:
+            self.logger.error("Failed to unwrap session key; check SESSION_WRAP_KEY")
+            return None
+
+        session = {
+            'user': {'id': row[0], 'username': row[1]},
+            'cipher': self.crypto_utils.create_cipher_context(master_key, previous_keys, row[6]),
+            'created_at': row[3],
+            'last_seen': now
+        }
+        with self._lock:
+            session = self._cache.setdefault(token_hash, session)
+            while len(self._cache) > self.LOCAL_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return session
+
+    def delete(self, token: str):
+        token_hash = self._hash_token(token)
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE token_hash = ?", (token_hash,))
+            conn.commit()
+        self._drop_cached(token_hash, wipe=True)
+        self._notify_removed([token_hash])
+
+    def delete_user(self, user_id: int) -> int:
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = [row[0] for row in conn.execute(
+                "SELECT token_hash FROM sessions WHERE user_id = ?", (user_id,)
+            )]
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            conn.commit()
+        with self._lock:
+            token_hashes = [key for key, session in self._cache.items() if session['user']['id'] == user_id]
+        for token_hash in token_hashes:
+            self._drop_cached(token_hash, wipe=True)
+        self._notify_removed(sorted(set(removed) | set(token_hashes)))
+        return len(removed)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = [row[0] for row in conn.execute(
+                "SELECT token_hash FROM sessions WHERE last_seen < ? OR created_at < ?",
+                (now - self.idle_ttl, now - self.absolute_ttl)
+            )]
+            conn.executemany("DELETE FROM sessions WHERE token_hash = ?", [(key,) for key in removed])
+            conn.commit()
+
+        with self._lock:
+            expired = [
+                key for key, session in self._cache.items()
+                if self._is_expired(session['created_at'], session['last_seen'], now)
+            ]
+        for token_hash in expired:
+            self._drop_cached(token_hash, wipe=True)
+        self._notify_removed(sorted(set(removed) | set(expired)))
+        return len(removed)
+
+    def count(self) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        super().close()
+        with self._lock:
+            sessions = list(self._cache.values())
+            self._cache.clear()
+        for session in sessions:
+            session['cipher'].wipe()
+        self.pool.close()
+
+    def session_key(self, token: str) -> str:
+        return self._hash_token(token)
+
+    def _drop_cached(self, token_hash: str, wipe: bool = False):
+        with self._lock:
+            session = self._cache.pop(token_hash, None)
+        if session and wipe:
+            session['cipher'].wipe()
+
+    def _hash_token(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+
+def load_or_create_wrap_key(path: str) -> bytes:
+    try:
+        with open(path, 'rb') as key_file:
+            return key_file.read().strip()
+    except FileNotFoundError:
+        pass
+
+    key = Fernet.generate_key()
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, 'rb') as key_file:
+            return key_file.read().strip()
+    with os.fdopen(fd, 'wb') as key_file:
+        key_file.write(key)
+    return key
+
+
+def session_store_from_env(crypto_utils: CryptoUtils, default_db_path: str) -> SessionStore:
+    backend = os.environ.get('SESSION_BACKEND', 'memory').lower()
+    idle_ttl = os.environ.get('SESSION_IDLE_TTL')
+    absolute_ttl = os.environ.get('SESSION_ABSOLUTE_TTL')
+    max_sessions = os.environ.get('SESSION_MAX')
+    options = {
+        'idle_ttl': float(idle_ttl) if idle_ttl else None,
+        'absolute_ttl': float(absolute_ttl) if absolute_ttl else None,
+        'max_sessions': int(max_sessions) if max_sessions else None,
+    }
+
+    if backend == 'memory':
+        return MemorySessionStore(crypto_utils, **options)
+    if backend == 'sqlite':
+        db_path = os.environ.get('SESSION_DB_PATH') or default_db_path
+        wrap_key = os.environ.get('SESSION_WRAP_KEY')
+        wrap_key = wrap_key.encode() if wrap_key else load_or_create_wrap_key(db_path + '.key')
+        return SQLiteSessionStore(crypto_utils, db_path, wrap_key, **options)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+from typing import Optional, List, Dict, Any, Iterator, Tuple, Callable
+from database_manager_sqlite import DatabaseManager
+
+ENTRY_ID_SPACE = 1 << 40
+
+
+def shard_path(db_path: str, index: int) -> str:
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.shard{index}{ext or '.db'}"
+
+
+class ShardedDatabaseManager(DatabaseManager):
+    def __init__(self, db_path: Optional[str] = None, shards: int = 1, pool_size: Optional[int] = None,
+                 pool_timeout: float = 10.0):
+        super().__init__(db_path, pool_size, pool_timeout)
+        self.shard_count = max(1, shards)
+        self._pool_size = pool_size
+        self._pool_timeout = pool_timeout
+        self.shards: List[DatabaseManager] = []
+        self._routes: Dict[int, Optional[int]] = {}
+        self._open_shards(self.shard_count)
+
+    def initialize_db(self) -> bool:
+        if not super().initialize_db():
+            return False
+        highest = self.fetch_one("SELECT MAX(shard) FROM user_directory")
+        self._open_shards(max(self.shard_count, (highest[0] + 1) if highest and highest[0] is not None else 0))
+        for index, shard in enumerate(self.shards):
+            if not shard.initialize_db() or not shard.execute_query(
+                """INSERT INTO sqlite_sequence (name, seq) SELECT 'vault_entries', ?
+                   WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'vault_entries')""",
+                ((index + 1) * ENTRY_ID_SPACE,)
+            ):
+                return False
+        return True
+
+    def enable_write_queue(self, max_batch: Optional[int] = None, max_delay: Optional[float] = None):
+        super().enable_write_queue(max_batch, max_delay)
+        for shard in self.shards:
+            shard.enable_write_queue(max_batch, max_delay)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        super().close()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        totals: Dict[str, Any] = {}
+        for database in self.databases():
+            for name, value in database.pool.stats().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def databases(self) -> List[DatabaseManager]:
+        return [self] + self.shards
+
+    def shard_index(self, username: str) -> int:
+        digest = hashlib.blake2b(username.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') % self.shard_count
+
+    def shard(self, index: Optional[int]) -> DatabaseManager:
+        return self if index is None else self.shards[index]
+
+    def for_user(self, user_id: int) -> DatabaseManager:
+        if user_id not in self._routes:
+            row = self.fetch_one("SELECT shard FROM user_directory WHERE id = ?", (user_id,))
+            if not row:
+                return self
+            self._routes[user_id] = row[0]
+        return self.shard(self._routes[user_id])
+
+    def for_username(self, username: str) -> DatabaseManager:
+        row = self.fetch_one("SELECT id, shard FROM user_directory WHERE username = ?", (username,))
+        if not row:
+            return self
+        self._routes[row[0]] = row[1]
+        return self.shard(row[1])
+
+    def insert_user(self, values: Dict[str, Any]) -> bool:
+        index = self.shard_index(values['username'])
+        try:
+            with self.get_connection() as conn:
+                user_id = conn.execute(
+                    "INSERT INTO user_directory (username, shard) VALUES (?, ?)", (values['username'], index)
+                ).lastrowid
+                conn.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"User directory insert error: {e}")
+            return False
+
+        if not self.shards[index].insert_user(dict(values, id=user_id)):
+            self.execute_query("DELETE FROM user_directory WHERE id = ?", (user_id,))
+            return False
+        self._routes[user_id] = index
+        return True
+
+    def delete_user(self, user_id: int) -> bool:
+        database = self.for_user(user_id)
+        if database is self:
+            self._routes.pop(user_id, None)
+            return super().delete_user(user_id)
+        if not database.delete_user(user_id):
+            return False
+        self._routes.pop(user_id, None)
+        return self.execute_query("DELETE FROM user_directory WHERE id = ?", (user_id,))
+
+    def iter_usernames(self, after_id: int = 0) -> Iterator[Tuple[int, str]]:
+        return self.iter_rows(lambda last_row: (
+            "SELECT id, username FROM user_directory WHERE id > ? ORDER BY id", (last_row[0] if last_row else after_id,)
+        ))
+
+    def _open_shards(self, count: int):
+        while len(self.shards) < count:
+            self.shards.append(DatabaseManager(
+                shard_path(self.db_path, len(self.shards)), self._pool_size, self._pool_timeout
+            ))
+
+
+def _table_columns(connection: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+
+def _delete_user_rows(connection: sqlite3.Connection, user_id: int):
+    connection.execute("DELETE FROM vault_entries WHERE user_id = ?", (user_id,))
+    connection.execute("DELETE FROM vault_tombstones WHERE user_id = ?", (user_id,))
+    connection.execute("DELETE FROM key_rotations WHERE user_id = ?", (user_id,))
+    connection.execute("DELETE FROM users WHERE id = ?", (user_id,))
+
+
+def _copy_rows(source: sqlite3.Connection, target: sqlite3.Connection, table: str, user_column: str,
+               user_id: int) -> int:
+    columns = _table_columns(source, table)
+    rows = source.execute(
+        f"SELECT {', '.join(columns)} FROM {table} WHERE {user_column} = ?", (user_id,)
+    ).fetchall()
+    target.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows
+    )
+    return len(rows)
+
+
+def _copy_entries(source: sqlite3.Connection, target: sqlite3.Connection, user_id: int) -> int:
+    # Entry ids come from each shard's own range, so moved entries get new ids and the old ones are
+    # tombstoned: sync clients see the move as deletes plus inserts.
+    columns = [column for column in _table_columns(source, 'vault_entries') if column not in ('id', 'change_seq')]
+    rows = source.execute(
+        f"SELECT id, {', '.join(columns)} FROM vault_entries WHERE user_id = ? ORDER BY id", (user_id,)
+    ).fetchall()
+    target.executemany(
+        f"INSERT INTO vault_entries ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        [row[1:] for row in rows]
+    )
+    target.executemany(
+        """INSERT OR REPLACE INTO vault_tombstones (user_id, entry_id, change_seq)
+           SELECT id, ?, vault_version FROM users WHERE id = ?""",
+        [(row[0], user_id) for row in rows]
+    )
+    return len(rows)
+
+
+def move_user(manager: ShardedDatabaseManager, user_id: int, source_index: Optional[int], target_index: int) -> bool:
+    source = manager.shard(source_index)
+    target = manager.shard(target_index)
+    with source.get_connection() as source_conn, target.get_connection() as target_conn:
+        source_conn.execute("BEGIN")
+        if (not source_conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() or
+                source_conn.execute("SELECT 1 FROM key_rotations WHERE user_id = ?", (user_id,)).fetchone()):
+            source_conn.rollback()
+            return False
+
+        target_conn.execute("BEGIN IMMEDIATE")
+        _delete_user_rows(target_conn, user_id)
+        _copy_rows(source_conn, target_conn, 'users', 'id', user_id)
+        _copy_rows(source_conn, target_conn, 'vault_tombstones', 'user_id', user_id)
+        _copy_entries(source_conn, target_conn, user_id)
+        target_conn.commit()
+        source_conn.rollback()
+
+    if not manager.execute_query("UPDATE user_directory SET shard = ? WHERE id = ?", (target_index, user_id)):
+        return False
+    manager._routes[user_id] = target_index
+
+    with source.get_connection() as source_conn:
+        source_conn.execute("BEGIN IMMEDIATE")
+        _delete_user_rows(source_conn, user_id)
+        source_conn.commit()
+    return True
+
+
+def remove_orphans(manager: ShardedDatabaseManager) -> int:
+    manager._routes.clear()
+    removed = 0
+    for database in manager.databases():
+        for (user_id,) in database.fetch_all("SELECT id FROM users"):
+            if manager.for_user(user_id) is database:
+                continue
+            with database.get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                _delete_user_rows(conn, user_id)
+                conn.commit()
+            removed += 1
+    return removed
+
+
+def rebalance(manager: ShardedDatabaseManager, log: Callable[[str], None] = lambda message: None) -> Dict[str, int]:
+    result = {'moved': 0, 'skipped': 0, 'orphans_removed': remove_orphans(manager)}
+    for user_id, username, index in manager.fetch_all("SELECT id, username, shard FROM user_directory ORDER BY id"):
+        target_index = manager.shard_index(username)
+        if index == target_index:
+            continue
+        try:
+            moved = move_user(manager, user_id, index, target_index)
+        except sqlite3.Error as e:
+            log(f"Failed to move user {user_id}: {e}")
+            moved = False
+        if moved:
+            result['moved'] += 1
+        else:
+            result['skipped'] += 1
+            log(f"Skipped user {user_id}")
+    return result
+
+
+def shard_status(manager: ShardedDatabaseManager) -> Dict[str, Any]:
+    counts = dict(manager.fetch_all("SELECT shard, COUNT(*) FROM user_directory GROUP BY shard"))
+    misplaced = sum(
+        1 for username, index in manager.fetch_all("SELECT username, shard FROM user_directory")
+        if index != manager.shard_index(username)
+    )
+    return {
+        'shards': manager.shard_count,
+        'users': {('legacy' if index is None else shard_path(manager.db_path, index)): count
+                  for index, count in counts.items()},
+        'misplaced': misplaced,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Inspect and rebalance a sharded Secure Vault database. Stop the API server before rebalancing."
+    )
+    parser.add_argument('--db', default=os.environ.get('DB_PATH') or None,
+                        help="directory database (default: DB_PATH or secure_vault.db)")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('DB_SHARDS') or 1),
+                        help="number of shards new placements should use (default: DB_SHARDS)")
+    parser.add_argument('command', choices=['status', 'rebalance'])
+    args = parser.parse_args(argv)
+
+    manager = ShardedDatabaseManager(args.db, args.shards)
+    try:
+        if not manager.initialize_db():
+            print("Failed to open the database", file=sys.stderr)
+            return 1
+        if args.command == 'rebalance':
+            print(json.dumps(rebalance(manager, lambda message: print(message, file=sys.stderr))))
+        print(json.dumps(shard_status(manager), indent=2))
+    finally:
+        manager.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
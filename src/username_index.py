@@ -0,0 +1,64 @@
+import time
+import threading
+from typing import Optional, Dict, Iterable
+from database_manager_sqlite import DatabaseManager
+
+
+class UsernameIndex:
+    DEFAULT_REFRESH_INTERVAL = 1.0
+    DEFAULT_RELOAD_INTERVAL = 600.0
+
+    def __init__(self, db_manager: DatabaseManager, refresh_interval: Optional[float] = None,
+                 reload_interval: Optional[float] = None):
+        self.db_manager = db_manager
+        self.refresh_interval = self.DEFAULT_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        self.reload_interval = self.DEFAULT_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self._usernames = set()
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._usernames)
+
+    def load(self):
+        usernames = set()
+        last_id = 0
+        for user_id, username in self.db_manager.iter_usernames():
+            usernames.add(username)
+            last_id = user_id
+
+        now = time.monotonic()
+        with self._lock:
+            self._usernames = usernames
+            self._last_id = last_id
+            self._refreshed_at = self._loaded_at = now
+
+    def refresh(self):
+        with self._lock:
+            for user_id, username in self.db_manager.iter_usernames(self._last_id):
+                self._usernames.add(username)
+                self._last_id = user_id
+            self._refreshed_at = time.monotonic()
+
+    def is_taken(self, username: str) -> bool:
+        self._refresh_if_stale()
+        return username in self._usernames
+
+    def availability(self, usernames: Iterable[str]) -> Dict[str, bool]:
+        self._refresh_if_stale()
+        return {username: username not in self._usernames for username in usernames}
+
+    def add(self, username: str):
+        self._usernames.add(username)
+
+    def discard(self, username: str):
+        self._usernames.discard(username)
+
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.reload_interval:
+            self.load()
+        elif now - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
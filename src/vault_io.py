@@ -0,0 +1,101 @@
+import io
+import csv
+import json
+from typing import Iterable, Iterator, Dict, Any, IO
+
+FIELD_ALIASES = {
+    'service_name': ('service_name', 'service', 'name', 'title'),
+    'username': ('username', 'login_username', 'login', 'user'),
+    'password': ('password', 'login_password'),
+    'notes': ('notes', 'note', 'extra', 'comments'),
+}
+
+EXPORT_FIELDS = ('service_name', 'username', 'password', 'notes', 'created_at', 'updated_at')
+IMPORT_FORMATS = ('csv', 'ndjson', 'json')
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    lowered = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    normalized = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if lowered.get(alias) not in (None, ''):
+                normalized[field] = lowered[alias]
+                break
+        else:
+            if field in lowered:
+                normalized[field] = lowered[field]
+    return normalized
+
+
+def iter_csv_rows(lines: Iterable[str]) -> Iterator[Any]:
+    try:
+        for row in csv.DictReader(lines):
+            yield normalize_row(row)
+    except csv.Error as e:
+        yield ValueError(f"Invalid CSV: {e}")
+
+
+def iter_ndjson_rows(lines: Iterable[str]) -> Iterator[Any]:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+            continue
+        yield normalize_row(row) if isinstance(row, dict) else row
+
+
+def iter_json_rows(stream: IO[str]) -> Iterator[Any]:
+    try:
+        rows = json.load(stream)
+    except ValueError as e:
+        yield ValueError(f"Invalid JSON: {e}")
+        return
+
+    if isinstance(rows, dict):
+        rows = rows.get('entries', [rows])
+    if not isinstance(rows, list):
+        yield ValueError("Expected a JSON array of entries or an object with an \"entries\" array")
+        return
+    for row in rows:
+        yield normalize_row(row) if isinstance(row, dict) else row
+
+
+def iter_import_rows(stream: IO[str], data_format: str) -> Iterator[Any]:
+    if data_format == 'csv':
+        return _stop_on_decode_error(iter_csv_rows(stream))
+    if data_format == 'ndjson':
+        return _stop_on_decode_error(iter_ndjson_rows(stream))
+    if data_format == 'json':
+        return _stop_on_decode_error(iter_json_rows(stream))
+    raise ValueError(f"Unsupported import format: {data_format}")
+
+
+def _stop_on_decode_error(rows: Iterator[Any]) -> Iterator[Any]:
+    try:
+        yield from rows
+    except UnicodeDecodeError as e:
+        yield ValueError(f"File is not valid UTF-8 (byte {e.start}): {e.reason}")
+
+
+def export_csv(entries: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for entry in entries:
+        writer.writerow([entry[field] for field in EXPORT_FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_ndjson(entries: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for entry in entries:
+        yield json.dumps({field: entry[field] for field in EXPORT_FIELDS}) + "\n"
@@ -1,93 +1,483 @@
-from typing import List, Dict, Any, Optional
+import os
+import asyncio
+import sqlite3
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Iterator, Iterable, Callable
 from database_manager_sqlite import DatabaseManager
-from crypto_utils import CryptoUtils
+from crypto_utils import CryptoUtils, CipherContext, DECRYPT_ERRORS
+from metrics import timed, DECRYPT_FAILURES
+
+
+@dataclass
+class VaultEntry:
+    __slots__ = ('id', 'service_name', 'username', 'password', 'notes', 'created_at', 'updated_at')
+    id: int
+    service_name: str
+    username: str
+    password: str
+    notes: str
+    created_at: str
+    updated_at: str
+
+    def __getitem__(self, field: str) -> Any:
+        return getattr(self, field)
 
 
 class VaultManager:
-    def __init__(self, db_manager: DatabaseManager, crypto_utils: CryptoUtils):
+    ENTRY_COLUMNS = "id, service_name, username, encrypted_password, encrypted_notes, created_at, updated_at"
+    METADATA_COLUMNS = "id, service_name, username, created_at, updated_at"
+    SECRET_FIELDS = ('password', 'notes')
+    SEARCH_FIELDS = ('service_name', 'username')
+    MIN_TRIGRAM_LENGTH = 3
+    # Below this many entries the user_id index plus a LIKE scan beats reading the shared trigram postings
+    FTS_MIN_ENTRIES = 5000
+    DEFAULT_SEARCH_LIMIT = 20
+    PARALLEL_DECRYPT_THRESHOLD = 256
+    DECRYPT_CHUNK_SIZE = 128
+    IMPORT_BATCH_SIZE = 500
+    MAX_IMPORT_ERRORS = 1000
+    FIELD_LIMITS = {'service_name': 100, 'username': 100, 'password': 200, 'notes': 500}
+    INSERT_QUERY = """INSERT INTO vault_entries
+               (user_id, service_name, username, encrypted_password, encrypted_notes, key_version)
+               VALUES (?, ?, ?, ?, ?, ?)"""
+    MIGRATE_QUERY = """UPDATE vault_entries SET encrypted_password = ?, encrypted_notes = NULL, key_version = ?
+               WHERE id = ? AND encrypted_password = ?"""
+    UPDATE_QUERY = """UPDATE vault_entries SET encrypted_password = ?, encrypted_notes = NULL, key_version = ?,
+               updated_at = CURRENT_TIMESTAMP WHERE user_id = ? AND id = ?"""
+
+    def __init__(self, db_manager: DatabaseManager, crypto_utils: CryptoUtils,
+                 decrypt_workers: Optional[int] = None):
         self.db_manager = db_manager
         self.crypto_utils = crypto_utils
+        self.decrypt_workers = decrypt_workers or os.cpu_count() or 1
+        self._decrypt_executor: Optional[ThreadPoolExecutor] = None
 
+    @timed('vault.add')
     def add_entry(self, user_id: int, service_name: str, username: str, 
-                  password: str, notes: str, master_key: bytes) -> bool:
-        encrypted_password = self.crypto_utils.encrypt_data(password, master_key)
-        encrypted_notes = self.crypto_utils.encrypt_data(notes or "", master_key)
-
-        return self.db_manager.execute_query(
-            """INSERT INTO vault_entries (user_id, service_name, username, encrypted_password, encrypted_notes)
-               VALUES (?, ?, ?, ?, ?)""",
-            (user_id, service_name, username, encrypted_password, encrypted_notes)
+                  password: str, notes: str, cipher: CipherContext) -> bool:
+        return self.db_manager.for_user(user_id).execute_query(
+            *self._add_entry_query(user_id, service_name, username, password, notes, cipher)
+        )
+
+    @timed('vault.add')
+    async def add_entry_async(self, user_id: int, service_name: str, username: str,
+                              password: str, notes: str, cipher: CipherContext) -> bool:
+        return await self.db_manager.for_user(user_id).execute_query_async(
+            *self._add_entry_query(user_id, service_name, username, password, notes, cipher)
         )
 
-    def get_all_entries(self, user_id: int, master_key: bytes) -> List[Dict[str, Any]]:
-        entries_data = self.db_manager.fetch_all(
-            """SELECT id, service_name, username, encrypted_password, encrypted_notes, created_at, updated_at
-               FROM vault_entries WHERE user_id = ? ORDER BY service_name""",
+    @timed('vault.import')
+    def import_entries(self, user_id: int, rows: Iterable[Any], cipher: CipherContext,
+                       batch_size: Optional[int] = None,
+                       progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        result = {'imported': 0, 'failed': 0, 'errors': []}
+        batch_size = batch_size or self.IMPORT_BATCH_SIZE
+        batch = []
+        row_number = 0
+
+        for row_number, row in enumerate(rows, start=1):
+            error = self._validate_import_row(row)
+            if error is None:
+                try:
+                    batch.append((row_number, (
+                        user_id,
+                        row['service_name'],
+                        row['username'],
+                        cipher.encrypt_entry(row['password'], row.get('notes')),
+                        None,
+                        cipher.key_version
+                    )))
+                except Exception as e:
+                    error = f"Encryption failed: {e}"
+
+            if error is not None:
+                self._record_import_error(result, row_number, error)
+
+            if len(batch) >= batch_size:
+                self._insert_import_batch(user_id, batch, result)
+                batch = []
+                if progress:
+                    progress(row_number)
+
+        if batch:
+            self._insert_import_batch(user_id, batch, result)
+            if progress:
+                progress(row_number)
+
+        return result
+
+    @timed('vault.list')
+    def get_all_entries(self, user_id: int, cipher: CipherContext) -> List[VaultEntry]:
+        entries_data = self.db_manager.for_user(user_id).fetch_all(
+            f"""SELECT {self.ENTRY_COLUMNS}
+               FROM vault_entries WHERE user_id = ? ORDER BY service_name, id""",
             (user_id,)
         )
 
-        return [
-            entry for entry in [self._decrypt_entry(entry, master_key) for entry in entries_data]
-            if entry is not None
-        ]
+        return self._decrypt_entries(user_id, entries_data, cipher)
 
-    def get_entry_by_service(self, user_id: int, service_name: str, master_key: bytes) -> Optional[Dict[str, Any]]:
-        entry_data = self.db_manager.fetch_one(
-            """SELECT id, service_name, username, encrypted_password, encrypted_notes, created_at, updated_at
-               FROM vault_entries WHERE user_id = ? AND service_name LIKE ?""",
-            (user_id, f"%{service_name}%")
+    @timed('vault.page')
+    def get_entries_page(self, user_id: int, cipher: CipherContext, limit: int,
+                         after: Optional[Tuple[str, int]] = None
+                         ) -> Tuple[List[VaultEntry], Optional[Tuple[str, int]]]:
+        where, params = self._keyset_filter(user_id, after)
+        entries_data = self.db_manager.for_user(user_id).fetch_all(
+            f"""SELECT {self.ENTRY_COLUMNS}
+               FROM vault_entries WHERE {where} ORDER BY service_name, id LIMIT ?""",
+            params + (limit + 1,)
         )
 
-        return self._decrypt_entry(entry_data, master_key) if entry_data else None
+        next_cursor = None
+        if len(entries_data) > limit:
+            entries_data = entries_data[:limit]
+            next_cursor = (entries_data[-1][1], entries_data[-1][0])
 
-    def update_entry(self, user_id: int, entry_id: int, new_password: Optional[str], 
-                     new_notes: Optional[str], master_key: bytes) -> bool:
-        updates = []
-        params = []
+        return self._decrypt_entries(user_id, entries_data, cipher), next_cursor
 
-        if new_password is not None:
-            encrypted_password = self.crypto_utils.encrypt_data(new_password, master_key)
-            updates.append("encrypted_password = ?")
-            params.append(encrypted_password)
+    def iter_entries(self, user_id: int, cipher: CipherContext,
+                     after: Optional[Tuple[str, int]] = None) -> Iterator[VaultEntry]:
+        def page_query(last_row: Optional[tuple]) -> Tuple[str, tuple]:
+            where, params = self._keyset_filter(user_id, (last_row[1], last_row[0]) if last_row else after)
+            return f"SELECT {self.ENTRY_COLUMNS} FROM vault_entries WHERE {where} ORDER BY service_name, id", params
 
-        if new_notes is not None:
-            encrypted_notes = self.crypto_utils.encrypt_data(new_notes, master_key)
-            updates.append("encrypted_notes = ?")
-            params.append(encrypted_notes)
+        rows = self.db_manager.for_user(user_id).iter_rows(page_query)
 
-        if not updates:
-            return True
+        for entry_data in rows:
+            entry = self._decrypt_entry(entry_data, cipher)
+            if entry is not None:
+                yield entry
 
-        updates.append("updated_at = CURRENT_TIMESTAMP")
-        params.extend([user_id, entry_id])
+    def get_vault_version(self, user_id: int) -> Optional[int]:
+        row = self.db_manager.for_user(user_id).fetch_one("SELECT vault_version FROM users WHERE id = ?", (user_id,))
+        return row[0] if row else None
 
-        query = f"UPDATE vault_entries SET {', '.join(updates)} WHERE user_id = ? AND id = ?"
-        return self.db_manager.execute_query(query, params)
+    @timed('vault.sync')
+    def get_changes(self, user_id: int, cipher: CipherContext, since: Optional[int] = None) -> Dict[str, Any]:
+        db = self.db_manager.for_user(user_id)
+        row = db.fetch_one("SELECT vault_version, tombstone_horizon FROM users WHERE id = ?", (user_id,))
+        version, horizon = row if row else (0, 0)
+        # Deletes at or below the horizon have had their tombstones pruned, so older cursors must start over
+        if since is None or since > version or since < horizon:
+            return {'cursor': version, 'full': True, 'entries': self.get_all_entries(user_id, cipher), 'deleted': []}
 
-    def delete_entry(self, user_id: int, entry_id: int) -> bool:
-        return self.db_manager.execute_query(
-            "DELETE FROM vault_entries WHERE user_id = ? AND id = ?",
+        entries_data = db.fetch_all(
+            f"""SELECT {self.ENTRY_COLUMNS}
+               FROM vault_entries WHERE user_id = ? AND change_seq > ? ORDER BY change_seq""",
+            (user_id, since)
+        )
+        deleted = db.fetch_all(
+            "SELECT entry_id FROM vault_tombstones WHERE user_id = ? AND change_seq > ? ORDER BY change_seq",
+            (user_id, since)
+        )
+
+        return {
+            'cursor': version,
+            'full': False,
+            'entries': self._decrypt_entries(user_id, entries_data, cipher),
+            'deleted': [entry_id for (entry_id,) in deleted]
+        }
+
+    def prune_tombstones(self, older_than_days: float) -> bool:
+        cutoff = (f"-{older_than_days} days",)
+        return all(database.execute_transaction([
+            ("""UPDATE users SET tombstone_horizon = MAX(tombstone_horizon, (
+                   SELECT MAX(change_seq) FROM vault_tombstones
+                   WHERE user_id = users.id AND deleted_at < datetime('now', ?)))
+               WHERE id IN (SELECT user_id FROM vault_tombstones WHERE deleted_at < datetime('now', ?))""",
+             cutoff * 2),
+            ("DELETE FROM vault_tombstones WHERE deleted_at < datetime('now', ?)", cutoff),
+        ]) for database in self.db_manager.databases())
+
+    @timed('vault.metadata')
+    def get_entries_metadata(self, user_id: int, limit: Optional[int] = None,
+                             after: Optional[Tuple[str, int]] = None
+                             ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        where, params = self._keyset_filter(user_id, after)
+        query = f"SELECT {self.METADATA_COLUMNS} FROM vault_entries WHERE {where} ORDER BY service_name, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit + 1,)
+
+        rows = self.db_manager.for_user(user_id).fetch_all(query, params)
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][1], rows[-1][0])
+
+        return self._to_metadata(rows), next_cursor
+
+    @timed('vault.reveal')
+    def reveal_entry_secret(self, user_id: int, entry_id: int, cipher: CipherContext,
+                            fields: Sequence[str] = ('password', 'notes')) -> Optional[Dict[str, Any]]:
+        fields = [field for field in self.SECRET_FIELDS if field in fields]
+        if not fields:
+            return None
+
+        secret_data = self.db_manager.for_user(user_id).fetch_one(
+            "SELECT encrypted_password, encrypted_notes FROM vault_entries WHERE user_id = ? AND id = ?",
             (user_id, entry_id)
         )
+        if not secret_data:
+            return None
 
-    def _decrypt_entry(self, entry_data: tuple, master_key: bytes) -> Optional[Dict[str, Any]]:
-        if not entry_data:
+        try:
+            password, notes = cipher.decrypt_entry(*secret_data)
+        except DECRYPT_ERRORS:
+            DECRYPT_FAILURES.inc()
             return None
-            
+
+        secret = {'id': entry_id, 'password': password, 'notes': notes}
+        return {field: secret[field] for field in ['id'] + fields}
+
+    @timed('vault.search')
+    def search_entries(self, user_id: int, term: str, limit: Optional[int] = None,
+                       fields: Sequence[str] = SEARCH_FIELDS) -> List[Dict[str, Any]]:
+        term = term.strip()
+        fields = [field for field in self.SEARCH_FIELDS if field in fields]
+        if not term or not fields:
+            return []
+
+        limit = limit or self.DEFAULT_SEARCH_LIMIT
+        like_term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+        db = self.db_manager.for_user(user_id)
+        if (db.fts_enabled and len(term) >= self.MIN_TRIGRAM_LENGTH and
+                self.count_entries(user_id) >= self.FTS_MIN_ENTRIES):
+            match = "owner: \"|%d|\" AND {%s}: \"%s\"" % (user_id, " ".join(fields), term.replace('"', '""'))
+            rows = db.fetch_all(
+                f"""SELECT e.id, e.service_name, e.username, e.created_at, e.updated_at
+                   FROM vault_entries_fts f JOIN vault_entries e ON e.id = f.rowid
+                   WHERE vault_entries_fts MATCH ? AND e.user_id = ?
+                   ORDER BY e.service_name LIKE ? ESCAPE '\\' DESC, bm25(vault_entries_fts, 10.0, 1.0, 0.0), e.id
+                   LIMIT ?""",
+                (match, user_id, like_term + '%', limit)
+            )
+        else:
+            conditions = " OR ".join(f"{field} LIKE ? ESCAPE '\\'" for field in fields)
+            rows = db.fetch_all(
+                f"""SELECT id, service_name, username, created_at, updated_at
+                   FROM vault_entries WHERE user_id = ? AND ({conditions})
+                   ORDER BY service_name LIKE ? ESCAPE '\\' DESC, service_name, id
+                   LIMIT ?""",
+                (user_id,) + ('%' + like_term + '%',) * len(fields) + (like_term + '%', limit)
+            )
+
+        return self._to_metadata(rows)
+
+    def get_entry_by_service(self, user_id: int, service_name: str, cipher: CipherContext) -> Optional[VaultEntry]:
+        matches = self.search_entries(user_id, service_name, limit=1, fields=('service_name',))
+        if not matches:
+            return None
+
+        entry_data = self.db_manager.for_user(user_id).fetch_one(
+            f"SELECT {self.ENTRY_COLUMNS} FROM vault_entries WHERE user_id = ? AND id = ?",
+            (user_id, matches[0]['id'])
+        )
+        return self._decrypt_entry(entry_data, cipher) if entry_data else None
+
+    def count_entries(self, user_id: int) -> int:
+        row = self.db_manager.for_user(user_id).fetch_one(
+            "SELECT COUNT(*) FROM vault_entries WHERE user_id = ?", (user_id,)
+        )
+        return row[0] if row else 0
+
+    @timed('vault.delete')
+    def delete_entries_batch(self, user_id: int, batch_size: int) -> int:
+        db = self.db_manager.for_user(user_id)
+        entry_ids = db.fetch_all(
+            "SELECT id FROM vault_entries WHERE user_id = ? ORDER BY id LIMIT ?", (user_id, batch_size)
+        )
+        if entry_ids and not db.execute_many(
+            "DELETE FROM vault_entries WHERE id = ?", entry_ids
+        ):
+            raise RuntimeError("Failed to delete vault entries")
+        return len(entry_ids)
+
+    @timed('vault.update')
+    def update_entry(self, user_id: int, entry_id: int, new_password: Optional[str], 
+                     new_notes: Optional[str], cipher: CipherContext) -> Optional[bool]:
+        if new_password is None and new_notes is None:
+            return True
+        if new_password is None or new_notes is None:
+            return self._update_entry_partial(user_id, entry_id, new_password, new_notes, cipher)
+        update = self._update_entry_query(user_id, entry_id, new_password, new_notes, cipher)
+        return self.db_manager.for_user(user_id).execute_query(*update) if update else None
+
+    @timed('vault.update')
+    async def update_entry_async(self, user_id: int, entry_id: int, new_password: Optional[str],
+                                 new_notes: Optional[str], cipher: CipherContext) -> Optional[bool]:
+        if new_password is None and new_notes is None:
+            return True
+        if new_password is None or new_notes is None:
+            return await asyncio.to_thread(self._update_entry_partial, user_id, entry_id, new_password, new_notes, cipher)
+        update = await asyncio.to_thread(self._update_entry_query, user_id, entry_id, new_password, new_notes, cipher)
+        return await self.db_manager.for_user(user_id).execute_query_async(*update) if update else None
+
+    @timed('vault.delete')
+    def delete_entry(self, user_id: int, entry_id: int) -> bool:
+        return self.db_manager.for_user(user_id).execute_query(*self._delete_entry_query(user_id, entry_id))
+
+    @timed('vault.delete')
+    async def delete_entry_async(self, user_id: int, entry_id: int) -> bool:
+        db = self.db_manager.for_user(user_id)
+        return await db.execute_query_async(*self._delete_entry_query(user_id, entry_id))
+
+    def _add_entry_query(self, user_id: int, service_name: str, username: str,
+                         password: str, notes: str, cipher: CipherContext) -> Tuple[str, tuple]:
+        encrypted_entry = cipher.encrypt_entry(password, notes)
+        return self.INSERT_QUERY, (user_id, service_name, username, encrypted_entry, None, cipher.key_version)
+
+    def _update_entry_query(self, user_id: int, entry_id: int, new_password: str, new_notes: str,
+                            cipher: CipherContext) -> Optional[Tuple[str, tuple]]:
+        if not self.db_manager.for_user(user_id).fetch_one(
+                "SELECT 1 FROM vault_entries WHERE user_id = ? AND id = ?", (user_id, entry_id)):
+            return None
+        return self.UPDATE_QUERY, (cipher.encrypt_entry(new_password, new_notes), cipher.key_version, user_id, entry_id)
+
+    def _update_entry_partial(self, user_id: int, entry_id: int, new_password: Optional[str],
+                              new_notes: Optional[str], cipher: CipherContext) -> Optional[bool]:
+        # Password and notes share one sealed blob, so keeping the untouched field means reading it back;
+        # holding the write lock across read and write stops a concurrent partial update from being lost.
         try:
-            entry_id, service_name, username, encrypted_password, encrypted_notes, created_at, updated_at = entry_data
-            
-            decrypted_password = self.crypto_utils.decrypt_data(encrypted_password, master_key)
-            decrypted_notes = self.crypto_utils.decrypt_data(encrypted_notes, master_key) if encrypted_notes else ""
-            
-            return {
+            with self.db_manager.for_user(user_id).get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                secret_data = conn.execute(
+                    "SELECT encrypted_password, encrypted_notes FROM vault_entries WHERE user_id = ? AND id = ?",
+                    (user_id, entry_id)
+                ).fetchone()
+                if not secret_data:
+                    conn.rollback()
+                    return None
+                try:
+                    password, notes = cipher.decrypt_entry(*secret_data)
+                except DECRYPT_ERRORS:
+                    conn.rollback()
+                    DECRYPT_FAILURES.inc()
+                    return None
+                conn.execute(self.UPDATE_QUERY, (
+                    cipher.encrypt_entry(password if new_password is None else new_password,
+                                         notes if new_notes is None else new_notes),
+                    cipher.key_version, user_id, entry_id
+                ))
+                conn.commit()
+                return True
+        except sqlite3.Error:
+            return False
+
+    def _delete_entry_query(self, user_id: int, entry_id: int) -> Tuple[str, tuple]:
+        return "DELETE FROM vault_entries WHERE user_id = ? AND id = ?", (user_id, entry_id)
+
+    def _validate_import_row(self, row: Any) -> Optional[str]:
+        if isinstance(row, Exception):
+            return str(row)
+        if not isinstance(row, dict):
+            return "Row must be an object"
+
+        for field, max_length in self.FIELD_LIMITS.items():
+            value = row.get(field)
+            if value is None and field == 'notes':
+                continue
+            if not isinstance(value, str):
+                return f"Missing or invalid field: {field}"
+            if field != 'notes' and not value:
+                return f"Field must not be empty: {field}"
+            if len(value) > max_length:
+                return f"Field too long: {field} (max {max_length})"
+
+        return None
+
+    def _record_import_error(self, result: Dict[str, Any], row_number: int, error: str):
+        result['failed'] += 1
+        if len(result['errors']) < self.MAX_IMPORT_ERRORS:
+            result['errors'].append({'row': row_number, 'error': error})
+
+    def _insert_import_batch(self, user_id: int, batch: List[Tuple[int, tuple]], result: Dict[str, Any]):
+        db = self.db_manager.for_user(user_id)
+        if db.execute_many(self.INSERT_QUERY, [params for _, params in batch]):
+            result['imported'] += len(batch)
+            return
+
+        for row_number, params in batch:
+            if db.execute_query(self.INSERT_QUERY, params):
+                result['imported'] += 1
+            else:
+                self._record_import_error(result, row_number, "Database insert failed")
+
+    def _keyset_filter(self, user_id: int, after: Optional[Tuple[str, int]]) -> Tuple[str, tuple]:
+        if after is None:
+            return "user_id = ?", (user_id,)
+        return "user_id = ? AND (service_name, id) > (?, ?)", (user_id, after[0], after[1])
+
+    def _to_metadata(self, rows: Sequence[tuple]) -> List[Dict[str, Any]]:
+        return [
+            {
                 'id': entry_id,
                 'service_name': service_name,
                 'username': username,
-                'password': decrypted_password,
-                'notes': decrypted_notes,
                 'created_at': created_at,
                 'updated_at': updated_at
             }
-        except Exception:
+            for entry_id, service_name, username, created_at, updated_at in rows
+        ]
+
+    def close(self):
+        if self._decrypt_executor is not None:
+            self._decrypt_executor.shutdown(wait=True)
+            self._decrypt_executor = None
+
+    def _decrypt_entries(self, user_id: int, entries_data: Sequence[tuple],
+                         cipher: CipherContext) -> List[VaultEntry]:
+        entries = self._decrypt_all(entries_data, cipher)
+        self._migrate_legacy_entries(user_id, entries_data, entries, cipher)
+        return entries
+
+    @timed('vault.decrypt')
+    def _decrypt_all(self, entries_data: Sequence[tuple], cipher: CipherContext) -> List[VaultEntry]:
+        if len(entries_data) < self.PARALLEL_DECRYPT_THRESHOLD or self.decrypt_workers < 2:
+            return self._decrypt_chunk(entries_data, cipher)
+
+        if self._decrypt_executor is None:
+            self._decrypt_executor = ThreadPoolExecutor(max_workers=self.decrypt_workers,
+                                                        thread_name_prefix='vault-decrypt')
+
+        chunks = [
+            entries_data[start:start + self.DECRYPT_CHUNK_SIZE]
+            for start in range(0, len(entries_data), self.DECRYPT_CHUNK_SIZE)
+        ]
+        results = self._decrypt_executor.map(lambda chunk: self._decrypt_chunk(chunk, cipher), chunks)
+        return [entry for chunk in results for entry in chunk]
+
+    @timed('vault.migrate')
+    def _migrate_legacy_entries(self, user_id: int, entries_data: Sequence[tuple], entries: List[VaultEntry],
+                                cipher: CipherContext):
+        legacy = {row[0]: row[3] for row in entries_data if not cipher.is_sealed(row[3])}
+        if not legacy:
+            return
+
+        updates = [
+            (cipher.encrypt_entry(entry.password, entry.notes), cipher.key_version, entry.id, legacy[entry.id])
+            for entry in entries if entry.id in legacy
+        ]
+        if updates:
+            self.db_manager.for_user(user_id).execute_many(self.MIGRATE_QUERY, updates)
+
+    def _decrypt_chunk(self, entries_data: Sequence[tuple], cipher: CipherContext) -> List[VaultEntry]:
+        return [
+            entry for entry in [self._decrypt_entry(entry, cipher) for entry in entries_data]
+            if entry is not None
+        ]
+
+    def _decrypt_entry(self, entry_data: tuple, cipher: CipherContext) -> Optional[VaultEntry]:
+        if not entry_data:
+            return None
+            
+        try:
+            entry_id, service_name, username, encrypted_password, encrypted_notes, created_at, updated_at = entry_data
+            password, notes = cipher.decrypt_entry(encrypted_password, encrypted_notes)
+
+            return VaultEntry(entry_id, service_name, username, password, notes, created_at, updated_at)
+        except DECRYPT_ERRORS:
+            DECRYPT_FAILURES.inc()
             return None
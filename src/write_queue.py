@@ -0,0 +1,128 @@
+import sqlite3
+import queue
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Tuple, Dict, Any, List
+from connection_pool import PoolTimeoutError
+
+_STOP = object()
+
+
+class WriteQueue:
+    DEFAULT_MAX_BATCH = 64
+    DEFAULT_MAX_DELAY = 0.002
+
+    def __init__(self, db_manager, max_batch: Optional[int] = None, max_delay: Optional[float] = None):
+        self.db_manager = db_manager
+        self.max_batch = max(1, max_batch or self.DEFAULT_MAX_BATCH)
+        self.max_delay = self.DEFAULT_MAX_DELAY if max_delay is None else max_delay
+        self.logger = logging.getLogger(__name__)
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {'writes': 0, 'failed': 0, 'groups': 0, 'largest_group': 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='vault-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, query: str, params: Optional[Tuple] = None) -> Future:
+        if self._thread is None or not self._thread.is_alive():
+            raise RuntimeError("Write queue is not running")
+        future = Future()
+        self._queue.put((query, params or (), future))
+        return future
+
+    async def submit_async(self, query: str, params: Optional[Tuple] = None) -> bool:
+        return await asyncio.wrap_future(self.submit(query, params))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            group = [item]
+            stopping = False
+            deadline = time.monotonic() + self.max_delay
+            while len(group) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                group.append(item)
+
+            self._commit_group(group)
+            if stopping:
+                return
+
+    def _commit_group(self, group: List[tuple]):
+        results = []
+        try:
+            with self.db_manager.get_connection() as conn:
+                # Pooled connections run with synchronous=NORMAL, which can lose the last commits on power
+                # loss; callers are told their write landed, so each group pays for one WAL fsync.
+                conn.execute("PRAGMA synchronous = FULL")
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for query, params, _ in group:
+                        conn.execute("SAVEPOINT queued_write")
+                        try:
+                            conn.execute(query, params)
+                            results.append(True)
+                        except sqlite3.Error as e:
+                            self.logger.error(f"Queued write error: {e}")
+                            conn.execute("ROLLBACK TO queued_write")
+                            results.append(False)
+                        except Exception as e:
+                            conn.execute("ROLLBACK TO queued_write")
+                            results.append(e)
+                        conn.execute("RELEASE queued_write")
+                    conn.commit()
+                finally:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    conn.execute(f"PRAGMA synchronous = {self.db_manager.pool.pragmas['synchronous']}")
+        except sqlite3.Error as e:
+            self.logger.error(f"Group commit error: {e}")
+            results = [False] * len(group)
+        except Exception as e:
+            # Anything else would kill the only writer thread and leave every waiter hanging
+            if not isinstance(e, PoolTimeoutError):
+                self.logger.error(f"Group commit error: {e}")
+            for _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats['groups'] += 1
+            self._stats['writes'] += len(group)
+            self._stats['failed'] += sum(1 for result in results if result is not True)
+            self._stats['largest_group'] = max(self._stats['largest_group'], len(group))
+
+        for (_, _, future), result in zip(group, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
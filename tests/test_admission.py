@@ -0,0 +1,76 @@
+import unittest
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.admission = AdmissionController(max_active=2)
+        self.admission.add_lane('vault', 2, priority=0, max_queue=4, max_wait=1.0, status_code=503)
+        self.admission.add_lane('kdf', 1, priority=1, max_queue=1, max_wait=0.05, status_code=429)
+
+    async def test_queued_requests_are_admitted_by_priority(self):
+        first = await self.admission.acquire('vault')
+        await self.admission.acquire('vault')
+        order = []
+
+        async def wait(lane):
+            await self.admission.acquire(lane)
+            order.append(lane)
+
+        self.admission.lanes['kdf'].max_wait = 1.0
+        kdf = asyncio.create_task(wait('kdf'))
+        await asyncio.sleep(0)
+        vault = asyncio.create_task(wait('vault'))
+        await asyncio.sleep(0)
+        self.assertEqual(self.admission.stats()['vault']['queued'], 1)
+
+        self.admission.release('vault', first)
+        await vault
+        self.assertEqual(order, ['vault'])
+        self.admission.release('vault')
+        await kdf
+        self.assertEqual(order, ['vault', 'kdf'])
+        self.assertEqual(self.admission.active, 2)
+
+    async def test_full_queue_and_timeouts_are_shed(self):
+        await self.admission.acquire('kdf')
+        waiting = asyncio.create_task(self.admission.acquire('kdf'))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as full:
+            await self.admission.acquire('kdf')
+        self.assertEqual((full.exception.status_code, full.exception.reason), (429, 'queue_full'))
+        self.assertGreaterEqual(full.exception.retry_after, 1)
+
+        with self.assertRaises(AdmissionRejected) as timeout:
+            await waiting
+        self.assertEqual(timeout.exception.reason, 'timeout')
+        self.assertEqual(self.admission.stats()['kdf']['queued'], 0)
+
+    async def test_cancelled_waiter_releases_its_place(self):
+        await self.admission.acquire('vault')
+        await self.admission.acquire('vault')
+        waiting = asyncio.create_task(self.admission.acquire('vault'))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+        self.admission.release('vault')
+        self.admission.release('vault')
+        self.assertEqual(self.admission.stats()['vault'], {
+            'active': 0, 'queued': 0, 'limit': 2, 'service_time': 0.1
+        })
+        async with self.admission.admit('vault'):
+            self.assertEqual(self.admission.active, 1)
+        self.assertEqual(self.admission.active, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import asyncio
+import json
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CryptoUtils
+from auth_manager import AuthManager
+from kdf_pool import KdfPool
+
+
+class TestAuthManager(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.db.initialize_db()
+        self.kdf_pool = KdfPool(workers=2)
+        self.auth = AuthManager(self.db, CryptoUtils(), self.kdf_pool)
+
+    def tearDown(self):
+        self.kdf_pool.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def test_register_and_login(self):
+        self.assertTrue(self.auth.register_user("alice", "password123"))
+        self.assertFalse(self.auth.register_user("alice", "password123"))
+
+        result = self.auth.login_user("alice", "password123")
+        self.assertEqual(result['user']['username'], "alice")
+        self.assertIsInstance(result['master_key'], bytes)
+        self.assertIsNone(self.auth.login_user("alice", "wrong_password"))
+        self.assertIsNone(self.auth.login_user("nobody", "password123"))
+
+    async def test_async_register_and_login(self):
+        self.assertTrue(await self.auth.register_user_async("bob", "password123"))
+        self.assertFalse(await self.auth.register_user_async("bob", "password123"))
+
+        result = await self.auth.login_user_async("bob", "password123")
+        self.assertEqual(result['user']['username'], "bob")
+        self.assertEqual(result['master_key'], self.auth.login_user("bob", "password123")['master_key'])
+        self.assertIsNone(await self.auth.login_user_async("bob", "wrong_password"))
+
+    def _insert_legacy_user(self, username: str, password: str) -> bytes:
+        crypto = self.auth.crypto_utils
+        password_hash, salt = crypto.hash_password(password)
+        master_key = crypto.generate_key()
+        master_key_salt = crypto.generate_salt()
+        encrypted_master_key = crypto.encrypt_master_key(
+            master_key, crypto.derive_key_from_password(password, master_key_salt)
+        )
+        self.db.execute_query(
+            """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+               VALUES (?, ?, ?, ?, ?)""",
+            (username, password_hash, salt, master_key_salt, encrypted_master_key)
+        )
+        return master_key
+
+    def _auth_scheme(self, username: str) -> str:
+        return self.db.fetch_one("SELECT auth_scheme FROM users WHERE username = ?", (username,))[0]
+
+    def test_new_users_use_single_pass_scheme(self):
+        self.auth.register_user("dave", "password123")
+        self.assertEqual(self._auth_scheme("dave"), CryptoUtils.AUTH_SCHEME)
+
+    async def test_legacy_credentials_migrate_on_login(self):
+        master_key = self._insert_legacy_user("erin", "password123")
+        self.assertEqual(self._auth_scheme("erin"), CryptoUtils.LEGACY_AUTH_SCHEME)
+
+        self.assertIsNone(await self.auth.login_user_async("erin", "wrong_password"))
+        self.assertEqual(self._auth_scheme("erin"), CryptoUtils.LEGACY_AUTH_SCHEME)
+
+        result = await self.auth.login_user_async("erin", "password123")
+        self.assertEqual(result['master_key'], master_key)
+        self.assertEqual(self._auth_scheme("erin"), CryptoUtils.AUTH_SCHEME)
+        self.assertEqual(self.auth.login_user("erin", "password123")['master_key'], master_key)
+        self.assertIsNone(self.auth.login_user("erin", "wrong_password"))
+
+    async def test_outdated_kdf_params_rehash_on_login(self):
+        self.auth.register_user("frank", "password123")
+        master_key = self.auth.login_user("frank", "password123")['master_key']
+
+        self.auth.crypto_utils = CryptoUtils({'algorithm': 'scrypt', 'n': 2 ** 14, 'r': 8, 'p': 1})
+        result = await self.auth.login_user_async("frank", "password123")
+        self.assertEqual(result['master_key'], master_key)
+
+        kdf_params = self.db.fetch_one("SELECT kdf_params FROM users WHERE username = ?", ("frank",))[0]
+        self.assertEqual(json.loads(kdf_params)['algorithm'], 'scrypt')
+        self.assertFalse(self.auth.crypto_utils.needs_rehash(CryptoUtils.AUTH_SCHEME, kdf_params))
+        self.assertEqual(self.auth.login_user("frank", "password123")['master_key'], master_key)
+
+    async def test_async_login_does_not_block_event_loop(self):
+        self.auth.register_user("carol", "password123")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await self.auth.login_user_async("carol", "password123")
+        task.cancel()
+        self.assertGreater(ticks, 10)
+
+    async def test_verify_password_and_deleted_accounts(self):
+        self.auth.register_user("dave", "password123")
+        user_id = self.auth.login_user("dave", "password123")['user']['id']
+
+        self.assertTrue(await self.auth.verify_password_async(user_id, "dave", "password123"))
+        self.assertFalse(await self.auth.verify_password_async(user_id, "dave", "wrong_password"))
+        self.assertFalse(await self.auth.verify_password_async(user_id + 1, "dave", "password123"))
+
+        self.assertTrue(self.auth.mark_user_deleted(user_id))
+        self.assertIsNone(self.auth.login_user("dave", "password123"))
+        self.assertFalse(await self.auth.verify_password_async(user_id, "dave", "password123"))
+
+
+class TestKdfPool(unittest.TestCase):
+    def test_pool_sizing(self):
+        cores = os.cpu_count() or 1
+        self.assertEqual(KdfPool(workers=3).workers, 3)
+        self.assertEqual(KdfPool(workers_per_core=2).workers, cores * 2)
+        self.assertEqual(KdfPool(workers_per_core=0.01).workers, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
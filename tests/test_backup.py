@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from backup import BackupManager, BackupError
+
+
+class TestBackupManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'vault.db')
+        self.backup_dir = os.path.join(self.temp_dir, 'backups')
+        self.db = DatabaseManager(self.db_path)
+        self.db.initialize_db()
+        self.db.execute_query(
+            """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+               VALUES ('alice', x'00', x'00', x'00', x'00')"""
+        )
+        self.user_id = self.db.fetch_one("SELECT id FROM users")[0]
+        self._add_entries(200)
+        self.backups = BackupManager(self.db_path, self.backup_dir, retention=2, pages_per_step=1, step_pause=0)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _add_entries(self, count: int, prefix: str = 'service'):
+        self.db.execute_many(
+            "INSERT INTO vault_entries (user_id, service_name, username, encrypted_password) VALUES (?, ?, ?, ?)",
+            [(self.user_id, f"{prefix}_{i}", "alice", os.urandom(64)) for i in range(count)]
+        )
+
+    def test_backup_during_writes_is_a_consistent_snapshot(self):
+        stop = threading.Event()
+
+        def write():
+            while not stop.is_set():
+                self._add_entries(5, 'concurrent')
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            manifest = self.backups.create_backup()
+        finally:
+            stop.set()
+            writer.join()
+
+        self.assertEqual(self.backups.verify(manifest['file'])['sha256'], manifest['sha256'])
+        restored = os.path.join(self.temp_dir, 'restored.db')
+        self.backups.restore(manifest['file'], restored)
+        copy = DatabaseManager(restored)
+        try:
+            self.assertEqual(copy.fetch_one("SELECT COUNT(*) FROM vault_entries WHERE service_name LIKE 'service_%'")[0], 200)
+            self.assertEqual(copy.fetch_one("SELECT COUNT(*) FROM vault_entries")[0] % 5, 0)
+        finally:
+            copy.close()
+
+    def test_retention_keeps_newest_backups(self):
+        names = [self.backups.create_backup()['file'] for _ in range(3)]
+        self.assertEqual([manifest['file'] for manifest in self.backups.list_backups()], names[1:])
+        self.assertEqual(sorted(os.listdir(self.backup_dir)),
+                         sorted([names[1], names[2], names[1][:-6] + '.json', names[2][:-6] + '.json']))
+
+    def test_corrupted_backup_fails_verification(self):
+        name = self.backups.create_backup()['file']
+        path = os.path.join(self.backup_dir, name)
+        with open(path, 'r+b') as f:
+            f.seek(40)
+            f.write(b'corrupt')
+
+        with self.assertRaises(BackupError):
+            self.backups.verify(name)
+        with self.assertRaises(BackupError):
+            self.backups.restore(name)
+        self.assertEqual(self.db.fetch_one("SELECT COUNT(*) FROM users")[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
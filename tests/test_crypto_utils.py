@@ -5,7 +5,8 @@ from unittest.mock import patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from crypto_utils import CryptoUtils
+from cryptography.fernet import InvalidToken
+from crypto_utils import CryptoUtils, CipherContext
 
 
 class TestCryptoUtils(unittest.TestCase):
@@ -64,6 +65,60 @@ class TestCryptoUtils(unittest.TestCase):
         self.assertEqual(len(salt1), CryptoUtils.SALT_LENGTH)
         self.assertNotEqual(salt1, salt2)
 
+    def test_cipher_context_roundtrip(self):
+        key = self.crypto.generate_key()
+        cipher = self.crypto.create_cipher_context(key)
+
+        encrypted_data = cipher.encrypt("sensitive_data_123")
+        self.assertEqual(cipher.decrypt(encrypted_data), "sensitive_data_123")
+        self.assertEqual(self.crypto.decrypt_data(encrypted_data, key), "sensitive_data_123")
+        self.assertEqual(cipher.decrypt(self.crypto.encrypt_data("legacy", key)), "legacy")
+
+    def test_cipher_context_previous_keys(self):
+        old_key = self.crypto.generate_key()
+        new_key = self.crypto.generate_key()
+        old_token = self.crypto.encrypt_data("old_data", old_key)
+
+        cipher = CipherContext(new_key, [old_key])
+        self.assertEqual(cipher.decrypt(old_token), "old_data")
+        self.assertEqual(self.crypto.decrypt_data(cipher.encrypt("new_data"), new_key), "new_data")
+
+    def test_sealed_entry_format(self):
+        old_key = self.crypto.generate_key()
+        old_cipher = CipherContext(old_key)
+        sealed = old_cipher.encrypt_entry("password", "")
+
+        self.assertTrue(CipherContext.is_sealed(sealed))
+        self.assertFalse(CipherContext.is_sealed(old_cipher.encrypt("password")))
+        self.assertLess(len(sealed), len(old_cipher.encrypt("password")))
+        self.assertEqual(old_cipher.decrypt_entry(sealed), ("password", ""))
+
+        cipher = CipherContext(self.crypto.generate_key(), [old_key])
+        self.assertEqual(cipher.decrypt_entry(sealed), ("password", ""))
+        self.assertEqual(cipher.decrypt_entry(old_cipher.encrypt("pw"), old_cipher.encrypt("notes")), ("pw", "notes"))
+        rotated = cipher.reencrypt_entry(old_cipher.encrypt("pw"), old_cipher.encrypt("notes"))
+        self.assertEqual(CipherContext(cipher.master_key).decrypt_entry(rotated), ("pw", "notes"))
+
+        with self.assertRaises(InvalidToken):
+            old_cipher.decrypt_entry(rotated)
+
+    def test_cipher_context_wipe(self):
+        cipher = self.crypto.create_cipher_context(self.crypto.generate_key())
+        cipher.wipe()
+
+        self.assertTrue(cipher.wiped)
+        with self.assertRaises(ValueError):
+            cipher.encrypt("data")
+
+    def test_kdf_params_validation(self):
+        self.assertEqual(self.crypto.kdf_params, CryptoUtils.DEFAULT_KDF_PARAMS)
+        with self.assertRaises(ValueError):
+            CryptoUtils({'algorithm': 'pbkdf2-sha256', 'iterations': 1000})
+        with self.assertRaises(ValueError):
+            CryptoUtils({'algorithm': 'scrypt', 'n': 3000})
+        with self.assertRaises(ValueError):
+            CryptoUtils({'algorithm': 'md5'})
+
 
 if __name__ == '__main__':
     unittest.main()
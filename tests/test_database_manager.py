@@ -0,0 +1,141 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import asyncio
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from connection_pool import PoolTimeoutError
+import write_queue
+
+
+class TestDatabaseManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'), pool_size=2, pool_timeout=0.2)
+        self.assertTrue(self.db.initialize_db())
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.db.fetch_one("PRAGMA journal_mode")[0].lower(), 'wal')
+        self.assertEqual(self.db.fetch_one("PRAGMA foreign_keys")[0], 1)
+        self.assertEqual(self.db.fetch_one("PRAGMA synchronous")[0], 1)
+
+    def test_connections_are_reused(self):
+        for _ in range(20):
+            self.db.fetch_all("SELECT id FROM users")
+
+        stats = self.db.pool_stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertGreaterEqual(stats['checkouts'], 20)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_pool_is_bounded(self):
+        first = self.db.pool.acquire()
+        second = self.db.pool.acquire()
+        try:
+            with self.assertRaises(PoolTimeoutError):
+                self.db.pool.acquire()
+            with self.assertRaises(PoolTimeoutError):
+                self.db.fetch_one("SELECT 1")
+        finally:
+            self.db.pool.release(first)
+            self.db.pool.release(second)
+
+        stats = self.db.pool_stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['timeouts'], 2)
+        self.assertEqual(self.db.fetch_one("SELECT 1"), (1,))
+
+    def test_concurrent_writes(self):
+        def insert(worker):
+            for i in range(25):
+                self.db.execute_query(
+                    """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (f"user_{worker}_{i}", b"h", b"s", b"m", b"k")
+                )
+
+        threads = [threading.Thread(target=insert, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.db.fetch_one("SELECT COUNT(*) FROM users")[0], 100)
+        self.assertLessEqual(self.db.pool_stats()['size'], 2)
+
+    def test_cascade_delete(self):
+        self.db.execute_query(
+            """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+               VALUES (?, ?, ?, ?, ?)""",
+            ("alice", b"h", b"s", b"m", b"k")
+        )
+        user_id = self.db.fetch_one("SELECT id FROM users WHERE username = ?", ("alice",))[0]
+        self.db.execute_query(
+            """INSERT INTO vault_entries (user_id, service_name, username, encrypted_password)
+               VALUES (?, ?, ?, ?)""",
+            (user_id, "svc", "u", b"p")
+        )
+        self.db.execute_query("DELETE FROM users WHERE id = ?", (user_id,))
+        self.assertEqual(self.db.fetch_one("SELECT COUNT(*) FROM vault_entries")[0], 0)
+
+    def test_write_queue_group_commit(self):
+        self.db.enable_write_queue(max_batch=16, max_delay=0.05)
+        query = """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+                   VALUES (?, ?, ?, ?, ?)"""
+
+        async def write_all():
+            return await asyncio.gather(*[
+                self.db.execute_query_async(query, (f"user_{i % 40}", b"h", b"s", b"m", b"k"))
+                for i in range(48)
+            ])
+
+        results = asyncio.run(write_all())
+        self.assertEqual(results, [True] * 40 + [False] * 8)
+        self.assertEqual(self.db.fetch_one("SELECT COUNT(*) FROM users")[0], 40)
+
+        stats = self.db.write_queue.stats()
+        self.assertEqual(stats['writes'], 48)
+        self.assertEqual(stats['failed'], 8)
+        self.assertLess(stats['groups'], 48)
+        self.assertLessEqual(stats['largest_group'], 16)
+        with self.db.get_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_write_queue_survives_unexpected_errors(self):
+        self.db.enable_write_queue(max_batch=4, max_delay=0.05)
+        query = "INSERT INTO jobs (id, user_id, kind, status) VALUES (?, 1, 'count', 'queued')"
+
+        async def write_all():
+            return await asyncio.gather(
+                self.db.execute_query_async(query, ("a",)),
+                self.db.execute_query_async(query, (1 << 70,)),
+                return_exceptions=True
+            )
+
+        first, bad = asyncio.run(write_all())
+        self.assertIs(first, True)
+        self.assertIsInstance(bad, Exception)
+
+        with mock.patch.object(self.db, 'get_connection', side_effect=RuntimeError("pool broke")):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(self.db.execute_query_async(query, ("b",)))
+        self.assertTrue(asyncio.run(self.db.execute_query_async(query, ("c",))))
+
+        self.db.write_queue._queue.put(write_queue._STOP)
+        self.db.write_queue._thread.join(5)
+        with self.assertRaises(RuntimeError):
+            self.db.write_queue.submit(query, ("d",))
+
+
+if __name__ == '__main__':
+    unittest.main()
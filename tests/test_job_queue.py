@@ -0,0 +1,125 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from job_queue import JobQueue, JobLimitError
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.db.initialize_db()
+        self.queue = JobQueue(self.db, workers=2, max_active_per_user=1)
+        self.release = threading.Event()
+        self.cleaned = []
+
+        def count(job, limit):
+            for done in range(1, limit + 1):
+                job.progress(done, limit)
+            return {'counted': limit}
+
+        def block(job, label):
+            job.progress(0)
+            self.release.wait(5)
+            job.progress(1)
+            return {'label': label}
+
+        self.queue.register('count', count, resumable=True, cancellable=False)
+        self.queue.register('block', block, cleanup=lambda label: self.cleaned.append(label))
+
+    def tearDown(self):
+        self.release.set()
+        self.queue.stop()
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _wait(self, job_id, statuses=('succeeded', 'failed', 'cancelled')):
+        for _ in range(500):
+            job = self.queue.get(job_id)
+            if job['status'] in statuses:
+                return job
+            threading.Event().wait(0.01)
+        self.fail("job did not finish")
+
+    def test_job_runs_and_reports_progress(self):
+        self.queue.start()
+        job_id = self.queue.submit(1, 'count', {'limit': 3})
+        job = self._wait(job_id)
+
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual((job['progress'], job['total']), (3, 3))
+        self.assertEqual(job['result'], {'counted': 3})
+        self.assertIsNone(self.queue.get(job_id, user_id=2))
+        self.assertEqual([item['id'] for item in self.queue.list_jobs(1)], [job_id])
+
+        token = self.queue.issue_status_token(job_id)
+        self.assertEqual(self.queue.get_with_status_token(job_id, token)['result'], {'counted': 3})
+        self.assertIsNone(self.queue.get_with_status_token(job_id, token + "x"))
+
+    def test_cancel_limit_and_cleanup(self):
+        self.queue.start()
+        job_id = self.queue.submit(1, 'block', context={'label': 'first'})
+        with self.assertRaises(JobLimitError):
+            self.queue.submit(1, 'block', context={'label': 'second'})
+
+        self._wait(job_id, ('running',))
+        self.assertEqual(self.queue.cancel(job_id, 1)['kind'], 'block')
+        self.release.set()
+        self.assertEqual(self._wait(job_id)['status'], 'cancelled')
+        self.assertEqual(self.cleaned, ['first'])
+
+        self.db.execute_query("INSERT INTO jobs (id, user_id, kind, status) VALUES ('c', 2, 'count', 'queued')")
+        with self.assertRaises(ValueError):
+            self.queue.cancel('c', 2)
+
+    def test_recover_resumes_only_resumable_jobs(self):
+        self.db.execute_query(
+            "INSERT INTO jobs (id, user_id, kind, status, params) VALUES ('a', 1, 'count', 'running', '{\"limit\": 2}')"
+        )
+        self.db.execute_query(
+            "INSERT INTO jobs (id, user_id, kind, status, params) VALUES ('b', 1, 'block', 'running', '{}')"
+        )
+        self.db.execute_query(
+            """INSERT INTO jobs (id, user_id, kind, status, params, worker_id, lease_expires_at)
+               VALUES ('c', 2, 'count', 'running', '{"limit": 2}', 'other', datetime('now', '+1 hour'))"""
+        )
+        self.queue.lease_seconds = 0.3
+        self.queue.start()
+
+        self.assertEqual(self._wait('a')['status'], 'succeeded')
+        interrupted = self.queue.get('b')
+        self.assertEqual(interrupted['status'], 'failed')
+        self.assertIn('restart', interrupted['error'])
+        self.assertEqual(self.queue.get('c')['status'], 'running')
+
+        self.db.execute_query("UPDATE jobs SET lease_expires_at = datetime('now', '-1 second') WHERE id = 'c'")
+        self.assertEqual(self._wait('c')['status'], 'succeeded')
+
+    def test_workers_share_limits_and_claims(self):
+        other = JobQueue(self.db, workers=1, max_active_per_user=1)
+        other.register('block', lambda job, label: None)
+        self.queue.start()
+        other.start()
+        try:
+            job_id = self.queue.submit(1, 'block', context={'label': 'first'})
+            with self.assertRaises(JobLimitError):
+                other.submit(1, 'block', context={'label': 'second'})
+
+            self._wait(job_id, ('running',))
+            other._execute(job_id, 1, 'block', {}, {'label': 'stolen'})
+            self.assertEqual(self.queue.get(job_id)['status'], 'running')
+            self.release.set()
+            self.assertEqual(self._wait(job_id)['result'], {'label': 'first'})
+        finally:
+            other.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
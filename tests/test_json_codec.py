@@ -0,0 +1,32 @@
+import unittest
+import sys
+import os
+import json
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import json_codec
+from vault_manager import VaultEntry
+
+
+class TestJsonCodec(unittest.TestCase):
+    def setUp(self):
+        self.entry = VaultEntry(1, "GitHub", "alice", "pässword", "", "2024-01-01 00:00:00", "2024-01-01 00:00:00")
+
+    def test_entry_serialization(self):
+        payload = json.loads(json_codec.dumps([self.entry]))
+        self.assertEqual(payload, [{
+            'id': 1, 'service_name': "GitHub", 'username': "alice", 'password': "pässword", 'notes': "",
+            'created_at': "2024-01-01 00:00:00", 'updated_at': "2024-01-01 00:00:00"
+        }])
+        self.assertEqual(self.entry['service_name'], "GitHub")
+
+    def test_stdlib_fallback_matches(self):
+        with mock.patch.object(json_codec, 'orjson', None):
+            fallback = json_codec.dumps({'entries': [self.entry]})
+        self.assertEqual(json.loads(fallback), json.loads(json_codec.dumps({'entries': [self.entry]})))
+
+
+if __name__ == '__main__':
+    unittest.main()
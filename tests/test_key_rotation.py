@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CryptoUtils
+from auth_manager import AuthManager
+from vault_manager import VaultManager
+from key_rotation import KeyRotator
+from kdf_pool import KdfPool
+
+
+class TestKeyRotation(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.db.initialize_db()
+        self.crypto = CryptoUtils()
+        self.kdf_pool = KdfPool(workers=1)
+        self.auth = AuthManager(self.db, self.crypto, self.kdf_pool)
+        self.vault = VaultManager(self.db, self.crypto)
+
+        self.auth.register_user("alice", "password123")
+        login = self.auth.login_user("alice", "password123")
+        self.user_id = login['user']['id']
+        self.old_cipher = self.crypto.create_cipher_context(login['master_key'])
+        for i in range(5):
+            self.vault.add_entry(self.user_id, f"service_{i}", "alice", f"pass_{i}", f"note_{i}", self.old_cipher)
+
+    def tearDown(self):
+        self.kdf_pool.shutdown()
+        self.vault.close()
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _cipher(self, result):
+        return self.crypto.create_cipher_context(result['master_key'], result['previous_keys'], result['key_version'])
+
+    async def test_rotation_resumes_and_completes(self):
+        version_before = self.vault.get_vault_version(self.user_id)
+        self.assertIsNone(await self.auth.rotate_master_key_async(self.user_id, "alice", "wrong_password"))
+
+        result = await self.auth.rotate_master_key_async(self.user_id, "alice", "password123")
+        self.assertEqual(result['key_version'], 2)
+        self.assertIsNone(await self.auth.rotate_master_key_async(self.user_id, "alice", "password123"))
+
+        cipher = self._cipher(result)
+        self.vault.add_entry(self.user_id, "service_new", "alice", "pass_new", "", cipher)
+        self.assertEqual(KeyRotator(self.db, batch_size=2).rotate_batch(self.user_id, cipher), 2)
+
+        login = self.auth.login_user("alice", "password123")
+        self.assertEqual(len(login['previous_keys']), 1)
+        resumed = self._cipher(login)
+        self.assertEqual(len(self.vault.get_all_entries(self.user_id, resumed)), 6)
+
+        rotator = KeyRotator(self.db, batch_size=2, batch_delay=0)
+        self.assertEqual(rotator.status(self.user_id)['remaining'], 3)
+        self.assertTrue(rotator.run(self.user_id, resumed))
+        self.assertIsNone(rotator.status(self.user_id))
+
+        final = self.auth.login_user("alice", "password123")
+        self.assertEqual(final['previous_keys'], [])
+        entries = self.vault.get_all_entries(self.user_id, self.crypto.create_cipher_context(final['master_key']))
+        self.assertEqual(sorted(entry['password'] for entry in entries),
+                         ["pass_0", "pass_1", "pass_2", "pass_3", "pass_4", "pass_new"])
+        self.assertEqual(self.db.fetch_all("SELECT DISTINCT key_version FROM vault_entries"), [(2,)])
+        self.assertEqual(self.vault.get_vault_version(self.user_id), version_before + 1)
+
+    async def test_stale_cipher_writes_are_rotated(self):
+        result = await self.auth.rotate_master_key_async(self.user_id, "alice", "password123")
+        cipher = self._cipher(result)
+        rotator = KeyRotator(self.db, batch_size=10, batch_delay=0)
+        self.assertEqual(rotator.rotate_batch(self.user_id, cipher), 5)
+
+        first_id = self.vault.get_all_entries(self.user_id, cipher)[0]['id']
+        self.assertTrue(self.vault.update_entry(self.user_id, first_id, "changed", "", self.old_cipher))
+        self.vault.add_entry(self.user_id, "service_late", "alice", "pass_late", "", self.old_cipher)
+        self.assertEqual(rotator.rotate_batch(self.user_id, cipher), 1)
+        self.assertEqual(rotator._finish(self.user_id), 1)
+        self.assertIsNotNone(self.auth.login_user("alice", "password123")['previous_keys'])
+
+        self.assertTrue(rotator.run(self.user_id, cipher))
+        final = self.auth.login_user("alice", "password123")
+        self.assertEqual(final['previous_keys'], [])
+        entries = self.vault.get_all_entries(self.user_id, self.crypto.create_cipher_context(final['master_key']))
+        self.assertEqual(len(entries), 6)
+        self.assertIn("changed", [entry['password'] for entry in entries])
+
+    async def test_background_worker(self):
+        result = await self.auth.rotate_master_key_async(self.user_id, "alice", "password123")
+        rotator = KeyRotator(self.db, batch_size=2, batch_delay=0)
+        cipher = self._cipher(result)
+
+        self.assertTrue(rotator.start(self.user_id, cipher))
+        rotator.stop()
+        self.assertTrue(cipher.wiped)
+        self.assertFalse(rotator.start(self.user_id, self._cipher(result)))
+
+
+if __name__ == '__main__':
+    unittest.main()
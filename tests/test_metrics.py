@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import metrics
+from metrics import MetricsRegistry, stage, timed, start_request_timing, stop_request_timing
+from kdf_pool import KdfPool
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_render_prometheus_format(self):
+        registry = MetricsRegistry()
+        requests = registry.counter('test_requests_total', "Requests", ('route',))
+        latency = registry.histogram('test_latency_seconds', "Latency", buckets=(0.1, 1.0))
+        registry.gauge('test_sessions', "Sessions", lambda: 3)
+        registry.gauge('test_queue_depth', "Queue depth", lambda: {('kdf',): 2, ('vault',): 0}, labelnames=('lane',))
+
+        requests.inc(route='/a"b')
+        requests.inc(route='/a"b')
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+        output = registry.render()
+
+        self.assertIn('# TYPE test_requests_total counter', output)
+        self.assertIn('test_requests_total{route="/a\\"b"} 2.0', output)
+        self.assertIn('test_latency_seconds_bucket{le="0.1"} 1.0', output)
+        self.assertIn('test_latency_seconds_bucket{le="1.0"} 2.0', output)
+        self.assertIn('test_latency_seconds_bucket{le="+Inf"} 3.0', output)
+        self.assertIn('test_latency_seconds_count 3.0', output)
+        self.assertIn('test_sessions 3.0', output)
+        self.assertIn('test_queue_depth{lane="kdf"} 2.0', output)
+
+    def test_register_returns_existing_metric(self):
+        registry = MetricsRegistry()
+        first = registry.counter('test_total', "Test")
+        self.assertIs(registry.counter('test_total', "Test"), first)
+
+
+class TestRequestTiming(unittest.TestCase):
+    def test_stages_recorded_only_inside_request(self):
+        before = metrics.STAGE_SECONDS.count(stage='test.outside')
+        with stage('test.outside'):
+            pass
+        self.assertEqual(metrics.STAGE_SECONDS.count(stage='test.outside'), before + 1)
+
+        timings, token = start_request_timing()
+        try:
+            with stage('test.inside'):
+                pass
+            with stage('test.inside'):
+                pass
+        finally:
+            stop_request_timing(token)
+
+        self.assertEqual(timings['test.inside'][1], 2)
+        self.assertNotIn('test.outside', timings)
+        header = metrics.format_server_timing(timings, 0.01)
+        self.assertIn('test.inside;dur=', header)
+        self.assertTrue(header.endswith('total;dur=10.000'))
+
+    def test_timing_follows_kdf_pool_threads(self):
+        @timed('test.kdf')
+        def work():
+            return 42
+
+        async def request():
+            timings, token = start_request_timing()
+            try:
+                self.assertEqual(await pool.run(work), 42)
+            finally:
+                stop_request_timing(token)
+            return timings
+
+        pool = KdfPool(workers=1)
+        try:
+            timings = asyncio.run(request())
+        finally:
+            pool.shutdown()
+
+        self.assertIn('test.kdf', timings)
+        self.assertIn('kdf_pool', timings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CryptoUtils
+from auth_manager import AuthManager
+from vault_manager import VaultManager
+from key_rotation import KeyRotator
+from job_queue import JobQueue
+from kdf_pool import KdfPool
+from migrations import MIGRATIONS, apply_migrations, fts_available
+
+
+class TestQueryPlans(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test.db')
+        self.db = DatabaseManager(self.db_path, pool_size=1)
+        self.db.initialize_db()
+        self.crypto = CryptoUtils()
+        self.kdf_pool = KdfPool(workers=1)
+        self.auth = AuthManager(self.db, self.crypto, self.kdf_pool)
+        self.vault = VaultManager(self.db, self.crypto)
+
+    def tearDown(self):
+        self.kdf_pool.shutdown()
+        self.vault.close()
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _run_hot_paths(self):
+        self.auth.register_user("alice", "password123")
+        login = self.auth.login_user("alice", "password123")
+        user_id = login['user']['id']
+        cipher = self.crypto.create_cipher_context(login['master_key'])
+        for i in range(5):
+            self.vault.add_entry(user_id, f"service_{i}", "alice", f"pass_{i}", "", cipher)
+
+        entries = self.vault.get_all_entries(user_id, cipher)
+        self.vault.get_entries_page(user_id, cipher, 2, ("service_1", entries[1]['id']))
+        self.vault.get_entries_metadata(user_id, 2, ("service_1", entries[1]['id']))
+        list(self.vault.iter_entries(user_id, cipher))
+        self.vault.reveal_entry_secret(user_id, entries[0]['id'], cipher)
+        self.vault.update_entry(user_id, entries[0]['id'], None, "note", cipher)
+        self.vault.get_changes(user_id, cipher, 1)
+        self.vault.search_entries(user_id, "service")
+        self.vault.search_entries(user_id, "se")
+        self.vault.get_entry_by_service(user_id, "service_3", cipher)
+        self.vault.count_entries(user_id)
+        self.vault.delete_entries_batch(user_id, 1)
+        self.auth.usernames.refresh()
+
+        rotator = KeyRotator(self.db)
+        rotator.status(user_id)
+        rotator.rotate_batch(user_id, cipher)
+        jobs = JobQueue(self.db)
+        jobs.list_jobs(user_id)
+        jobs.get("missing", user_id)
+
+    def test_hot_queries_use_indexes(self):
+        statements = []
+        self.auth.usernames.load()
+        connection = self.db.pool.acquire()
+        connection.set_trace_callback(statements.append)
+        self.db.pool.release(connection)
+        try:
+            self._run_hot_paths()
+        finally:
+            connection.set_trace_callback(None)
+
+        # FTS5 reads its own shadow tables (e.g. vault_entries_fts_config) through the same connection
+        queries = sorted({sql for sql in statements
+                          if sql.lstrip().upper().startswith('SELECT') and 'vault_entries_fts_' not in sql})
+        self.assertGreater(len(queries), 10)
+
+        explain = sqlite3.connect(self.db_path)
+        try:
+            for sql in queries:
+                plan = [row[3] for row in explain.execute(f"EXPLAIN QUERY PLAN {sql}")]
+                scans = [step for step in plan if step.startswith('SCAN') and 'VIRTUAL TABLE' not in step]
+                self.assertEqual(scans, [], f"{sql}\n{plan}")
+                if 'MATCH' not in sql and 'LIKE' not in sql:
+                    self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], f"{sql}\n{plan}")
+        finally:
+            explain.close()
+
+    def test_migrations_are_recorded_and_idempotent(self):
+        latest = MIGRATIONS[-1][0]
+        self.assertEqual(self.db.schema_version, latest)
+        self.assertEqual(self.db.fetch_one("PRAGMA user_version")[0], latest)
+        self.assertTrue(self.db.initialize_db())
+
+        indexes = {name for (name,) in self.db.fetch_all("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('idx_vault_entries_user_service', indexes)
+        self.assertNotIn('idx_users_username', indexes)
+        self.assertNotIn('idx_vault_entries_user_id', indexes)
+
+    def test_legacy_database_is_upgraded(self):
+        legacy_path = os.path.join(self.temp_dir, 'legacy.db')
+        connection = sqlite3.connect(legacy_path)
+        try:
+            connection.execute("""
+                CREATE TABLE users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL UNIQUE,
+                    password_hash BLOB NOT NULL,
+                    salt BLOB NOT NULL,
+                    master_key_salt BLOB NOT NULL,
+                    encrypted_master_key BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            connection.execute(
+                "INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key) "
+                "VALUES ('bob', x'00', x'00', x'00', x'00')"
+            )
+            connection.execute("CREATE VIRTUAL TABLE vault_entries_fts USING fts5(service_name, username)")
+            connection.commit()
+
+            self.assertEqual(apply_migrations(connection), MIGRATIONS[-1][0])
+            self.assertTrue(fts_available(connection))
+            self.assertIn('owner', {row[1] for row in connection.execute("PRAGMA table_info(vault_entries_fts)")})
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(users)")}
+            self.assertTrue({'auth_scheme', 'vault_version', 'key_version', 'deleted_at'} <= columns)
+            self.assertEqual(connection.execute("SELECT auth_scheme FROM users").fetchone(), ('bcrypt-pbkdf2',))
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CryptoUtils
+from vault_manager import VaultManager
+from search_index import SearchIndexCache
+from session_store import MemorySessionStore
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.db.initialize_db()
+        self.db.execute_query(
+            """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+               VALUES ('alice', x'00', x'00', x'00', x'00')"""
+        )
+        self.user_id = self.db.fetch_one("SELECT id FROM users")[0]
+        self.crypto = CryptoUtils()
+        self.cipher = self.crypto.create_cipher_context(self.crypto.generate_key())
+        self.vault = VaultManager(self.db, self.crypto)
+        self.vault.add_entry(self.user_id, "Work VPN", "alice", "secret1", "Office vpn, token in drawer", self.cipher)
+        self.vault.add_entry(self.user_id, "GitHub", "alice@example.com", "secret2", "", self.cipher)
+        self.vault.add_entry(self.user_id, "vpn-backup", "bob", "secret3", "", self.cipher)
+        self.cache = SearchIndexCache()
+
+    def tearDown(self):
+        self.vault.close()
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _search(self, term: str, token: str = "token", limit: int = 10):
+        return self.cache.search(token, self.vault, self.user_id, self.cipher, term, limit)
+
+    def test_searches_notes_and_follows_vault_changes(self):
+        self.assertEqual([entry['service_name'] for entry in self._search("VPN")], ["vpn-backup", "Work VPN"])
+        self.assertEqual([entry['service_name'] for entry in self._search("drawer")], ["Work VPN"])
+        self.assertEqual([entry['service_name'] for entry in self._search("ex")], ["GitHub"])
+        self.assertEqual(self._search("secret1"), [])
+        self.assertNotIn('notes', self._search("drawer")[0])
+
+        github = self._search("github")[0]['id']
+        self.vault.update_entry(self.user_id, github, None, "recovery codes in the vpn safe", self.cipher)
+        self.vault.delete_entry(self.user_id, self._search("vpn-backup")[0]['id'])
+        self.vault.add_entry(self.user_id, "Home VPN", "alice", "secret4", "", self.cipher)
+
+        self.assertEqual([entry['service_name'] for entry in self._search("vpn")],
+                         ["GitHub", "Home VPN", "Work VPN"])
+        self.assertEqual(self._search("drawer", limit=1)[0]['service_name'], "Work VPN")
+
+    def test_indexes_are_bounded_and_discarded(self):
+        self._search("vpn", token="a")
+        single = self.cache.stats()['bytes']
+        self.cache.max_bytes = single * 2
+        self._search("vpn", token="b")
+        self._search("vpn", token="c")
+        self.assertEqual(self.cache.stats(), {'indexes': 2, 'bytes': single * 2})
+
+        self.cache.discard("c")
+        self.assertEqual(self.cache.stats()['indexes'], 1)
+        self.cache.discard_user(self.user_id)
+        self.assertEqual(self.cache.stats(), {'indexes': 0, 'bytes': 0})
+
+        self.cache.max_bytes = single - 1
+        self.assertEqual(len(self._search("vpn", token="d")), 2)
+        self.assertEqual(self.cache.stats()['indexes'], 0)
+
+    def test_indexes_follow_session_expiry(self):
+        store = MemorySessionStore(self.crypto, idle_ttl=0.05, max_sessions=2)
+        store.add_removal_listener(self.cache.discard_sessions)
+        tokens = [store.create({'id': self.user_id, 'username': 'alice'}, self.cipher.master_key) for _ in range(2)]
+        for token in tokens:
+            self._search("vpn", token=store.session_key(token))
+
+        store.create({'id': self.user_id, 'username': 'alice'}, self.cipher.master_key)
+        self.assertEqual(self.cache.stats()['indexes'], 1)
+        time.sleep(0.1)
+        store.sweep()
+        self.assertEqual(self.cache.stats(), {'indexes': 0, 'bytes': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
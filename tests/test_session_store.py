@@ -0,0 +1,93 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from crypto_utils import CryptoUtils
+from session_store import MemorySessionStore, SQLiteSessionStore, load_or_create_wrap_key
+
+
+class TestMemorySessionStore(unittest.TestCase):
+    def setUp(self):
+        self.crypto = CryptoUtils()
+        self.master_key = self.crypto.generate_key()
+
+    def test_create_get_delete(self):
+        store = MemorySessionStore(self.crypto)
+        token = store.create({'id': 1, 'username': 'alice'}, self.master_key)
+        session = store.get(token)
+
+        self.assertEqual(session['user']['username'], 'alice')
+        self.assertEqual(session['cipher'].master_key, self.master_key)
+        store.delete(token)
+        self.assertIsNone(store.get(token))
+        self.assertTrue(session['cipher'].wiped)
+
+    def test_lru_eviction(self):
+        store = MemorySessionStore(self.crypto, max_sessions=2)
+        first = store.create({'id': 1, 'username': 'a'}, self.master_key)
+        second = store.create({'id': 2, 'username': 'b'}, self.master_key)
+        store.get(first)
+        store.create({'id': 3, 'username': 'c'}, self.master_key)
+
+        self.assertIsNotNone(store.get(first))
+        self.assertIsNone(store.get(second))
+        self.assertEqual(store.count(), 2)
+
+    def test_idle_expiry_and_sweep(self):
+        store = MemorySessionStore(self.crypto, idle_ttl=0.05)
+        token = store.create({'id': 1, 'username': 'a'}, self.master_key)
+        store.create({'id': 1, 'username': 'a'}, self.master_key)
+        time.sleep(0.1)
+
+        self.assertIsNone(store.get(token))
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(store.count(), 0)
+
+
+class TestSQLiteSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.crypto = CryptoUtils()
+        self.master_key = self.crypto.generate_key()
+        db_path = os.path.join(self.temp_dir, 'sessions.db')
+        wrap_key = load_or_create_wrap_key(db_path + '.key')
+        self.worker_a = SQLiteSessionStore(self.crypto, db_path, wrap_key)
+        self.worker_b = SQLiteSessionStore(self.crypto, db_path, load_or_create_wrap_key(db_path + '.key'))
+
+    def tearDown(self):
+        self.worker_a.close()
+        self.worker_b.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_sessions_are_shared_between_workers(self):
+        token = self.worker_a.create({'id': 7, 'username': 'alice'}, self.master_key)
+        session = self.worker_b.get(token)
+
+        self.assertEqual(session['user'], {'id': 7, 'username': 'alice'})
+        self.assertEqual(session['cipher'].master_key, self.master_key)
+
+        self.worker_a.delete(token)
+        self.assertIsNone(self.worker_b.get(token))
+        self.assertTrue(session['cipher'].wiped)
+
+    def test_delete_user_and_sweep(self):
+        self.worker_a.create({'id': 1, 'username': 'a'}, self.master_key)
+        self.worker_a.create({'id': 1, 'username': 'a'}, self.master_key)
+        kept = self.worker_a.create({'id': 2, 'username': 'b'}, self.master_key)
+
+        self.assertEqual(self.worker_b.delete_user(1), 2)
+        self.assertEqual(self.worker_b.count(), 1)
+
+        self.worker_a.idle_ttl = 0.05
+        time.sleep(0.1)
+        self.assertEqual(self.worker_a.sweep(), 1)
+        self.assertIsNone(self.worker_b.get(kept))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CryptoUtils
+from auth_manager import AuthManager
+from vault_manager import VaultManager
+from kdf_pool import KdfPool
+from sharding import ShardedDatabaseManager, ENTRY_ID_SPACE, rebalance, shard_status
+
+
+class TestShardedDatabaseManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'vault.db')
+        self.crypto = CryptoUtils()
+        self.kdf_pool = KdfPool(workers=1)
+        self.managers = []
+
+    def tearDown(self):
+        for db, vault in self.managers:
+            vault.close()
+            db.close()
+        self.kdf_pool.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def _open(self, shards: int = 0):
+        db = ShardedDatabaseManager(self.db_path, shards) if shards else DatabaseManager(self.db_path)
+        self.assertTrue(db.initialize_db())
+        vault = VaultManager(db, self.crypto)
+        self.managers.append((db, vault))
+        return db, AuthManager(db, self.crypto, self.kdf_pool), vault
+
+    def _login(self, auth: AuthManager, username: str):
+        login = auth.login_user(username, "password123")
+        return login['user']['id'], self.crypto.create_cipher_context(login['master_key'])
+
+    def test_users_are_routed_to_their_shard(self):
+        db, auth, vault = self._open(shards=3)
+        usernames = [f"user{i}" for i in range(12)]
+        for username in usernames:
+            self.assertTrue(auth.register_user(username, "password123"))
+        self.assertFalse(auth.register_user("user0", "password123"))
+
+        for username in usernames:
+            user_id, cipher = self._login(auth, username)
+            index = db.shard_index(username)
+            self.assertIs(db.for_user(user_id), db.shards[index])
+            self.assertTrue(vault.add_entry(user_id, f"{username}-mail", username, "secret", "", cipher))
+            entries = vault.get_all_entries(user_id, cipher)
+            self.assertEqual([entry.service_name for entry in entries], [f"{username}-mail"])
+            self.assertEqual(entries[0].id // ENTRY_ID_SPACE, index + 1)
+
+        self.assertEqual(len({db.shard_index(username) for username in usernames}), 3)
+        self.assertEqual(db.fetch_one("SELECT COUNT(*) FROM users")[0], 0)
+
+        user_id, _ = self._login(auth, "user3")
+        self.assertTrue(auth.delete_user(user_id))
+        self.assertIsNone(auth.login_user("user3", "password123"))
+        self.assertTrue(auth.register_user("user3", "password123"))
+
+    def test_rebalance_moves_legacy_users_into_shards(self):
+        db, auth, vault = self._open()
+        for username in ("alice", "bob", "dave", "erin"):
+            auth.register_user(username, "password123")
+            user_id, cipher = self._login(auth, username)
+            for i in range(3):
+                vault.add_entry(user_id, f"service_{i}", username, f"pass_{i}", "", cipher)
+        alice_id, cipher = self._login(auth, "alice")
+        old_ids = [entry.id for entry in vault.get_all_entries(alice_id, cipher)]
+        cursor = vault.get_changes(alice_id, cipher)['cursor']
+        vault.close()
+        db.close()
+        self.managers.clear()
+
+        db, auth, vault = self._open(shards=2)
+        self.assertEqual(self._login(auth, "alice")[0], alice_id)
+        self.assertEqual(shard_status(db)['misplaced'], 4)
+
+        self.assertEqual(rebalance(db), {'moved': 4, 'skipped': 0, 'orphans_removed': 0})
+        self.assertEqual(shard_status(db)['misplaced'], 0)
+        self.assertEqual(db.fetch_one("SELECT COUNT(*) FROM users")[0], 0)
+
+        _, cipher = self._login(auth, "alice")
+        changes = vault.get_changes(alice_id, cipher, cursor)
+        self.assertEqual(sorted(changes['deleted']), old_ids)
+        self.assertEqual([entry.password for entry in changes['entries']], ["pass_0", "pass_1", "pass_2"])
+        self.assertTrue(vault.add_entry(alice_id, "service_3", "alice", "pass_3", "", cipher))
+        self.assertEqual(vault.count_entries(alice_id), 4)
+
+        vault.close()
+        db.close()
+        self.managers.clear()
+
+        db, auth, vault = self._open(shards=3)
+        self.assertEqual(rebalance(db)['moved'], 3)
+        for username in ("alice", "bob", "dave", "erin"):
+            user_id, cipher = self._login(auth, username)
+            self.assertIs(db.for_user(user_id), db.shards[db.shard_index(username)])
+            self.assertGreaterEqual(len(vault.get_all_entries(user_id, cipher)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
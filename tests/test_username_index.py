@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CryptoUtils
+from auth_manager import AuthManager
+from kdf_pool import KdfPool
+from username_index import UsernameIndex
+
+
+class TestUsernameIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.db.initialize_db()
+        self.kdf_pool = KdfPool(workers=1)
+        self.usernames = UsernameIndex(self.db, refresh_interval=3600)
+        self.auth = AuthManager(self.db, CryptoUtils(), self.kdf_pool, self.usernames)
+
+    def tearDown(self):
+        self.kdf_pool.shutdown()
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _insert_user(self, username: str):
+        self.db.execute_query(
+            """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+               VALUES (?, ?, ?, ?, ?)""",
+            (username, b"h", b"s", b"m", b"k")
+        )
+
+    def test_register_and_delete_update_index(self):
+        self._insert_user("existing")
+        self.usernames.load()
+        self.assertTrue(self.usernames.is_taken("existing"))
+        self.assertFalse(self.usernames.is_taken("alice"))
+
+        self.assertTrue(self.auth.register_user("alice", "password123"))
+        self.assertTrue(self.usernames.is_taken("alice"))
+        self.assertFalse(self.auth.register_user("alice", "password123"))
+
+        user_id = self.auth.login_user("alice", "password123")['user']['id']
+        self.assertTrue(self.auth.delete_user(user_id))
+        self.assertEqual(self.usernames.availability(["alice", "existing"]), {"alice": True, "existing": False})
+
+    def test_refresh_picks_up_other_writers(self):
+        self.usernames.load()
+        self._insert_user("bob")
+        self.assertFalse(self.usernames.is_taken("bob"))
+        self.assertFalse(self.auth.register_user("bob", "password123"))
+
+        self.usernames.refresh()
+        self.assertTrue(self.usernames.is_taken("bob"))
+        self.assertEqual(len(self.usernames), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,252 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import io
+import threading
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database_manager_sqlite import DatabaseManager
+from crypto_utils import CryptoUtils, CipherWipedError
+from vault_manager import VaultManager
+import vault_io
+
+
+class TestVaultManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.db.initialize_db()
+        self.crypto = CryptoUtils()
+        self.vault = VaultManager(self.db, self.crypto, decrypt_workers=4)
+        self.cipher = self.crypto.create_cipher_context(self.crypto.generate_key())
+        self.db.execute_query(
+            """INSERT INTO users (username, password_hash, salt, master_key_salt, encrypted_master_key)
+               VALUES (?, ?, ?, ?, ?)""",
+            ("alice", b"h", b"s", b"m", b"k")
+        )
+        self.user_id = self.db.fetch_one("SELECT id FROM users WHERE username = ?", ("alice",))[0]
+
+    def tearDown(self):
+        self.vault.close()
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _add_entries(self, count: int):
+        for i in range(count):
+            self.vault.add_entry(self.user_id, f"service_{i:04d}", f"user_{i}", f"pass_{i}", f"note_{i}", self.cipher)
+
+    def test_entry_lifecycle(self):
+        self.assertTrue(self.vault.add_entry(self.user_id, "github", "alice", "secret", "", self.cipher))
+        entry = self.vault.get_entry_by_service(self.user_id, "git", self.cipher)
+        self.assertEqual(entry['password'], "secret")
+        self.assertEqual(entry['notes'], "")
+
+        self.assertTrue(self.vault.update_entry(self.user_id, entry['id'], "changed", "note", self.cipher))
+        entry = self.vault.get_all_entries(self.user_id, self.cipher)[0]
+        self.assertEqual((entry['password'], entry['notes']), ("changed", "note"))
+
+        self.assertIsNone(self.vault.update_entry(self.user_id + 1, entry['id'], "stolen", "", self.cipher))
+        self.assertIsNone(self.vault.update_entry(self.user_id, entry['id'] + 1, None, "note", self.cipher))
+
+        self.assertTrue(self.vault.delete_entry(self.user_id, entry['id']))
+        self.assertEqual(self.vault.get_all_entries(self.user_id, self.cipher), [])
+
+    def test_parallel_decryption_keeps_order_and_skips_failures(self):
+        self.vault.PARALLEL_DECRYPT_THRESHOLD = 10
+        self.vault.DECRYPT_CHUNK_SIZE = 7
+        self._add_entries(40)
+        self.db.execute_query(
+            "UPDATE vault_entries SET encrypted_password = ? WHERE service_name = ?",
+            (b"corrupted", "service_0013")
+        )
+
+        entries = self.vault.get_all_entries(self.user_id, self.cipher)
+        expected = [f"service_{i:04d}" for i in range(40) if i != 13]
+        self.assertEqual([entry['service_name'] for entry in entries], expected)
+        self.assertEqual(entries[-1]['password'], "pass_39")
+
+    def test_keyset_pagination(self):
+        self._add_entries(25)
+        self.vault.add_entry(self.user_id, "service_0010", "duplicate", "pw", "", self.cipher)
+
+        pages, cursor = [], None
+        while True:
+            page, cursor = self.vault.get_entries_page(self.user_id, self.cipher, 10, cursor)
+            pages.append(page)
+            if cursor is None:
+                break
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 6])
+        paged = [(entry['service_name'], entry['id']) for page in pages for entry in page]
+        full = [(entry['service_name'], entry['id']) for entry in self.vault.get_all_entries(self.user_id, self.cipher)]
+        self.assertEqual(paged, full)
+
+    def test_iter_entries_is_lazy(self):
+        self._add_entries(7)
+        self.db.DEFAULT_BATCH_SIZE = 2
+        entries = self.vault.iter_entries(self.user_id, self.cipher, after=("service_0001", 2))
+
+        self.assertEqual(next(entries)['service_name'], "service_0002")
+        self.assertEqual(self.db.pool_stats()['in_use'], 0)
+        self.assertEqual([entry['service_name'] for entry in entries],
+                         ["service_0003", "service_0004", "service_0005", "service_0006"])
+
+    def test_wiped_cipher_is_not_a_decrypt_failure(self):
+        self._add_entries(2)
+        cipher = self.crypto.create_cipher_context(self.cipher.master_key)
+        cipher.wipe()
+
+        with self.assertRaises(CipherWipedError):
+            self.vault.get_all_entries(self.user_id, cipher)
+        with self.assertRaises(CipherWipedError):
+            self.vault.reveal_entry_secret(self.user_id, 1, cipher)
+
+    def test_metadata_listing_and_reveal(self):
+        self._add_entries(3)
+        entries, cursor = self.vault.get_entries_metadata(self.user_id, limit=2)
+
+        self.assertEqual([entry['service_name'] for entry in entries], ["service_0000", "service_0001"])
+        self.assertNotIn('password', entries[0])
+        self.assertEqual(cursor, ("service_0001", entries[1]['id']))
+
+        secret = self.vault.reveal_entry_secret(self.user_id, entries[1]['id'], self.cipher, ('password',))
+        self.assertEqual(secret, {'id': entries[1]['id'], 'password': "pass_1"})
+        self.assertIsNone(self.vault.reveal_entry_secret(self.user_id + 1, entries[1]['id'], self.cipher))
+
+    def test_legacy_entries_migrate_to_sealed_format(self):
+        self.db.execute_query(
+            """INSERT INTO vault_entries (user_id, service_name, username, encrypted_password, encrypted_notes)
+               VALUES (?, ?, ?, ?, ?)""",
+            (self.user_id, "legacy", "alice", self.cipher.encrypt("old_pass"), self.cipher.encrypt("old_note"))
+        )
+        self.vault.add_entry(self.user_id, "modern", "alice", "new_pass", "", self.cipher)
+        version = self.vault.get_vault_version(self.user_id)
+
+        entries = self.vault.get_all_entries(self.user_id, self.cipher)
+        self.assertEqual([(entry['password'], entry['notes']) for entry in entries],
+                         [("old_pass", "old_note"), ("new_pass", "")])
+        rows = self.db.fetch_all("SELECT encrypted_password, encrypted_notes FROM vault_entries ORDER BY id")
+        self.assertTrue(all(self.cipher.is_sealed(password) and notes is None for password, notes in rows))
+        self.assertEqual(self.vault.get_vault_version(self.user_id), version)
+
+        self.vault.update_entry(self.user_id, entries[0]['id'], None, "new_note", self.cipher)
+        secret = self.vault.reveal_entry_secret(self.user_id, entries[0]['id'], self.cipher)
+        self.assertEqual((secret['password'], secret['notes']), ("old_pass", "new_note"))
+        self.assertFalse(self.vault.update_entry(self.user_id, 999, None, "note", self.cipher))
+
+    def test_concurrent_partial_updates_keep_both_fields(self):
+        self.vault.add_entry(self.user_id, "github", "alice", "oldpw", "oldnote", self.cipher)
+        entry_id = self.vault.get_all_entries(self.user_id, self.cipher)[0].id
+        decrypt_entry = self.cipher.decrypt_entry
+        other = []
+
+        def interleave(*args):
+            # The notes update arrives while the password update sits between its read and its write
+            if not other:
+                other.append(threading.Thread(target=self.vault.update_entry,
+                                              args=(self.user_id, entry_id, None, "newnote", self.cipher)))
+                other[0].start()
+                other[0].join(0.2)
+            return decrypt_entry(*args)
+
+        with mock.patch.object(self.cipher, 'decrypt_entry', side_effect=interleave):
+            self.assertTrue(self.vault.update_entry(self.user_id, entry_id, "newpw", None, self.cipher))
+        other[0].join()
+
+        secret = self.vault.reveal_entry_secret(self.user_id, entry_id, self.cipher)
+        self.assertEqual((secret['password'], secret['notes']), ("newpw", "newnote"))
+
+    def test_delta_sync_and_tombstones(self):
+        self._add_entries(3)
+        initial = self.vault.get_changes(self.user_id, self.cipher)
+        self.assertTrue(initial['full'])
+        self.assertEqual(len(initial['entries']), 3)
+        self.assertEqual(initial['cursor'], self.vault.get_vault_version(self.user_id))
+
+        unchanged = self.vault.get_changes(self.user_id, self.cipher, initial['cursor'])
+        self.assertEqual((unchanged['entries'], unchanged['deleted']), ([], []))
+
+        first, second, third = initial['entries']
+        self.vault.update_entry(self.user_id, first['id'], "changed", None, self.cipher)
+        self.vault.delete_entry(self.user_id, second['id'])
+        changes = self.vault.get_changes(self.user_id, self.cipher, initial['cursor'])
+
+        self.assertFalse(changes['full'])
+        self.assertEqual([(entry['id'], entry['password']) for entry in changes['entries']], [(first['id'], "changed")])
+        self.assertEqual(changes['deleted'], [second['id']])
+        self.assertGreater(changes['cursor'], initial['cursor'])
+
+        self.assertEqual(self.vault.get_changes(self.user_id, self.cipher, changes['cursor'])['entries'], [])
+        self.assertTrue(self.vault.get_changes(self.user_id, self.cipher, changes['cursor'] + 100)['full'])
+
+        before_delete = self.vault.get_changes(self.user_id, self.cipher, changes['cursor'])['cursor']
+        self.vault.delete_entry(self.user_id, third['id'])
+        self.db.execute_query("UPDATE vault_tombstones SET deleted_at = datetime('now', '-100 days')")
+        self.assertTrue(self.vault.prune_tombstones(90))
+        self.assertEqual(self.db.fetch_one("SELECT COUNT(*) FROM vault_tombstones")[0], 0)
+
+        stale = self.vault.get_changes(self.user_id, self.cipher, before_delete)
+        self.assertTrue(stale['full'])
+        self.assertEqual([entry['id'] for entry in stale['entries']], [first['id']])
+        current = self.vault.get_changes(self.user_id, self.cipher, stale['cursor'])
+        self.assertFalse(current['full'])
+
+    def test_search_entries(self):
+        for service_name, username in [("Digital Ocean", "ops"), ("GitHub", "alice"), ("gitlab", "bob"),
+                                       ("Bank", "alice_git"), ("100%_real", "x")]:
+            self.vault.add_entry(self.user_id, service_name, username, "pw", "", self.cipher)
+        self.vault.add_entry(self.user_id + 1, "github", "eve", "pw", "", self.cipher)
+
+        for fts_min_entries in (0, VaultManager.FTS_MIN_ENTRIES):
+            with self.subTest(fts_min_entries=fts_min_entries):
+                self.vault.FTS_MIN_ENTRIES = fts_min_entries
+                names = [entry['service_name'] for entry in self.vault.search_entries(self.user_id, "git")]
+                self.assertEqual(set(names[:2]), {"GitHub", "gitlab"})
+                self.assertEqual(set(names[2:]), {"Digital Ocean", "Bank"})
+                self.assertEqual(len(self.vault.search_entries(self.user_id, "git", limit=2)), 2)
+                self.assertEqual([entry['service_name'] for entry in self.vault.search_entries(self.user_id, "%_")],
+                                 ["100%_real"])
+                self.assertEqual(self.vault.search_entries(self.user_id + 2, "git"), [])
+
+        self.vault.FTS_MIN_ENTRIES = 0
+        self.db.execute_query("UPDATE vault_entries SET service_name = ? WHERE id = ?", ("Ocean", 1))
+        self.assertEqual(len(self.vault.search_entries(self.user_id, "git")), 3)
+        self.assertEqual(self.vault.get_entry_by_service(self.user_id, "ub", self.cipher)['service_name'], "GitHub")
+
+    def test_bulk_import_and_export(self):
+        lines = ["name,username,password,extra\n"] + [f"svc{i},user{i},pw{i},note{i}\n" for i in range(12)]
+        lines.append("missing,,pw,\n")
+        lines.append("svc12,user12,pw12,\n")
+
+        result = self.vault.import_entries(self.user_id, vault_io.iter_csv_rows(lines), self.cipher, batch_size=5)
+        self.assertEqual(result['imported'], 13)
+        self.assertEqual(result['errors'], [{'row': 13, 'error': "Field must not be empty: username"}])
+
+        exported = "".join(vault_io.export_ndjson(self.vault.iter_entries(self.user_id, self.cipher)))
+        rows = list(vault_io.iter_ndjson_rows(exported.splitlines()))
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[0]['password'], "pw0")
+        self.assertEqual(rows[0]['notes'], "note0")
+
+    def test_malformed_imports_report_row_errors(self):
+        bodies = [
+            ('json', b'5'),
+            ('json', b'{"entries": 5}'),
+            ('csv', b'name,username,password\nsvc,user,pw\nbad\xff,user,pw\n'),
+        ]
+        for data_format, body in bodies:
+            with self.subTest(data_format=data_format, body=body):
+                stream = io.TextIOWrapper(io.BytesIO(body), encoding='utf-8-sig', newline='')
+                result = self.vault.import_entries(
+                    self.user_id, vault_io.iter_import_rows(stream, data_format), self.cipher
+                )
+                self.assertEqual(result['failed'], 1)
+                self.assertEqual(len(result['errors']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()